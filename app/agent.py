@@ -7,77 +7,119 @@ More info: https://platform.openai.com/docs/guides/function-calling?api-mode=res
 """
 
 import json
-import requests
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from openai import OpenAI
 
+from cache import CacheMetrics, InMemoryCacheBackend
+from http_client import get_json
+from registry import ToolRegistry
+
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.open-meteo.com/v1/forecast")
+WEATHER_CACHE_TTL_SECONDS = int(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))
+WEATHER_COORD_PRECISION = int(os.getenv("WEATHER_COORD_PRECISION", "2"))  # 2 decimals is about 1 km
+
+agent_tools = ToolRegistry()
+
+# Weather by rounded coordinates and time bucket; nearby lookups within a bucket share a request
+weather_cache_metrics = CacheMetrics()
+weather_cache = InMemoryCacheBackend(weather_cache_metrics, max_entries=10000, ttl_seconds=WEATHER_CACHE_TTL_SECONDS)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client() -> OpenAI:
+    """Shared OpenAI client, so its connection pool is reused across calls"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI()
+        return _client
+
+
+@agent_tools.tool(description="Get current temperature for provided coordinates in celsius.", strict=True)
+def get_weather(latitude: float, longitude: float):
+    latitude = round(latitude, WEATHER_COORD_PRECISION)
+    longitude = round(longitude, WEATHER_COORD_PRECISION)
+    key = (latitude, longitude, int(time.time() // WEATHER_CACHE_TTL_SECONDS))
+
+    temperature = weather_cache.get(key)
+    if temperature is not None:
+        weather_cache_metrics.incr("hits")
+        return temperature
+    weather_cache_metrics.incr("misses")
 
-def get_weather(latitude, longitude):
-    response = requests.get(
-        f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m,wind_speed_10m"
+    data = get_json(
+        WEATHER_API_URL,
+        params={"latitude": latitude, "longitude": longitude, "current": "temperature_2m,wind_speed_10m"},
     )
-    data = response.json()
-    return data["current"]["temperature_2m"]
+    temperature = data["current"]["temperature_2m"]
+    weather_cache.set(key, temperature)
+    return temperature
 
 
 def call_function(name, args):
-    if name == "get_weather":
-        return get_weather(**args)
-    raise ValueError(f"Unknown function: {name}")
-
-
-def intelligence_with_tools(prompt: str) -> str:
-    client = OpenAI()
-
-    tools = [
-        {
-            "type": "function",
-            "name": "get_weather",
-            "description": "Get current temperature for provided coordinates in celsius.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "latitude": {"type": "number"},
-                    "longitude": {"type": "number"},
-                },
-                "required": ["latitude", "longitude"],
-                "additionalProperties": False,
-            },
-            "strict": True,
-        }
-    ]
+    return agent_tools.call(name, args)
 
-    input_messages = [{"role": "user", "content": prompt}]
 
-    # Step 1: Call model with tools
-    response = client.responses.create(
-        model="gpt-4o",
-        input=input_messages,
-        tools=tools,
-    )
+def run_function_call(call) -> dict:
+    """
+    Execute one function call of the model and return its function_call_output
+
+    A call that fails, from malformed arguments and unknown tools to a
+    tool that raises, comes back to the model as a failed result, so one
+    bad call does not lose the results of the others in its step.
+    """
+    try:
+        result = call_function(call.name, json.loads(call.arguments or "{}"))
+    except Exception as e:
+        result = {"success": False, "message": f"Could not call {call.name}: {e}"}
+    return {
+        "type": "function_call_output",
+        "call_id": call.call_id,
+        "output": str(result),
+    }
 
-    # Step 2: Handle function calls
-    for tool_call in response.output:
-        if tool_call.type == "function_call":
-            # Step 3: Execute function
-            name = tool_call.name
-            args = json.loads(tool_call.arguments)
-            result = call_function(name, args)
 
-            # Step 4: Append function call and result to messages
+def intelligence_with_tools(prompt: str, max_steps: int = 5, steps: list = None) -> str:
+    client = get_openai_client()
+
+    tools = agent_tools.responses_schemas()
+
+    input_messages = [{"role": "user", "content": prompt}]
+
+    for step in range(1, max_steps + 1):
+        # Step 1: Call model with tools
+        started = time.perf_counter()
+        response = client.responses.create(
+            model="gpt-4o",
+            input=input_messages,
+            tools=tools,
+        )
+
+        function_calls = [item for item in response.output if item.type == "function_call"]
+        if not function_calls:
+            return response.output_text
+
+        # Step 2: Execute independent function calls concurrently, keeping call order
+        with ThreadPoolExecutor(max_workers=len(function_calls)) as pool:
+            outputs = list(pool.map(run_function_call, function_calls))
+
+        # Step 3: Append function calls and results to messages, then loop
+        for tool_call, output in zip(function_calls, outputs):
             input_messages.append(tool_call)
-            input_messages.append(
-                {
-                    "type": "function_call_output",
-                    "call_id": tool_call.call_id,
-                    "output": str(result),
-                }
-            )
-
-    # Step 5: Get final response with function results
+            input_messages.append(output)
+        if steps is not None:
+            steps.append({"step": step, "tool_calls": len(function_calls), "seconds": time.perf_counter() - started})
+
+    # Step 4: Out of steps, get final response with function results
     final_response = client.responses.create(
         model="gpt-4o",
         input=input_messages,
-        tools=tools,
     )
 
     return final_response.output_text
@@ -0,0 +1,59 @@
+from datetime import datetime
+from fastapi import status
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import asyncio
+import os
+
+from persistence import TurnWrites, batch_writer
+from resilience import UpstreamError
+from utils import new_chat_session, new_message
+
+# Batch chat configuration
+BATCH_CHAT_CONCURRENCY = int(os.getenv("BATCH_CHAT_CONCURRENCY", "16"))
+
+async def run_batch_item(chat, user_id: str, message: str, title: str) -> Dict[str, Any]:
+    """
+    Answer one batch item in a new session and commit the turn
+    
+    The turn goes through the batch writer, so the sessions and messages
+    of concurrent items are bulk-inserted together in grouped commits.
+    """
+    turn = TurnWrites()
+    session_id = turn.add(new_chat_session(user_id, title)).session_id
+    turn.add(new_message(session_id, "user", message))
+    response = await chat.generate_response(message, [], user_id=user_id, session_id=session_id, turn=turn)
+    turn.add(new_message(session_id, "assistant", response))
+    await asyncio.wrap_future(batch_writer.submit(turn))
+    return {
+        "user_id": user_id,
+        "session_id": session_id,
+        "response": response,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+async def run_batch(chat, items: List[Tuple[str, str, str]], concurrency: int = BATCH_CHAT_CONCURRENCY) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Run (user_id, message, title) items with at most `concurrency` in flight
+    
+    Yields (index, result) pairs in completion order. A failed item yields
+    an `error` and `status` instead of a response and does not stop the
+    others. Items still pending when the consumer stops are cancelled.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def run_item(index: int, user_id: str, message: str, title: str) -> Tuple[int, Dict[str, Any]]:
+        async with semaphore:
+            try:
+                return index, await run_batch_item(chat, user_id, message, title)
+            except UpstreamError as e:
+                return index, {"user_id": user_id, "error": str(e), "status": e.status_code}
+            except Exception as e:
+                return index, {"user_id": user_id, "error": str(e), "status": status.HTTP_500_INTERNAL_SERVER_ERROR}
+    
+    tasks = [asyncio.ensure_future(run_item(index, *item)) for index, item in enumerate(items)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from metrics import record_cache_event
+
+# Response cache configuration
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # "memory" or "sqlite"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalize text so near-identical prompts share a cache key"""
+    if not text:
+        return ""
+    text = re.sub(r"\s+", " ", text.lower()).strip()
+    return text.rstrip(".!?")
+
+class CacheMetrics:
+    """
+    Thread-safe counters for cache activity
+    
+    Counters of a named cache are also exported on /metrics as
+    `cache_events_total`, labelled with the name.
+    """
+    
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bypasses = 0
+    
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+        if self.name:
+            record_cache_event(self.name, name, amount)
+    
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "bypasses": self.bypasses
+            }
+
+class InMemoryCacheBackend:
+    """Per-process LRU cache with a time-to-live on every entry"""
+    
+    blocking = False
+    
+    def __init__(self, metrics: CacheMetrics, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS):
+        self.metrics = metrics
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.metrics.incr("expirations")
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics.incr("evictions")
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCacheBackend:
+    """
+    Cache stored in the response_cache table, shared by every worker using the database
+    
+    Stands in for a shared cache such as Redis. Expired entries are removed
+    when read, and the oldest entries are evicted once the table grows
+    past `max_entries`.
+    """
+    
+    blocking = True
+    
+    def __init__(self, metrics: CacheMetrics, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS, session_factory=None):
+        # Imported here, so the in-memory cache can be used without creating the app's database engine
+        from database import SessionLocal, ResponseCacheEntry
+        
+        self.metrics = metrics
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.session_factory = session_factory or SessionLocal
+        self.entry_model = ResponseCacheEntry
+    
+    def get(self, key: str) -> Optional[str]:
+        db = self.session_factory()
+        try:
+            entry = db.query(self.entry_model).filter(self.entry_model.key == key).first()
+            if entry is None:
+                return None
+            if entry.expires_at <= datetime.utcnow():
+                db.delete(entry)
+                db.commit()
+                self.metrics.incr("expirations")
+                return None
+            return entry.response
+        finally:
+            db.close()
+    
+    def set(self, key: str, value: str):
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            db.merge(self.entry_model(
+                key=key,
+                response=value,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds)
+            ))
+            db.commit()
+            
+            overflow = db.query(self.entry_model).count() - self.max_entries
+            if overflow > 0:
+                oldest = [row.key for row in db.query(self.entry_model.key).order_by(
+                    self.entry_model.created_at
+                ).limit(overflow)]
+                evicted = db.query(self.entry_model).filter(
+                    self.entry_model.key.in_(oldest)
+                ).delete(synchronize_session=False)
+                db.commit()
+                self.metrics.incr("evictions", evicted)
+        finally:
+            db.close()
+    
+    def clear(self):
+        db = self.session_factory()
+        try:
+            db.query(self.entry_model).delete()
+            db.commit()
+        finally:
+            db.close()
+
+class ResponseCache:
+    """Opt-in cache of final responses keyed on the normalized prompt"""
+    
+    def __init__(self, backend=None, enabled: bool = RESPONSE_CACHE_ENABLED, metrics: CacheMetrics = None):
+        self.metrics = metrics or CacheMetrics("response")
+        if backend is None:
+            if RESPONSE_CACHE_BACKEND == "sqlite":
+                backend = SQLiteCacheBackend(self.metrics)
+            else:
+                backend = InMemoryCacheBackend(self.metrics)
+        self.backend = backend
+        self.enabled = enabled
+    
+    @staticmethod
+    def make_key(model: str, system_prompt: str, context: List[Dict[str, str]], message: str) -> str:
+        """Hash the normalized system prompt, trimmed context and message"""
+        payload = json.dumps({
+            "model": model,
+            "system": normalize_text(system_prompt),
+            "context": [[msg["role"], normalize_text(msg.get("content"))] for msg in context or []],
+            "message": normalize_text(message)
+        }, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a cached response, counting the hit or miss"""
+        if self.backend.blocking:
+            value = await asyncio.to_thread(self.backend.get, key)
+        else:
+            value = self.backend.get(key)
+        self.metrics.incr("hits" if value is not None else "misses")
+        return value
+    
+    async def set(self, key: str, value: str):
+        """Store a response"""
+        if self.backend.blocking:
+            await asyncio.to_thread(self.backend.set, key, value)
+        else:
+            self.backend.set(key, value)
+    
+    def bypass(self):
+        """Record a turn that could not be cached because it used tools"""
+        self.metrics.incr("bypasses")
+
+response_cache = ResponseCache()
@@ -1,15 +1,41 @@
-from openai import OpenAI
-from typing import List, Dict, Any, Optional
+from openai import AsyncOpenAI
+from dataclasses import dataclass, field
+from contextlib import aclosing
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+import asyncio
 import os
 import json
+import time
 from dotenv import load_dotenv
-from tools import call_function
+from tools import acall_function
+from registry import tool_registry
+from context import ConversationContext, PromptPrefix, build_context
+from persistence import TurnWrites
+from cache import ResponseCache, response_cache
+from resilience import UpstreamGuard
+from metrics import record_token_usage
 
 load_dotenv()
 
+# Maximum rounds of tool calls per turn before the model must answer
+MAX_TOOL_STEPS = int(os.getenv("MAX_TOOL_STEPS", "5"))
+
+@dataclass
+class AgentStep:
+    """Timing of one model round trip and the tool calls it requested"""
+    step: int
+    model_seconds: float = 0.0
+    tool_seconds: float = 0.0
+    tools: List[str] = field(default_factory=list)
+
 class FitnessChat:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, client: Optional[AsyncOpenAI] = None, cache: Optional[ResponseCache] = None, upstream: Optional[UpstreamGuard] = None):
+        # Retries happen in the upstream guard, not in the OpenAI client
+        self.client = client or AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self.cache = cache or response_cache
+        self.upstream = upstream or UpstreamGuard()
+        self.model = "gpt-4o-mini"
+        self.max_tool_steps = MAX_TOOL_STEPS
         self.system_prompt = """You are FitBot, an expert fitness coach and personal trainer assistant. You help users create personalized workout plans, provide fitness advice, and can save workout plans when requested. 
 
 Your capabilities include:
@@ -17,7 +43,7 @@ Your capabilities include:
 - Providing exercise instructions and form tips
 - Suggesting nutrition advice
 - Saving workout plans to the user's profile when they ask you to save them
-- Retrieving previously saved workout plans
+- Retrieving previously saved workout plans, or searching them by topic when the user has many
 
 When creating workout plans, be specific and include:
 - Exercise names
@@ -27,131 +53,259 @@ When creating workout plans, be specific and include:
 - Safety considerations
 
 If a user asks you to save a workout plan, use the save_workout_plan function. Always ask for a plan name if not provided."""
-    
-    def generate_response(self, message: str, conversation_history: List[Dict[str, str]] = None, user_id: str = "anonymous", session_id: str = None) -> str:
 
-        """Generate a response using OpenAI API with tool calling capabilities"""
-        try:
-            # Define available tools
-            tools = [
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "save_workout_plan",
-                        "description": "Save a workout plan to the user's profile in the database",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "user_id": {
-                                    "type": "string",
-                                    "description": "The user's ID"
-                                },
-                                "plan_name": {
-                                    "type": "string",
-                                    "description": "A descriptive name for the workout plan"
-                                },
-                                "plan_content": {
-                                    "type": "string",
-                                    "description": "The detailed workout plan content including exercises, sets, reps, etc."
-                                },
-                                "session_id": {
-                                    "type": "string",
-                                    "description": "The current chat session ID"
-                                }
-                            },
-                            "required": ["user_id", "plan_name", "plan_content"],
-                            "additionalProperties": False
-                        }
-                    }
-                },
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "get_user_workout_plans",
-                        "description": "Retrieve all saved workout plans for a user",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "user_id": {
-                                    "type": "string",
-                                    "description": "The user's ID"
-                                }
-                            },
-                            "required": ["user_id"],
-                            "additionalProperties": False
-                        }
-                    }
-                }
-            ]
+        self.summary_prompt = """You maintain a running summary of a conversation between a user and FitBot, a fitness coach. Update the current summary with the new messages. Keep the user's goals, fitness level, schedule, equipment, injuries and preferences, and the plans that were created or saved. Drop small talk. Reply with the updated summary only, in under 300 words."""
 
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history)
-            
-            # Add the current user message
-            messages.append({"role": "user", "content": message})
+        # Tool schemas are generated once when the tools are registered; together with the
+        # system prompt they form a fixed request prefix that the provider can cache
+        self.prefix = PromptPrefix.build(self.system_prompt, tool_registry.chat_schemas())
+        self.tools = list(self.prefix.tools)
+    
+    async def generate_response(self, message: str, conversation_history: List[Dict[str, str]] = None, user_id: str = "anonymous", session_id: str = None, turn: Optional[TurnWrites] = None, steps: Optional[List[AgentStep]] = None) -> str:
+
+        """
+        Generate a response using OpenAI API with tool calling capabilities
+        
+        The model may call tools for up to `max_tool_steps` rounds; the calls
+        of one round run concurrently and their results are fed back in call
+        order. Pass a list as `steps` to collect the timing of each round.
+        """
+        # System prompt, conversation history and the current user message
+        messages = self.prefix.messages(conversation_history, message)
+        
+        # Serve repeated prompts from the response cache
+        cache_key, cached = await self._cache_lookup(conversation_history, message)
+        if cached is not None:
+            return cached
+        
+        for step_number in range(1, self.max_tool_steps + 1):
+            step = AgentStep(step=step_number)
+            started = time.perf_counter()
             
-            # First API call to determine if tools are needed
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._complete(
+                model=self.model,
                 messages=messages,
-                tools=tools,
+                tools=self.tools,
                 tool_choice="auto",
                 max_tokens=1000,
                 temperature=0.7
             )
-            
             response_message = response.choices[0].message
+            step.model_seconds = time.perf_counter() - started
             
-            # Check if the model wants to call a function
-            if response_message.tool_calls:
-                # Add the assistant's response to messages
-                messages.append(response_message)
-                
-
-                # Execute each tool call
-                for tool_call in response_message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-
-                    # Add user_id and session_id to function args if not present
-                    if "user_id" in function_args and function_args["user_id"] == "":
-                        function_args["user_id"] = user_id
-                    if "session_id" not in function_args and session_id:
-                        function_args["session_id"] = session_id
-                    
-                    # Call the function
-                    function_result = call_function(function_name, function_args)
-                    
-                    # Add the function result to messages
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": json.dumps(function_result)
-                    })
-                
-                # Get the final response from the model
-                final_response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=messages,
-                    max_tokens=1000,
-
-                    temperature=0.7
-                )
-                
-                return final_response.choices[0].message.content
-            else:
-
-                # No tool calls needed, return the response directly
+            # No tool calls needed, return the response directly
+            if not response_message.tool_calls:
+                self._record_step(steps, step)
+                if cache_key and step_number == 1 and response_message.content:
+                    await self.cache.set(cache_key, response_message.content)
                 return response_message.content
             
+            # Tool turns read user data or have side effects, so they are never cached
+            if cache_key and step_number == 1:
+                self.cache.bypass()
+            
+            # Add the assistant's response to messages
+            calls = [(call.id, call.function.name, call.function.arguments) for call in response_message.tool_calls]
+            messages.append(self._assistant_tool_message(response_message.content, calls))
+            
+            # Execute the tool calls of this step concurrently
+            messages.extend(await self._run_tool_calls(
+                calls,
+                user_id,
+                session_id,
+                turn,
+                step
+            ))
+            self._record_step(steps, step)
+        
+        # Out of tool steps: get the final response from the model without tools
+        started = time.perf_counter()
+        final_response = await self._complete(
+            model=self.model,
+            messages=messages,
+            max_tokens=1000,
+            temperature=0.7
+        )
+        self._record_step(steps, AgentStep(step=self.max_tool_steps + 1, model_seconds=time.perf_counter() - started))
+        
+        return final_response.choices[0].message.content
+    
+    async def _cache_lookup(self, conversation_history: Optional[List[Dict[str, str]]], message: str) -> Tuple[Optional[str], Optional[str]]:
+        """The response cache key of a prompt and its cached response; (None, None) while the cache is off"""
+        if not self.cache.enabled:
+            return None, None
+        cache_key = self.cache.make_key(self.model, self.prefix.system_prompt, conversation_history, message)
+        return cache_key, await self.cache.get(cache_key)
+    
+    async def _complete(self, **kwargs):
+        """Create a chat completion through the upstream guard, recording its token usage"""
+        response = await self.upstream.call(self.client.chat.completions.create, **kwargs)
+        if not kwargs.get("stream"):
+            record_token_usage(self.model, response.usage)
+        return response
+    
+    async def _run_tool_call(self, tool_call_id: str, function_name: str, arguments: str, user_id: str, session_id: Optional[str], turn: Optional[TurnWrites] = None) -> Dict[str, Any]:
+        """
+        Execute a single tool call and return the tool message to append
+        
+        Malformed arguments, unknown tools and tools that raise come back to
+        the model as a failed result, like arguments that fail validation, so
+        one bad call does not fail the whole turn.
+        """
+        try:
+            function_args = json.loads(arguments or "{}")
+            if not isinstance(function_args, dict):
+                raise ValueError("arguments must be a JSON object")
+            
+            # Add the current session_id if the tool takes one and the model left it out
+            if "session_id" not in function_args and session_id and tool_registry.accepts(function_name, "session_id"):
+                function_args["session_id"] = session_id
+            
+            # Call the function
+            function_result = await acall_function(function_name, function_args, user_id, turn)
         except Exception as e:
-            return f"Sorry, I encountered an error: {str(e)}. Please try again."
+            function_result = {"success": False, "message": f"Could not call {function_name}: {e}"}
+        
+        return {
+            "tool_call_id": tool_call_id,
+            "role": "tool",
+            "name": function_name,
+            "content": json.dumps(function_result)
+        }
+    
+    async def _run_tool_calls(self, calls: List[Tuple[str, str, str]], user_id: str, session_id: Optional[str], turn: Optional[TurnWrites], step: AgentStep) -> List[Dict[str, Any]]:
+        """Execute the (id, name, arguments) tool calls of one step concurrently, returning tool messages in call order"""
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            self._run_tool_call(call_id, name, arguments, user_id, session_id, turn)
+            for call_id, name, arguments in calls
+        ))
+        step.tool_seconds = time.perf_counter() - started
+        step.tools = [name for _, name, _ in calls]
+        return list(results)
+    
+    @staticmethod
+    def _assistant_tool_message(content: Optional[str], calls: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+        """
+        The assistant message that requested (id, name, arguments) tool calls
+        
+        Built as a plain dict, not the SDK response object, so the next request
+        of the turn repeats the previous one's bytes and extends its cached prefix.
+        """
+        return {
+            "role": "assistant",
+            "content": content,
+            "tool_calls": [
+                {
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": name, "arguments": arguments}
+                }
+                for call_id, name, arguments in calls
+            ]
+        }
+    
+    @staticmethod
+    def _record_step(steps: Optional[List[AgentStep]], step: AgentStep):
+        if steps is not None:
+            steps.append(step)
+    
+    async def _stream_completion(self, messages: List[Dict[str, Any]], use_tools: bool, tool_calls: Dict[int, Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream one completion, yielding content deltas and assembling tool calls from their fragments"""
+        options = {"tools": self.tools, "tool_choice": "auto"} if use_tools else {}
+        stream = await self._complete(
+            model=self.model,
+            messages=messages,
+            max_tokens=1000,
+            temperature=0.7,
+            stream=True,
+            stream_options={"include_usage": True},
+            **options
+        )
+        
+        # Close the stream even when the client disconnects mid-way, freeing its upstream slot
+        try:
+            async for chunk in stream:
+                # Usage arrives in a final chunk without choices
+                if chunk.usage:
+                    record_token_usage(self.model, chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    yield delta.content
+                for fragment in delta.tool_calls or []:
+                    call = tool_calls.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+                    if fragment.id:
+                        call["id"] = fragment.id
+                    if fragment.function and fragment.function.name:
+                        call["name"] += fragment.function.name
+                    if fragment.function and fragment.function.arguments:
+                        call["arguments"] += fragment.function.arguments
+        finally:
+            await stream.aclose()
+    
+    async def stream_response(self, message: str, conversation_history: List[Dict[str, str]] = None, user_id: str = "anonymous", session_id: str = None, turn: Optional[TurnWrites] = None, steps: Optional[List[AgentStep]] = None) -> AsyncIterator[str]:
+        """Stream response text deltas as they arrive, across as many tool-call rounds as the model needs"""
+        messages = self.prefix.messages(conversation_history, message)
+        
+        cache_key, cached = await self._cache_lookup(conversation_history, message)
+        if cached is not None:
+            yield cached
+            return
+        
+        for step_number in range(1, self.max_tool_steps + 2):
+            # The last step gets no tools so the model has to answer
+            use_tools = step_number <= self.max_tool_steps
+            step = AgentStep(step=step_number)
+            started = time.perf_counter()
+            
+            # Forward content deltas immediately
+            content_parts = []
+            tool_calls = {}
+            async with aclosing(self._stream_completion(messages, use_tools, tool_calls)) as deltas:
+                async for delta in deltas:
+                    content_parts.append(delta)
+                    yield delta
+            step.model_seconds = time.perf_counter() - started
+            
+            if not tool_calls:
+                self._record_step(steps, step)
+                if cache_key and step_number == 1 and content_parts:
+                    await self.cache.set(cache_key, "".join(content_parts))
+                return
+            
+            if cache_key and step_number == 1:
+                self.cache.bypass()
+            
+            ordered_calls = [tool_calls[index] for index in sorted(tool_calls)]
+            calls = [(call["id"], call["name"], call["arguments"]) for call in ordered_calls]
+            messages.append(self._assistant_tool_message("".join(content_parts) or None, calls))
+            
+            messages.extend(await self._run_tool_calls(
+                calls,
+                user_id,
+                session_id,
+                turn,
+                step
+            ))
+            self._record_step(steps, step)
+        
+    
+    def get_conversation_context(self, history: List[Dict[str, str]], message: str, token_budget: int = None, summary: Optional[str] = None) -> ConversationContext:
+        """Get the recent conversation context that fits the token budget alongside the system prompt"""
+        return build_context(self.prefix.system_prompt, history, message, token_budget, summary)
     
-    def get_conversation_context(self, messages: List[Dict[str, str]], max_messages: int = 10) -> List[Dict[str, str]]:
-        """Get recent conversation context for API calls"""
-        return messages[-max_messages:] if len(messages) > max_messages else messages
\ No newline at end of file
+    async def summarize_conversation(self, summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """Fold new messages into a running conversation summary"""
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        response = await self._complete(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.summary_prompt},
+                {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"}
+            ],
+            max_tokens=500,
+            temperature=0.2
+        )
+        return response.choices[0].message.content
@@ -0,0 +1,65 @@
+from sqlalchemy import Text
+from sqlalchemy.types import TypeDecorator
+from typing import Optional, Union
+import hashlib
+import os
+import zlib
+
+# Content compression configuration
+CONTENT_COMPRESSION_ENABLED = os.getenv("CONTENT_COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+CONTENT_COMPRESSION_MIN_BYTES = int(os.getenv("CONTENT_COMPRESSION_MIN_BYTES", "1024"))
+CONTENT_COMPRESSION_LEVEL = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+
+# First byte of a compressed value, naming its codec
+ZLIB_PREFIX = b"z"
+
+def compress_text(text: str, min_bytes: int = CONTENT_COMPRESSION_MIN_BYTES, level: int = CONTENT_COMPRESSION_LEVEL) -> Union[str, bytes]:
+    """
+    Compress text of at least `min_bytes` UTF-8 bytes
+    
+    Returns:
+        The compressed bytes, or the text itself when it is short or does not shrink
+    """
+    data = text.encode("utf-8")
+    if len(data) < min_bytes:
+        return text
+    compressed = ZLIB_PREFIX + zlib.compress(data, level)
+    return compressed if len(compressed) < len(data) else text
+
+def decompress_text(value: Union[str, bytes, None]) -> Optional[str]:
+    """The text of a value written by `compress_text`; plain text is returned as is"""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value[:1] != ZLIB_PREFIX:
+        raise ValueError(f"Unknown content codec: {value[:1]!r}")
+    return zlib.decompress(value[1:]).decode("utf-8")
+
+def content_hash(text: str) -> str:
+    """Content address of a text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def register_sqlite_functions(dbapi_connection):
+    """Make `text_content(column)` available to SQL, for full-text triggers over compressed columns"""
+    dbapi_connection.create_function("text_content", 1, decompress_text, deterministic=True)
+
+class CompressedText(TypeDecorator):
+    """
+    Text stored compressed on SQLite once it reaches the size threshold
+    
+    Large values are written as zlib BLOBs and decompressed when a query
+    returns them; short values, and every value on other databases, are
+    plain text. PostgreSQL already compresses large values itself. Rows
+    written before compression was enabled read back unchanged.
+    """
+    
+    impl = Text
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or not CONTENT_COMPRESSION_ENABLED or dialect.name != "sqlite":
+            return value
+        return compress_text(value)
+    
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
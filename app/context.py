@@ -0,0 +1,135 @@
+from dataclasses import dataclass, field
+from typing import Any, List, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Context configuration
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_MAX_MESSAGES = int(os.getenv("CONTEXT_MAX_MESSAGES", "50"))
+# Oldest history messages are dropped in multiples of this, see build_context
+CONTEXT_TRIM_STEP = max(1, int(os.getenv("CONTEXT_TRIM_STEP", "10")))
+
+# Per-message formatting overhead added by the chat completions API
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+
+def _get_encoding():
+    """Load the local tokenizer once, falling back to an estimate if unavailable"""
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    return _encoding or None
+
+def count_tokens(text: Optional[str]) -> int:
+    """Count the tokens in a piece of text"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Roughly four characters per token for English text
+    return (len(text) + 3) // 4
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """Count the tokens a chat message contributes to a request"""
+    return count_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """
+    The start of every completion request: the tool definitions and the system prompt
+    
+    Built once per process. Requests send it as identical bytes across
+    turns and users, so the provider can serve it from its prompt cache;
+    the fingerprint identifies it in logs and stats.
+    """
+    system_prompt: str
+    tools: Tuple[Dict[str, Any], ...]
+    fingerprint: str
+    
+    @classmethod
+    def build(cls, system_prompt: str, tools: List[Dict[str, Any]]) -> "PromptPrefix":
+        tools = tuple(tools)
+        encoded = json.dumps({"system": system_prompt, "tools": tools}, separators=(",", ":"))
+        return cls(system_prompt, tools, hashlib.sha256(encoded.encode()).hexdigest()[:16])
+    
+    def messages(self, history: Optional[List[Dict[str, Any]]], message: str) -> List[Dict[str, Any]]:
+        """
+        Assemble the messages of a request: system prompt, history, then the new user message
+        
+        Nothing per-request is placed before the history, so consecutive
+        turns of a session share everything up to their newest messages.
+        """
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": message})
+        return messages
+
+@dataclass
+class ConversationContext:
+    """History window that fits the token budget, plus what was left out"""
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    total_tokens: int = 0
+    dropped_messages: int = 0
+    dropped_tokens: int = 0
+
+def summary_message(summary: str) -> Dict[str, str]:
+    """Wrap a running conversation summary as a context message"""
+    return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+def build_context(system_prompt: str, history: List[Dict[str, str]], message: str, token_budget: int = None, summary: Optional[str] = None) -> ConversationContext:
+    """
+    Trim conversation history to a token budget
+    
+    The system prompt, the running summary and the current user message
+    are always kept; the remaining budget is filled with the most recent
+    history messages. When history has to be dropped, the oldest messages
+    go in multiples of CONTEXT_TRIM_STEP, so the window keeps its start for
+    several turns and consecutive requests share a cacheable prefix.
+    
+    Args:
+        system_prompt: The system prompt sent with every request
+        history: Conversation history in chronological order
+        message: The current user message
+        token_budget: Maximum prompt tokens, defaults to CONTEXT_TOKEN_BUDGET
+        summary: Running summary of the turns that precede `history`
+    
+    Returns:
+        ConversationContext: The history window and the number of dropped tokens
+    """
+    if token_budget is None:
+        token_budget = CONTEXT_TOKEN_BUDGET
+    
+    used = message_tokens({"content": system_prompt}) + message_tokens({"content": message})
+    
+    prefix = []
+    if summary:
+        prefix.append(summary_message(summary))
+        used += message_tokens(prefix[0])
+    
+    costs = [message_tokens(msg) for msg in history]
+    history_tokens = sum(costs)
+    drop = 0
+    while drop < len(history) and used + history_tokens > token_budget:
+        history_tokens -= costs[drop]
+        drop += 1
+    if drop:
+        drop = min(len(history), -(-drop // CONTEXT_TRIM_STEP) * CONTEXT_TRIM_STEP)
+    
+    return ConversationContext(
+        messages=prefix + history[drop:],
+        total_tokens=used + sum(costs[drop:]),
+        dropped_messages=drop,
+        dropped_tokens=sum(costs[:drop])
+    )
@@ -1,15 +1,123 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy import create_engine, event, inspect, case, delete, exists, func, or_, select, update, Column, Integer, String, DateTime, Text, JSON, Index, ForeignKey, LargeBinary
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, column_property, relationship, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
+from typing import Iterable, List, Optional
 import os
 
+from compression import CompressedText, content_hash, register_sqlite_functions
+
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fitness_chat.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+# Async driver used for each database when ASYNC_DATABASE_URL does not name one
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+# SQLite profile, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Connection pool profile
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Length of the last-message preview kept on each session
+SESSION_PREVIEW_CHARS = int(os.getenv("SESSION_PREVIEW_CHARS", "120"))
+
+# Store each distinct plan text once on SQLite, see _deduplicate_plan_content
+PLAN_DEDUP_ENABLED = os.getenv("PLAN_DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLite profile to a new connection"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    # A negative cache_size is in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    # Enforce foreign keys so deleting a session cascades to its messages
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+@event.listens_for(Engine, "connect")
+def _register_sql_functions(dbapi_connection, connection_record):
+    """Register `text_content()` on every SQLite connection, whichever engine made it, as the search triggers call it"""
+    if hasattr(dbapi_connection, "create_function"):
+        register_sqlite_functions(dbapi_connection)
+
+def create_db_engine(url: str = DATABASE_URL) -> Engine:
+    """Create an engine configured with the SQLite or server database profile"""
+    if url.startswith("sqlite"):
+        db_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+        return db_engine
+    
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """The URL of the same database with its async driver, e.g. sqlite+aiosqlite://"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() in ASYNC_DRIVERS and parsed.get_driver_name() not in ASYNC_DRIVERS.values():
+        parsed = parsed.set(drivername=f"{parsed.get_backend_name()}+{ASYNC_DRIVERS[parsed.get_backend_name()]}")
+    return parsed.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url()
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL) -> AsyncEngine:
+    """Create an async engine with the same database profile as `create_db_engine`"""
+    if url.startswith("sqlite"):
+        # aiosqlite would open a new connection per session by default
+        db_engine = create_async_engine(
+            url,
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return db_engine
+    
+    return create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# For async routes and tools; rows stay readable after commit, as nothing lazy-loads in async code
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 class ChatSession(Base):
@@ -20,15 +128,89 @@ class ChatSession(Base):
     user_id = Column(String, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     title = Column(String, default="New Chat")
+    # Maintained on every message insert, see _update_session_activity
+    last_activity_at = Column(DateTime, default=datetime.utcnow)
+    message_count = Column(Integer, default=0)
+    preview = Column(String)  # start of the newest message
+    
+    # Not loaded by the app; declared so a flush inserts a new session before its
+    # dependent rows. The database cascades deletes, so children are never nulled.
+    messages = relationship("ChatMessage", lazy="noload", passive_deletes="all")
+    summary = relationship("ConversationSummary", lazy="noload", passive_deletes="all")
+    archived_batches = relationship("ArchivedMessageBatch", lazy="noload", passive_deletes="all")
+    
+    __table_args__ = (
+        Index("ix_chat_sessions_user_created", "user_id", "created_at", "id"),
+        Index("ix_chat_sessions_user_activity", "user_id", "last_activity_at", "id"),
+    )
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
     
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, index=True)
+    session_id = Column(String, ForeignKey("chat_sessions.session_id", ondelete="CASCADE"), index=True)
     role = Column(String)  # "user" or "assistant"
-    content = Column(Text)
+    content = Column(CompressedText)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Serves "messages of a session in time order" without a sort step
+        Index("ix_chat_messages_session_timestamp", "session_id", "timestamp", "id"),
+        # Serves the retention job's scan for old messages
+        Index("ix_chat_messages_timestamp", "timestamp"),
+    )
+
+class ArchivedMessageBatch(Base):
+    """Consecutive old messages of one session, moved out of chat_messages as compressed JSON"""
+    __tablename__ = "archived_message_batches"
+    
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey("chat_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    first_message_id = Column(Integer)
+    last_message_id = Column(Integer)
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
+    message_count = Column(Integer)
+    payload = Column(LargeBinary)  # zlib-compressed JSON list of messages
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_archived_message_batches_session", "session_id", "first_message_id"),
+    )
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("chat_sessions.session_id", ondelete="CASCADE"), unique=True, index=True)
+    summary = Column(Text)
+    last_message_id = Column(Integer)  # newest ChatMessage.id folded into the summary
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ResponseCacheEntry(Base):
+    __tablename__ = "response_cache"
+    
+    key = Column(String, primary_key=True)  # hash of the normalized prompt
+    response = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, index=True)
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_records"
+    
+    key = Column(String, primary_key=True)  # "<user_id>:<Idempotency-Key header>"
+    request_hash = Column(String)
+    response = Column(Text)  # JSON-encoded ChatResponse
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class PlanBlob(Base):
+    """The text of one or more workout plans, stored once under its SHA-256"""
+    __tablename__ = "plan_blobs"
+    
+    content_hash = Column(String, primary_key=True)
+    content = Column(CompressedText)
+    size = Column(Integer)  # length of the text in characters
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 class WorkoutPlan(Base):
     __tablename__ = "workout_plans"
@@ -36,12 +218,305 @@ class WorkoutPlan(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, index=True)
     plan_name = Column(String)
-    plan_content = Column(Text)  # JSON string or structured text
+    # Text of plans that are not deduplicated; read and set through plan_content
+    stored_content = Column("plan_content", CompressedText)
+    # Loads the old hash before it is replaced, so the blob it leaves can be deleted
+    content_hash = column_property(Column(String, ForeignKey("plan_blobs.content_hash"), index=True), active_history=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     session_id = Column(String, index=True)
+    plan_type = Column(String, default="workout")  # "workout", "nutrition" or "combined"
+    plan_data = Column(JSON)  # typed plan, see schema.WorkoutPlanData
+    goals = Column(Text)
+    duration_weeks = Column(Integer)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    exercises = relationship("PlanExercise", cascade="all, delete-orphan", passive_deletes=True)
+    # Loaded with the plan, so its text is available without another query
+    blob = relationship("PlanBlob", lazy="joined")
+    
+    __table_args__ = (
+        Index("ix_workout_plans_user_created", "user_id", "created_at", "id"),
+    )
+    
+    @property
+    def plan_content(self):
+        """Readable text of the plan"""
+        if self.content_hash is not None:
+            return self.blob.content
+        return self.stored_content
+    
+    @plan_content.setter
+    def plan_content(self, text):
+        self.content_hash = None
+        self.stored_content = text
+
+class PlanExercise(Base):
+    """One exercise on one day of a structured plan, denormalized for indexed queries"""
+    __tablename__ = "plan_exercises"
+    
+    id = Column(Integer, primary_key=True)
+    plan_id = Column(Integer, ForeignKey("workout_plans.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(String, nullable=False)
+    plan_type = Column(String)
+    day = Column(Integer)
+    day_name = Column(String)
+    position = Column(Integer)  # order within the day
+    exercise = Column(String, nullable=False)  # normalized name, see plans.normalize_exercise
+    muscle_group = Column(String)
+    sets = Column(Integer)
+    reps = Column(Integer)
+    
+    __table_args__ = (
+        Index("ix_plan_exercises_user_exercise", "user_id", "exercise", "plan_id"),
+        Index("ix_plan_exercises_user_type", "user_id", "plan_type", "plan_id"),
+        Index("ix_plan_exercises_plan_muscle", "plan_id", "muscle_group"),
+    )
+
+# Full-text indexes: (name, table, indexed columns)
+SEARCH_INDEXES = [
+    ("workout_plans_fts", "workout_plans", ("plan_name", "plan_content")),
+    ("chat_messages_fts", "chat_messages", ("content",)),
+]
+
+# SQLite expressions for the readable text of compressed or deduplicated columns; {row} is the row
+SQLITE_COLUMN_TEXT = {
+    ("workout_plans", "plan_content"): (
+        "text_content(coalesce((SELECT content FROM plan_blobs WHERE content_hash = {row}.content_hash), {row}.plan_content))"
+    ),
+    ("chat_messages", "content"): "text_content({row}.content)",
+}
+
+def _sqlite_column_text(table: str, column: str, row: str) -> str:
+    return SQLITE_COLUMN_TEXT.get((table, column), "{row}.{column}").format(row=row, column=column)
+
+def _create_sqlite_search_index(conn, name: str, table: str, columns: tuple):
+    """
+    Create an FTS5 index over `table`, kept in sync by triggers, and fill it if it is new
+    
+    The index reads its text through the `{name}_source` view, which
+    decompresses and resolves deduplicated columns, so snippets show the
+    readable text. An index created over the table itself is rebuilt.
+    """
+    source = f"{name}_source"
+    definition = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).scalar()
+    column_list = ", ".join(columns)
+    new_values = ", ".join(_sqlite_column_text(table, column, "new") for column in columns)
+    old_values = ", ".join(_sqlite_column_text(table, column, "old") for column in columns)
+    source_values = ", ".join(f"{_sqlite_column_text(table, column, table)} AS {column}" for column in columns)
+    
+    # Triggers and the view hold no data, so they are recreated to pick up changes
+    for trigger in ("ai", "ad", "au"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}_{trigger}")
+    if definition is not None and f"content='{source}'" not in definition:
+        conn.exec_driver_sql(f"DROP TABLE {name}")
+        definition = None
+    conn.exec_driver_sql(f"DROP VIEW IF EXISTS {source}")
+    conn.exec_driver_sql(f"CREATE VIEW {source} AS SELECT id, {source_values} FROM {table}")
+    
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+        f"{column_list}, content='{source}', content_rowid='id', tokenize='porter unicode61')"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER {name}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {name}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER {name}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {name}({name}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER {name}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {name}({name}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {name}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+    )
+    if definition is None:
+        # Index rows written before search was added, or before the index read the view
+        conn.exec_driver_sql(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+
+def _create_postgresql_search_index(conn, name: str, table: str, columns: tuple):
+    """Create a GIN index over the English tsvector of `table`'s columns"""
+    document = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+    conn.exec_driver_sql(
+        f"CREATE INDEX IF NOT EXISTS ix_{name} ON {table} USING GIN (to_tsvector('english', {document}))"
+    )
+
+def create_search_indexes(bind: Engine = engine):
+    """Create the full-text indexes used by search.py; other databases fall back to LIKE scans"""
+    create = {
+        "sqlite": _create_sqlite_search_index,
+        "postgresql": _create_postgresql_search_index,
+    }.get(bind.dialect.name)
+    if create is None:
+        return
+    with bind.begin() as conn:
+        for name, table, columns in SEARCH_INDEXES:
+            create(conn, name, table, columns)
+
+@event.listens_for(Session, "before_flush")
+def _deduplicate_plan_content(session, flush_context, instances):
+    """
+    Move the text of new SQLite plans into content-addressed blobs
+    
+    Each distinct text is stored once in plan_blobs, compressed if large,
+    and plans refer to it by hash. The blob is inserted unless it exists,
+    so concurrent writers of the same text do not conflict.
+    """
+    if not PLAN_DEDUP_ENABLED:
+        return
+    plans = [obj for obj in session.new if isinstance(obj, WorkoutPlan) and obj.stored_content is not None]
+    if not plans:
+        return
+    connection = session.connection()
+    if connection.dialect.name != "sqlite":
+        return
+    
+    for plan in plans:
+        text = plan.stored_content
+        blob = PlanBlob(content_hash=content_hash(text), content=text, size=len(text), created_at=datetime.utcnow())
+        connection.execute(
+            sqlite_insert(PlanBlob.__table__)
+            .values(content_hash=blob.content_hash, content=text, size=blob.size, created_at=blob.created_at)
+            .on_conflict_do_nothing()
+        )
+        plan.content_hash = blob.content_hash
+        plan.stored_content = None
+        # The text stays readable on the plan without loading the blob back
+        set_committed_value(plan, "blob", blob)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+@event.listens_for(Session, "before_flush")
+def _collect_replaced_plan_blobs(session, flush_context, instances):
+    """Remember the blobs of plans this flush deletes or gives new text, see _delete_replaced_plan_blobs"""
+    hashes = set()
+    for plan in session.deleted:
+        if isinstance(plan, WorkoutPlan) and plan.content_hash is not None:
+            hashes.add(plan.content_hash)
+    for plan in session.dirty:
+        if isinstance(plan, WorkoutPlan):
+            hashes.update(value for value in inspect(plan).attrs.content_hash.history.deleted if value is not None)
+    if hashes:
+        session.info.setdefault("replaced_plan_blobs", set()).update(hashes)
+
+@event.listens_for(Session, "after_flush")
+def _delete_replaced_plan_blobs(session, flush_context):
+    """Delete the blobs that no plan refers to any more, in the transaction that let go of them"""
+    hashes = session.info.pop("replaced_plan_blobs", None)
+    if hashes:
+        delete_orphaned_plan_blobs(session.connection(), hashes)
+
+def delete_orphaned_plan_blobs(bind, hashes: Optional[Iterable[str]] = None) -> int:
+    """
+    Delete plan blobs that no workout plan refers to
+    
+    Args:
+        bind: Session or connection to run the delete on
+        hashes: Only consider these blobs; all of them if None
+    
+    Returns:
+        int: Number of blobs deleted
+    """
+    blobs = PlanBlob.__table__
+    plans = WorkoutPlan.__table__
+    statement = delete(blobs).where(~exists().where(plans.c.content_hash == blobs.c.content_hash))
+    if hashes is not None:
+        statement = statement.where(blobs.c.content_hash.in_(list(hashes)))
+    return bind.execute(statement).rowcount
+
+@event.listens_for(Session, "after_flush")
+def _update_session_activity(session, flush_context):
+    """Keep each session's message count, last activity and preview in step with inserted messages"""
+    latest = {}
+    counts = {}
+    for obj in session.new:
+        if isinstance(obj, ChatMessage):
+            counts[obj.session_id] = counts.get(obj.session_id, 0) + 1
+            current = latest.get(obj.session_id)
+            if current is None or (obj.timestamp or datetime.min, obj.id) >= (current.timestamp or datetime.min, current.id):
+                latest[obj.session_id] = obj
+    
+    sessions = ChatSession.__table__
+    for session_id, message in latest.items():
+        timestamp = message.timestamp or datetime.utcnow()
+        # Messages older than the session's last activity only add to the count
+        is_newest = or_(sessions.c.last_activity_at.is_(None), sessions.c.last_activity_at <= timestamp)
+        session.connection().execute(
+            update(sessions)
+            .where(sessions.c.session_id == session_id)
+            .values(
+                message_count=func.coalesce(sessions.c.message_count, 0) + counts[session_id],
+                last_activity_at=case((is_newest, timestamp), else_=sessions.c.last_activity_at),
+                preview=case((is_newest, (message.content or "")[:SESSION_PREVIEW_CHARS]), else_=sessions.c.preview)
+            )
+        )
+
+def _session_counters(dialect_name: str) -> dict:
+    """Message count and preview of each session, as subqueries over the messages it has now"""
+    sessions = ChatSession.__table__
+    messages = ChatMessage.__table__
+    of_session = messages.c.session_id == sessions.c.session_id
+    content = func.text_content(messages.c.content) if dialect_name == "sqlite" else messages.c.content
+    return {
+        "message_count": select(func.count()).where(of_session).scalar_subquery(),
+        "preview": select(func.substr(content, 1, SESSION_PREVIEW_CHARS)).where(of_session).order_by(
+            messages.c.timestamp.desc(), messages.c.id.desc()
+        ).limit(1).scalar_subquery()
+    }
+
+def recount_sessions(db: Session, session_ids: List[str]):
+    """Recompute the message count and preview of sessions after their messages were removed, in the caller's transaction"""
+    sessions = ChatSession.__table__
+    db.execute(
+        update(sessions)
+        .where(sessions.c.session_id.in_(session_ids))
+        .values(**_session_counters(db.get_bind().dialect.name))
+    )
+
+def _backfill_session_activity(bind: Engine):
+    """Compute the activity columns of sessions created before they existed"""
+    sessions = ChatSession.__table__
+    messages = ChatMessage.__table__
+    of_session = messages.c.session_id == sessions.c.session_id
+    with bind.begin() as conn:
+        conn.execute(
+            update(sessions)
+            .where(sessions.c.last_activity_at.is_(None))
+            .values(
+                last_activity_at=func.coalesce(
+                    select(func.max(messages.c.timestamp)).where(of_session).scalar_subquery(),
+                    sessions.c.created_at
+                ),
+                **_session_counters(bind.dialect.name)
+            )
+        )
+
+def _add_missing_columns(bind: Engine):
+    """Add nullable columns that were added to a model after its table was created"""
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+def init_db(bind: Engine = engine):
+    """Create missing tables, columns and indexes; run at startup or via `python database.py`"""
+    _add_missing_columns(bind)
+    Base.metadata.create_all(bind=bind)
+    
+    # Create indexes added after the tables were first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    
+    create_search_indexes(bind)
+    _backfill_session_activity(bind)
 
 # Dependency to get database session
 def get_db():
@@ -49,4 +524,13 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+if __name__ == "__main__":
+    init_db()
+    print(f"Database schema is up to date: {DATABASE_URL}")
@@ -0,0 +1,55 @@
+from typing import Optional
+import os
+import threading
+import time
+
+import httpx
+
+# Outbound HTTP configuration for external data tools
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", "0.2"))
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+
+def get_http_client() -> httpx.Client:
+    """Shared connection-pooled client for tools that call external APIs"""
+    global _client
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(
+                timeout=HTTP_TIMEOUT_SECONDS,
+                limits=_limits(),
+                transport=httpx.HTTPTransport(retries=HTTP_RETRIES, limits=_limits())
+            )
+        return _client
+
+def get_json(url: str, params: dict = None) -> dict:
+    """GET a JSON document, retrying timeouts and retryable statuses with exponential backoff"""
+    client = get_http_client()
+    for attempt in range(HTTP_RETRIES + 1):
+        try:
+            response = client.get(url, params=params)
+            if response.status_code not in RETRYABLE_STATUSES or attempt == HTTP_RETRIES:
+                response.raise_for_status()
+                return response.json()
+        except httpx.TimeoutException:
+            if attempt == HTTP_RETRIES:
+                raise
+        time.sleep(HTTP_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+def close_http_client():
+    """Close the shared client and its pooled connections"""
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
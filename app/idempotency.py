@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+
+from database import SessionLocal, IdempotencyRecord
+
+# Idempotency configuration
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused with a different request"""
+
+def request_fingerprint(*parts) -> str:
+    """Hash the parts of a request that must match for a replay"""
+    payload = json.dumps(parts, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def new_idempotency_record(key: str, request_hash: str, response: dict) -> IdempotencyRecord:
+    """Build the stored result of a completed request without writing it"""
+    return IdempotencyRecord(
+        key=key,
+        request_hash=request_hash,
+        response=json.dumps(response),
+        created_at=datetime.utcnow()
+    )
+
+def get_idempotency_record(db: Session, key: str) -> Optional[IdempotencyRecord]:
+    """Get the stored result for a key, removing it if it has expired"""
+    record = db.query(IdempotencyRecord).filter(IdempotencyRecord.key == key).first()
+    if record is None:
+        return None
+    if record.created_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS):
+        db.delete(record)
+        db.commit()
+        return None
+    return record
+
+def _load_stored_response(key: str) -> Optional[Tuple[str, dict]]:
+    db = SessionLocal()
+    try:
+        record = get_idempotency_record(db, key)
+        if record is None:
+            return None
+        return record.request_hash, json.loads(record.response)
+    finally:
+        db.close()
+
+class SingleFlight:
+    """
+    Deduplicates requests that share an idempotency key
+    
+    Concurrent duplicates wait on the computation already in flight, and
+    duplicates of a completed request get the stored result. The
+    computation is responsible for storing its result (see
+    new_idempotency_record) in the same transaction as its other writes.
+    """
+    
+    def __init__(self):
+        self._in_flight: Dict[str, Tuple[str, asyncio.Task]] = {}
+    
+    async def run(self, key: str, request_hash: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            stored = await run_in_threadpool(_load_stored_response, key)
+            if stored is not None:
+                stored_hash, response = stored
+                if stored_hash != request_hash:
+                    raise IdempotencyConflict(key)
+                return response
+            # Another duplicate may have started while the lookup ran
+            in_flight = self._in_flight.get(key)
+        
+        if in_flight is None:
+            task = asyncio.create_task(compute())
+            in_flight = (request_hash, task)
+            self._in_flight[key] = in_flight
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        
+        task_hash, task = in_flight
+        if task_hash != request_hash:
+            raise IdempotencyConflict(key)
+        
+        # Shielded so a disconnecting client does not cancel the work its duplicates wait on
+        return await asyncio.shield(task)
+
+single_flight = SingleFlight()
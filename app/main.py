@@ -1,28 +1,67 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Query, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from contextlib import aclosing, asynccontextmanager
+import anyio
+import asyncio
+import json
+import time
 
-from database import get_db
-from schema import ChatRequest, ChatResponse, ChatHistory, SessionList, ChatSession, FitnessPlanList
+from database import get_async_db, get_db, AsyncSessionLocal, async_engine, engine, init_db
+from schema import BatchChatRequest, BulkDeleteRequest, ChatRequest, ChatResponse, ChatHistory, SessionList, ChatSession, FitnessPlan, FitnessPlanCreate, FitnessPlanList
 from chat import FitnessChat
+from context import CONTEXT_MAX_MESSAGES
+from summarizer import ConversationSummarizer
+from batch import BATCH_CHAT_CONCURRENCY, run_batch
+from session_cache import session_cache
+from persistence import TurnWrites, apersist_turn, batch_writer, write_behind
+from idempotency import IdempotencyConflict, new_idempotency_record, request_fingerprint, single_flight
+from resilience import UpstreamError
+from metrics import CONTENT_TYPE, MetricsMiddleware, instrument_engine, metrics, phase_timer, record_context_trim, record_phase
 
 from utils import (
-    create_chat_session, 
-    save_message, 
-    get_chat_history, 
+    acreate_chat_session,
+    aget_session_context,
+    new_chat_session,
+    new_message,
+    get_chat_history_page,
     get_user_sessions,
     delete_chat_session,
+    delete_chat_sessions,
     update_session_title
 )
-from tools import get_user_workout_plans
+from tools import get_user_workout_plans, get_workout_plan
+from search import search_messages, search_plans
+from plans import build_plan, plans_with_exercise, weekly_volume
+from pydantic import ValidationError
+from registry import tool_registry
+from http_client import close_http_client
+from retention import get_archived_messages, retention_job
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    await run_in_threadpool(init_db)
+    retention_job.start()
+    yield
+    await run_in_threadpool(retention_job.stop)
+    # Flush turns still waiting in the write-behind queues
+    await run_in_threadpool(write_behind.stop)
+    await run_in_threadpool(batch_writer.stop)
+    close_http_client()
+    await async_engine.dispose()
 
 # Create FastAPI app
 app = FastAPI(
     title="Fitness Chat API",
     description="A fitness-focused chat API powered by AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -34,8 +73,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count and time requests and database statements for /metrics
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 # Initialize chat service
 fitness_chat = FitnessChat()
+summarizer = ConversationSummarizer(fitness_chat)
+
+async def load_conversation_context(db: AsyncSession, session_id: str, message: str):
+    """
+    Load the running summary and recent history of a session, fitted to the context budget
+    
+    Sessions seen recently by this worker come from the session cache without a query.
+    The session's connection is released afterwards so it is not held while waiting on the model.
+    Raises a 404 if the session does not exist.
+    """
+    try:
+        session = await aget_session_context(db, session_id, CONTEXT_MAX_MESSAGES)
+        if session is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found"
+            )
+        context = fitness_chat.get_conversation_context(
+            session.history(),
+            message,
+            summary=session.summary
+        )
+        record_context_trim(context.dropped_messages, context.dropped_tokens)
+        return context.messages
+    finally:
+        await db.close()
 
 @app.get("/")
 async def root():
@@ -47,50 +117,282 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Response cache counters, the fingerprint of the cached prompt prefix, and session cache counters"""
+    return {
+        "enabled": fitness_chat.cache.enabled,
+        **fitness_chat.cache.metrics.as_dict(),
+        "prompt_prefix": fitness_chat.prefix.fingerprint,
+        "sessions": session_cache.stats()
+    }
+
+async def run_chat_turn(request: ChatRequest, background_tasks: BackgroundTasks, db: AsyncSession, idempotency: Optional[Tuple[str, str]] = None) -> dict:
+    """
+    Run one chat turn and commit everything it wrote in a single transaction
+    
+    Args:
+        request: The chat request
+        background_tasks: Tasks to run after the response is sent
+        db: Database session
+        idempotency: Optional (key, request hash); the response is stored under the key with the turn
+    
+    Returns:
+        dict: JSON-compatible ChatResponse
+    """
+    # Rows written during this turn are committed together at the end
+    turn, session_id, history = await start_chat_turn(request, db)
+    
+    # Generate AI response
+    steps = []
+    ai_response = await fitness_chat.generate_response(
+        request.message, 
+        history, 
+        user_id=request.user_id, 
+        session_id=session_id,
+        turn=turn,
+        steps=steps
+    )
+    record_steps(steps)
+    
+    # Stage AI response and commit the turn
+    turn.add(new_message(session_id, "assistant", ai_response))
+    response = ChatResponse(
+        response=ai_response,
+        session_id=session_id,
+        timestamp=datetime.utcnow()
+    ).model_dump(mode="json")
+    if idempotency:
+        turn.add(new_idempotency_record(*idempotency, response))
+    
+    with phase_timer("persist"):
+        pending = await apersist_turn(db, turn)
+        if pending is not None and idempotency:
+            # Replays must find the stored response, so wait for the write-behind commit
+            await asyncio.wrap_future(pending)
+    
+    # Fold older turns into the running summary once the session grows long
+    background_tasks.add_task(summarizer.maybe_compact, session_id)
+    
+    return response
+
+async def start_chat_turn(request: ChatRequest, db: AsyncSession) -> Tuple[TurnWrites, str, List[Dict[str, str]]]:
+    """
+    Stage the new session, if any, and the user message of a chat turn, and load its context
+    
+    Returns:
+        tuple: The turn's staged writes, its session ID, and the summary and recent history that fit the context budget
+    """
+    turn = TurnWrites()
+    session_id = request.session_id
+    
+    # Create new session if none provided
+    if not session_id:
+        session_id = turn.add(new_chat_session(request.user_id)).session_id
+        history = []
+    else:
+        with phase_timer("history"):
+            history = await load_conversation_context(db, session_id, request.message)
+    
+    # Stage user message
+    turn.add(new_message(session_id, "user", request.message))
+    return turn, session_id, history
+
+def check_upstream_available():
+    """Fail fast with a 503 while the LLM provider is known to be down"""
+    breaker = fitness_chat.upstream.breaker
+    if breaker.is_open():
+        raise upstream_http_error(breaker.unavailable())
+
+def record_steps(steps):
+    """Record the model and tool time of each agent step as chat phases"""
+    for step in steps:
+        record_phase("completion", step.model_seconds)
+        if step.tools:
+            record_phase("tools", step.tool_seconds)
+
+async def _run_idempotent_chat_turn(request: ChatRequest, background_tasks: BackgroundTasks, idempotency: Tuple[str, str]) -> dict:
+    """Run a chat turn shared by duplicate requests, with its own database session"""
+    async with AsyncSessionLocal() as db:
+        return await run_chat_turn(request, background_tasks, db, idempotency)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Request, chat phase, token, tool and database metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/tools/stats")
+async def tools_stats():
+    """Per-tool call, error and latency counters"""
+    return tool_registry.stats()
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
-    """Send a message and get AI response with tool calling capabilities"""
+async def chat(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """
+    Send a message and get AI response with tool calling capabilities
+    
+    Retries that send the same Idempotency-Key header share the original
+    turn: while it runs they wait for it, and afterwards they get its
+    stored response.
+    """
     try:
-        session_id = request.session_id
-        
-        # Create new session if none provided
-        if not session_id:
-            session_id = create_chat_session(db, request.user_id)
-        
-        # Get conversation history
-        history = get_chat_history(db, session_id)
+        if not idempotency_key:
+            return await run_chat_turn(request, background_tasks, db)
         
-        # Save user message
-        save_message(db, session_id, "user", request.message)
-        
-        # Generate AI response
-        ai_response = fitness_chat.generate_response(
-            request.message, 
-            history, 
-            user_id=request.user_id, 
-            session_id=session_id
+        key = f"{request.user_id}:{idempotency_key}"
+        request_hash = request_fingerprint(request.user_id, request.session_id, request.message)
+        return await single_flight.run(
+            key,
+            request_hash,
+            lambda: _run_idempotent_chat_turn(request, background_tasks, (key, request_hash))
         )
         
-        # Save AI response
-        save_message(db, session_id, "assistant", ai_response)
-        
-        return ChatResponse(
-            response=ai_response,
-            session_id=session_id,
-            timestamp=datetime.utcnow()
+    except HTTPException:
+        raise
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
         )
+    except UpstreamError as e:
+        raise upstream_http_error(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing chat request: {str(e)}"
+        )
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    """
+    Send a message and stream the AI response as server-sent events
+    
+    Upstream failures after the stream has started are sent as an `error`
+    event; a turn that fails before any text was streamed is not saved.
+    """
+    check_upstream_available()
+    
+    try:
+        # Rows written during this turn are committed together when the stream ends
+        turn, session_id, history = await start_chat_turn(request, db)
+        
+        # Fold older turns into the running summary once the stream has finished
+        background_tasks.add_task(summarizer.maybe_compact, session_id)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing chat request: {str(e)}"
         )
+    
+    async def event_stream():
+        parts = []
+        steps = []
+        completed = False
+        error = None
+        started = time.perf_counter()
+        yield _sse_event("session", {"session_id": session_id})
+        try:
+            # Closed explicitly on disconnect, so the upstream stream gives back its slot right away
+            async with aclosing(fitness_chat.stream_response(
+                request.message,
+                history,
+                user_id=request.user_id,
+                session_id=session_id,
+                turn=turn,
+                steps=steps
+            )) as deltas:
+                async for delta in deltas:
+                    if not parts:
+                        record_phase("first_delta", time.perf_counter() - started)
+                    parts.append(delta)
+                    yield _sse_event("delta", {"content": delta})
+            completed = True
+        except Exception as e:
+            error = e
+        finally:
+            record_steps(steps)
+            # Persist what was streamed, even if the client disconnected mid-response
+            if parts:
+                turn.add(new_message(session_id, "assistant", "".join(parts)))
+            if parts or error is None:
+                with anyio.CancelScope(shield=True), phase_timer("persist"):
+                    await _persist_streamed_turn(turn)
+        
+        if error is not None:
+            status_code = error.status_code if isinstance(error, UpstreamError) else status.HTTP_500_INTERNAL_SERVER_ERROR
+            yield _sse_event("error", {"status": status_code, "detail": str(error)})
+        if completed:
+            yield _sse_event("done", {"session_id": session_id, "timestamp": datetime.utcnow().isoformat()})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest):
+    """
+    Answer many (user_id, message) items, each in a new session, streaming results as server-sent events
+    
+    Items run with at most `concurrency` in flight and their turns are
+    inserted in grouped commits. Each item is sent as a `result` event as
+    soon as it is saved, or as an `error` event if it failed; a final
+    `done` event counts both.
+    """
+    check_upstream_available()
+    
+    items = [(item.user_id, item.message, item.title) for item in request.items]
+    
+    async def event_stream():
+        succeeded = failed = 0
+        async with aclosing(run_batch(fitness_chat, items, request.concurrency or BATCH_CHAT_CONCURRENCY)) as results:
+            async for index, result in results:
+                if "error" in result:
+                    failed += 1
+                    yield _sse_event("error", {"index": index, **result})
+                else:
+                    succeeded += 1
+                    yield _sse_event("result", {"index": index, **result})
+        yield _sse_event("done", {"succeeded": succeeded, "failed": failed})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def upstream_http_error(error: UpstreamError) -> HTTPException:
+    """Map an upstream LLM failure to a 502, 503 or 504 response"""
+    headers = {"Retry-After": str(int(error.retry_after + 0.999))} if error.retry_after else None
+    return HTTPException(
+        status_code=error.status_code,
+        detail=f"Error processing chat request: {str(error)}",
+        headers=headers
+    )
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _persist_streamed_turn(turn: TurnWrites):
+    """Persist a streamed turn with its own session, independent of the request lifetime"""
+    async with AsyncSessionLocal() as db:
+        await apersist_turn(db, turn)
 
 @app.post("/sessions", response_model=dict)
-async def create_session(user_id: str = "anonymous", title: str = "New Chat", db: Session = Depends(get_db)):
+async def create_session(user_id: str = "anonymous", title: str = "New Chat", db: AsyncSession = Depends(get_async_db)):
     """Create a new chat session"""
     try:
-        session_id = create_chat_session(db, user_id, title)
+        session_id = await acreate_chat_session(db, user_id, title)
         return {"session_id": session_id, "message": "Session created successfully"}
     except Exception as e:
         raise HTTPException(
@@ -99,11 +401,20 @@ async def create_session(user_id: str = "anonymous", title: str = "New Chat", db
         )
 
 @app.get("/sessions/{user_id}", response_model=SessionList)
-async def get_sessions(user_id: str, db: Session = Depends(get_db)):
-    """Get all chat sessions for a user"""
+def get_sessions(
+    user_id: str,
+    before: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    """Get one page of chat sessions for a user with message counts and previews, most recently active first"""
     try:
-        sessions = get_user_sessions(db, user_id)
-        return SessionList(sessions=sessions)
+        sessions, has_more = get_user_sessions(db, user_id, before, limit)
+        return SessionList(
+            sessions=sessions,
+            has_more=has_more,
+            next_before=sessions[-1].id if has_more else None
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -111,15 +422,25 @@ async def get_sessions(user_id: str, db: Session = Depends(get_db)):
         )
 
 @app.get("/chat/{session_id}/history", response_model=ChatHistory)
-async def get_session_history(session_id: str, db: Session = Depends(get_db)):
-    """Get chat history for a specific session"""
+def get_session_history(
+    session_id: str,
+    before: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    """Get one page of chat history for a specific session, newest page first"""
     try:
-        messages = get_chat_history(db, session_id)
+        messages, has_more = get_chat_history_page(db, session_id, before, limit)
         chat_messages = [
-            {"role": msg["role"], "content": msg["content"], "timestamp": datetime.utcnow()}
+            {"id": msg.id, "role": msg.role, "content": msg.content, "timestamp": msg.timestamp}
             for msg in messages
         ]
-        return ChatHistory(session_id=session_id, messages=chat_messages)
+        return ChatHistory(
+            session_id=session_id,
+            messages=chat_messages,
+            has_more=has_more,
+            next_before=messages[0].id if has_more else None
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -127,7 +448,7 @@ async def get_session_history(session_id: str, db: Session = Depends(get_db)):
         )
 
 @app.delete("/sessions/{session_id}")
-async def delete_session(session_id: str, user_id: str, db: Session = Depends(get_db)):
+def delete_session(session_id: str, user_id: str, db: Session = Depends(get_db)):
     """Delete a chat session"""
     try:
         success = delete_chat_session(db, session_id, user_id)
@@ -146,8 +467,40 @@ async def delete_session(session_id: str, user_id: str, db: Session = Depends(ge
             detail=f"Error deleting session: {str(e)}"
         )
 
+@app.post("/sessions/bulk-delete")
+def bulk_delete_sessions(request: BulkDeleteRequest, db: Session = Depends(get_db)):
+    """
+    Delete many of a user's chat sessions in one transaction
+    
+    Sessions that do not exist or belong to another user are reported in
+    `not_found` and left untouched.
+    """
+    try:
+        deleted = delete_chat_sessions(db, request.user_id, request.session_ids)
+        found = set(deleted)
+        return {
+            "deleted": deleted,
+            "not_found": [session_id for session_id in dict.fromkeys(request.session_ids) if session_id not in found]
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error deleting sessions: {str(e)}"
+        )
+
+@app.get("/chat/{session_id}/archive")
+def get_session_archive(session_id: str, db: Session = Depends(get_db)):
+    """Get the messages of a session that were moved to the archive by the retention job, oldest first"""
+    try:
+        return {"session_id": session_id, "messages": get_archived_messages(db, session_id)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving archived messages: {str(e)}"
+        )
+
 @app.put("/sessions/{session_id}/title")
-async def update_title(session_id: str, title: str, user_id: str, db: Session = Depends(get_db)):
+def update_title(session_id: str, title: str, user_id: str, db: Session = Depends(get_db)):
     """Update session title"""
     try:
         success = update_session_title(db, session_id, user_id, title)
@@ -167,10 +520,10 @@ async def update_title(session_id: str, title: str, user_id: str, db: Session =
         )
 
 @app.get("/workout-plans/{user_id}")
-async def get_workout_plans(user_id: str):
-    """Get all workout plans for a user"""
+async def get_workout_plans(user_id: str, before: Optional[int] = None, limit: int = Query(20, ge=1, le=100)):
+    """Get one page of workout plan summaries for a user, newest first"""
     try:
-        result = get_user_workout_plans(user_id)
+        result = await get_user_workout_plans(user_id, before, limit)
         if result["success"]:
             return result
         else:
@@ -184,6 +537,126 @@ async def get_workout_plans(user_id: str):
             detail=f"Error retrieving workout plans: {str(e)}"
         )
 
+@app.get("/search/plans/{user_id}")
+def search_workout_plans(
+    user_id: str,
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Search a user's workout plans by name and content, best match first"""
+    try:
+        plans, has_more = search_plans(db, user_id, q, limit, offset)
+        return {
+            "plans": plans,
+            "count": len(plans),
+            "has_more": has_more,
+            "next_offset": offset + len(plans) if has_more else None
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching workout plans: {str(e)}"
+        )
+
+@app.get("/search/messages/{user_id}")
+def search_chat_messages(
+    user_id: str,
+    q: str = Query(..., min_length=1, max_length=500),
+    session_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Search the text of a user's chat messages, optionally within one session, best match first"""
+    try:
+        messages, has_more = search_messages(db, user_id, q, session_id, limit, offset)
+        return {
+            "messages": messages,
+            "count": len(messages),
+            "has_more": has_more,
+            "next_offset": offset + len(messages) if has_more else None
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching messages: {str(e)}"
+        )
+
+@app.post("/workout-plans/{user_id}", response_model=FitnessPlan)
+def create_workout_plan(user_id: str, plan: FitnessPlanCreate, db: Session = Depends(get_db)):
+    """Save a structured plan; its days and exercises are indexed for exercise and volume queries"""
+    try:
+        workout_plan = build_plan(user_id, **plan.model_dump())
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False)
+        )
+    try:
+        db.add(workout_plan)
+        db.commit()
+        db.refresh(workout_plan)
+        return workout_plan
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error saving workout plan: {str(e)}"
+        )
+
+@app.get("/workout-plans/{user_id}/exercises/{exercise}")
+def get_plans_with_exercise(
+    user_id: str,
+    exercise: str,
+    plan_type: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Get a user's plans that contain an exercise, newest first"""
+    try:
+        plans = plans_with_exercise(db, user_id, exercise, plan_type, limit)
+        return {"plans": plans, "count": len(plans)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving workout plans: {str(e)}"
+        )
+
+@app.get("/workout-plans/{user_id}/{plan_id}/volume")
+def get_plan_volume(user_id: str, plan_id: int, db: Session = Depends(get_db)):
+    """Get the weekly sets and reps per muscle group of a structured plan"""
+    try:
+        found, volume = weekly_volume(db, user_id, plan_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error computing plan volume: {str(e)}"
+        )
+    if not found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Workout plan {plan_id} not found"
+        )
+    return {"plan_id": plan_id, "muscle_groups": volume}
+
+@app.get("/workout-plans/{user_id}/{plan_id}")
+async def get_workout_plan_detail(user_id: str, plan_id: int):
+    """Get a single workout plan with its full content"""
+    result = await get_workout_plan(user_id, plan_id)
+    if result["success"]:
+        return result["plan"]
+    if result.get("not_found"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=result["message"]
+        )
+    raise HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=result["message"]
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
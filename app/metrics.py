@@ -0,0 +1,243 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Metrics configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+TIMING_HEADERS_ENABLED = os.getenv("TIMING_HEADERS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """A monotonically increasing value per label set"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values]
+
+class Histogram:
+    """Bucketed observations per label set, with their count and sum"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Per label set: [count per bucket (last one is +Inf), total count, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, ([*series[0]], series[1], series[2])) for key, series in self._values.items())
+        lines = []
+        for key, (counts, count, total) in values:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+        return lines
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text exposition format"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+    
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter("http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status"))
+http_request_seconds = metrics.histogram("http_request_seconds", "Time to send response headers, by route", ("method", "route"))
+chat_phase_seconds = metrics.histogram("chat_phase_seconds", "Time spent in each phase of a chat turn", ("phase",))
+llm_tokens = metrics.counter("llm_tokens_total", "Tokens reported by the LLM provider", ("model", "kind"))
+tool_calls = metrics.counter("tool_calls_total", "Tool calls by outcome", ("tool", "outcome"))
+tool_call_seconds = metrics.histogram("tool_call_seconds", "Tool execution time", ("tool",))
+cache_events = metrics.counter("cache_events_total", "Response and session cache hits, misses, evictions, expirations and bypasses", ("cache", "event"))
+context_dropped_messages = metrics.counter("context_dropped_messages_total", "History messages left out of the model context to fit the token budget")
+context_dropped_tokens = metrics.counter("context_dropped_tokens_total", "Tokens of the history messages left out of the model context")
+db_queries = metrics.counter("db_queries_total", "Database statements executed", ("operation",))
+db_query_seconds = metrics.histogram("db_query_seconds", "Database statement execution time", ("operation",), DB_BUCKETS)
+
+# Phase timings of the current request, for the Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+def record_phase(phase: str, seconds: float):
+    """Record the duration of one phase of a chat turn"""
+    if not METRICS_ENABLED:
+        return
+    chat_phase_seconds.observe(seconds, phase=phase)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((phase, seconds))
+
+@contextmanager
+def phase_timer(phase: str):
+    """Time the enclosed block as one phase of a chat turn"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+def record_token_usage(model: str, usage):
+    """
+    Count the prompt and completion tokens of a completion response
+    
+    Prompt tokens served from the provider's prompt cache are also counted
+    as `cached_prompt`, so `cached_prompt / prompt` is the cache hit rate.
+    """
+    if not METRICS_ENABLED or usage is None:
+        return
+    llm_tokens.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    llm_tokens.inc(usage.completion_tokens or 0, model=model, kind="completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    llm_tokens.inc(getattr(details, "cached_tokens", None) or 0, model=model, kind="cached_prompt")
+
+def record_context_trim(dropped_messages: int, dropped_tokens: int):
+    """Count the history trimmed from a turn's context, so trimming shows up next to token usage"""
+    if not METRICS_ENABLED:
+        return
+    context_dropped_messages.inc(dropped_messages)
+    context_dropped_tokens.inc(dropped_tokens)
+
+def record_cache_event(cache: str, event: str, amount: int = 1):
+    if not METRICS_ENABLED:
+        return
+    cache_events.inc(amount, cache=cache, event=event)
+
+def record_tool_call(tool: str, seconds: float, error: bool):
+    if not METRICS_ENABLED:
+        return
+    tool_calls.inc(tool=tool, outcome="error" if error else "success")
+    tool_call_seconds.observe(seconds, tool=tool)
+
+def instrument_engine(engine: Engine):
+    """Count and time every statement executed on `engine`"""
+    if not METRICS_ENABLED:
+        return
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_queries.inc(operation=operation)
+        db_query_seconds.observe(seconds, operation=operation)
+    
+    @event.listens_for(engine, "handle_error")
+    def _failed_execute(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that counts and times HTTP requests
+    
+    With TIMING_HEADERS_ENABLED, responses carry a Server-Timing header
+    with the chat phases recorded before the headers were sent.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        timings = []
+        token = _request_timings.set(timings)
+        status = 500
+        
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - started
+                http_request_seconds.observe(elapsed, method=scope["method"], route=_route(scope))
+                if TIMING_HEADERS_ENABLED:
+                    entries = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in timings]
+                    entries.append(f"total;dur={elapsed * 1000:.1f}")
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", ", ".join(entries).encode())]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _request_timings.reset(token)
+            http_requests.inc(method=scope["method"], route=_route(scope), status=status)
+
+def _route(scope) -> str:
+    """The route template of a request, so paths with IDs share one label"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
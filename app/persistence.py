@@ -0,0 +1,232 @@
+from concurrent.futures import Future
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional
+import os
+import queue
+import threading
+import time
+
+from database import SessionLocal, SESSION_PREVIEW_CHARS, ChatMessage, ChatSession
+from session_cache import capture_turn, session_cache
+
+# Write-behind configuration
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "100"))
+WRITE_BEHIND_MAX_DELAY_MS = int(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "50"))
+
+class TurnWrites:
+    """Collects the rows written during one chat turn so they are committed together"""
+    
+    def __init__(self):
+        self.objects = []
+    
+    def add(self, obj):
+        """Stage a row and return it"""
+        self.objects.append(obj)
+        return obj
+
+def commit_turn(db: Session, turn: TurnWrites):
+    """Write all rows of a turn in a single transaction"""
+    if not turn.objects:
+        return
+    try:
+        db.add_all(turn.objects)
+        db.flush()
+        changes = capture_turn(turn.objects)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    session_cache.record_turn(changes)
+
+async def acommit_turn(db: AsyncSession, turn: TurnWrites):
+    """Write all rows of a turn in a single transaction without blocking the event loop"""
+    if not turn.objects:
+        return
+    try:
+        db.add_all(turn.objects)
+        await db.flush()
+        changes = capture_turn(turn.objects)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    session_cache.record_turn(changes)
+
+def add_turns(db: Session, turns: List[TurnWrites]):
+    """Add the rows of many turns to the session, to be written by the next flush"""
+    for turn in turns:
+        db.add_all(turn.objects)
+
+def _column_values(obj) -> Dict[str, Any]:
+    """The column values set on a new row, leaving unset ones to their defaults"""
+    values = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.key)
+        if value is not None:
+            values[column.key] = value
+    return values
+
+def bulk_insert_turns(db: Session, turns: List[TurnWrites]):
+    """
+    Write the new sessions and their messages of many turns with one INSERT per table
+    
+    The ORM flush inserts rows one statement at a time; here the sessions
+    and messages are sent as two executemany statements. As all messages
+    of a new session are in hand, its count, last activity and preview are
+    set before the insert instead of by the after-flush update. Other rows,
+    like saved plans, go through the ORM. Nothing is committed.
+    """
+    objects = [obj for turn in turns for obj in turn.objects]
+    sessions = {obj.session_id: obj for obj in objects if isinstance(obj, ChatSession)}
+    messages = [obj for obj in objects if isinstance(obj, ChatMessage) and obj.session_id in sessions]
+    others = [obj for obj in objects if not isinstance(obj, ChatSession) and not (isinstance(obj, ChatMessage) and obj.session_id in sessions)]
+    
+    # Built as dicts rather than set on the rows, so a retried batch starts over
+    session_rows = {session_id: _column_values(obj) for session_id, obj in sessions.items()}
+    for message in messages:
+        row = session_rows[message.session_id]
+        row["message_count"] = row.get("message_count", 0) + 1
+        if row.get("last_activity_at") is None or message.timestamp >= row["last_activity_at"]:
+            row["last_activity_at"] = message.timestamp
+            row["preview"] = (message.content or "")[:SESSION_PREVIEW_CHARS]
+    
+    if session_rows:
+        db.execute(insert(ChatSession), list(session_rows.values()))
+    if messages:
+        db.execute(insert(ChatMessage), [_column_values(obj) for obj in messages])
+    db.add_all(others)
+
+class WriteBehindQueue:
+    """
+    Batches the writes of many concurrent turns into grouped commits
+    
+    A background thread drains submitted turns and commits up to
+    `max_batch` of them per transaction, waiting at most `max_delay`
+    seconds for a batch to fill. Each turn is still all-or-nothing: if a
+    grouped commit fails, its turns are retried one transaction each.
+    `write` stages a batch of turns on a session before the commit.
+    `stop()` flushes everything submitted before it returns.
+    """
+    
+    _STOP = object()
+    
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_batch: int = WRITE_BEHIND_MAX_BATCH,
+        max_delay_ms: int = WRITE_BEHIND_MAX_DELAY_MS,
+        write: Callable[[Session, List[TurnWrites]], None] = add_turns
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.write = write
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start the background writer thread if it is not running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+    
+    def submit(self, turn: TurnWrites) -> Future:
+        """Queue the rows of a turn; the returned future resolves once they are committed"""
+        self.start()
+        future = Future()
+        self._queue.put((turn, future))
+        return future
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Flush all queued turns and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(self._STOP)
+            self._thread = None
+        thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._commit_batch(batch)
+            if stopping:
+                return
+    
+    def _commit_batch(self, batch: List):
+        db = self.session_factory()
+        changes = None
+        try:
+            self.write(db, [turn for turn, _ in batch])
+            db.flush()
+            captured = [capture_turn(turn.objects) for turn, _ in batch]
+            db.commit()
+            changes = captured
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+        
+        if changes is not None:
+            for (_, future), turn_changes in zip(batch, changes):
+                session_cache.record_turn(turn_changes)
+                future.set_result(None)
+            return
+        
+        # Retry turn by turn so one bad turn does not drop the others
+        for turn, future in batch:
+            db = self.session_factory()
+            try:
+                self.write(db, [turn])
+                db.flush()
+                changes = capture_turn(turn.objects)
+                db.commit()
+                session_cache.record_turn(changes)
+                future.set_result(None)
+            except Exception as e:
+                db.rollback()
+                future.set_exception(e)
+            finally:
+                db.close()
+
+write_behind = WriteBehindQueue()
+
+# Always on, for the turns of batch chat requests
+batch_writer = WriteBehindQueue(write=bulk_insert_turns)
+
+async def apersist_turn(db: AsyncSession, turn: TurnWrites) -> Optional[Future]:
+    """
+    Commit the rows of a turn, or hand them to the write-behind queue when it is enabled
+    
+    Returns:
+        Future: Resolves once a write-behind turn is committed; None if it was committed directly
+    """
+    if WRITE_BEHIND_ENABLED:
+        return write_behind.submit(turn)
+    await acommit_turn(db, turn)
+    return None
@@ -0,0 +1,189 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import re
+
+from database import PlanExercise, WorkoutPlan
+from schema import WorkoutPlanData
+
+# Muscle group assumed for an exercise whose name contains the keyword, first match wins
+MUSCLE_GROUP_KEYWORDS = [
+    ("romanian deadlift", "hamstrings"),
+    ("deadlift", "back"),
+    ("squat", "legs"),
+    ("lunge", "legs"),
+    ("leg press", "legs"),
+    ("leg curl", "hamstrings"),
+    ("leg extension", "legs"),
+    ("calf", "calves"),
+    ("hip thrust", "glutes"),
+    ("glute", "glutes"),
+    ("bench", "chest"),
+    ("push-up", "chest"),
+    ("push up", "chest"),
+    ("fly", "chest"),
+    ("dip", "chest"),
+    ("overhead press", "shoulders"),
+    ("shoulder press", "shoulders"),
+    ("lateral raise", "shoulders"),
+    ("pull-up", "back"),
+    ("pull up", "back"),
+    ("chin-up", "back"),
+    ("row", "back"),
+    ("pulldown", "back"),
+    ("curl", "biceps"),
+    ("tricep", "triceps"),
+    ("skull crusher", "triceps"),
+    ("plank", "core"),
+    ("crunch", "core"),
+    ("sit-up", "core"),
+]
+
+def normalize_exercise(name: str) -> str:
+    """Lowercase an exercise name, collapse whitespace and drop a plural 's' so variants share one key"""
+    name = re.sub(r"\s+", " ", (name or "").strip().lower())
+    if len(name) > 3 and name.endswith("s") and not name.endswith("ss"):
+        name = name[:-1]
+    return name
+
+def muscle_group_for(exercise: str) -> Optional[str]:
+    """Guess the muscle group of a normalized exercise name"""
+    for keyword, group in MUSCLE_GROUP_KEYWORDS:
+        if keyword in exercise:
+            return group
+    return None
+
+def build_plan(
+    user_id: str,
+    plan_name: str,
+    plan_content: Optional[str] = None,
+    session_id: Optional[str] = None,
+    plan_type: str = "workout",
+    plan_data: Optional[Dict[str, Any]] = None,
+    goals: Optional[str] = None,
+    duration_weeks: Optional[int] = None
+) -> WorkoutPlan:
+    """
+    Build a WorkoutPlan row with one PlanExercise row per exercise per day
+    
+    `plan_data` is validated as WorkoutPlanData; a ValidationError is raised
+    if its days or exercises are malformed.
+    """
+    plan_data = plan_data or {}
+    data = WorkoutPlanData.model_validate(plan_data)
+    now = datetime.utcnow()
+    plan = WorkoutPlan(
+        user_id=user_id,
+        plan_name=plan_name,
+        plan_content=plan_content,
+        session_id=session_id,
+        plan_type=plan_type,
+        plan_data={**plan_data, **data.model_dump(exclude_none=True)} if plan_data else None,
+        goals=goals,
+        duration_weeks=duration_weeks,
+        created_at=now,
+        updated_at=now
+    )
+    for day in data.days:
+        for position, item in enumerate(day.exercises):
+            exercise = normalize_exercise(item.name)
+            plan.exercises.append(PlanExercise(
+                user_id=user_id,
+                plan_type=plan_type,
+                day=day.day,
+                day_name=day.name,
+                position=position,
+                exercise=exercise,
+                muscle_group=(item.muscle_group or "").strip().lower() or muscle_group_for(exercise),
+                sets=item.sets,
+                reps=item.reps
+            ))
+    return plan
+
+def plan_to_dict(plan: WorkoutPlan) -> Dict[str, Any]:
+    """A plan with its full content, JSON-compatible"""
+    return {
+        "id": plan.id,
+        "plan_name": plan.plan_name,
+        "plan_type": plan.plan_type or "workout",
+        "plan_content": plan.plan_content,
+        "plan_data": plan.plan_data,
+        "goals": plan.goals,
+        "duration_weeks": plan.duration_weeks,
+        "created_at": plan.created_at.isoformat(),
+        "session_id": plan.session_id
+    }
+
+def plans_with_exercise(db: Session, user_id: str, exercise: str, plan_type: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    A user's plans that contain an exercise, newest first
+    
+    The exercise matches as a normalized prefix, so "deadlift" also finds
+    "deadlift (trap bar)", using the (user_id, exercise) index.
+    """
+    prefix = normalize_exercise(exercise)
+    if not prefix:
+        return []
+    matches = db.query(PlanExercise.plan_id).filter(
+        PlanExercise.user_id == user_id,
+        PlanExercise.exercise >= prefix,
+        PlanExercise.exercise < prefix + "\uffff"
+    )
+    if plan_type:
+        matches = matches.filter(PlanExercise.plan_type == plan_type)
+    plans = db.query(
+        WorkoutPlan.id,
+        WorkoutPlan.plan_name,
+        WorkoutPlan.plan_type,
+        WorkoutPlan.created_at
+    ).filter(WorkoutPlan.id.in_(matches.distinct())).order_by(
+        WorkoutPlan.created_at.desc(), WorkoutPlan.id.desc()
+    ).limit(limit).all()
+    if not plans:
+        return []
+    
+    # The matching exercises of each plan and their weekly sets
+    matched: Dict[int, Dict[str, Any]] = {plan.id: {"exercises": set(), "sets": 0} for plan in plans}
+    for row in matches.add_columns(PlanExercise.exercise, PlanExercise.sets).filter(PlanExercise.plan_id.in_(matched)):
+        matched[row.plan_id]["exercises"].add(row.exercise)
+        matched[row.plan_id]["sets"] += row.sets or 0
+    return [
+        {
+            "id": plan.id,
+            "plan_name": plan.plan_name,
+            "plan_type": plan.plan_type or "workout",
+            "created_at": plan.created_at.isoformat(),
+            "exercises": sorted(matched[plan.id]["exercises"]),
+            "weekly_sets": matched[plan.id]["sets"]
+        }
+        for plan in plans
+    ]
+
+def weekly_volume(db: Session, user_id: str, plan_id: int) -> Tuple[bool, List[Dict[str, Any]]]:
+    """
+    Sets and reps per week for each muscle group of a plan, largest first
+    
+    Returns:
+        (found, volume): whether the user owns the plan, and its per-muscle-group totals
+    """
+    owned = db.query(WorkoutPlan.id).filter(WorkoutPlan.id == plan_id, WorkoutPlan.user_id == user_id).first()
+    if owned is None:
+        return False, []
+    rows = db.query(
+        PlanExercise.muscle_group,
+        func.count(PlanExercise.id).label("exercises"),
+        func.sum(PlanExercise.sets).label("sets"),
+        func.sum(PlanExercise.sets * PlanExercise.reps).label("reps")
+    ).filter(PlanExercise.plan_id == plan_id).group_by(PlanExercise.muscle_group).order_by(
+        func.sum(PlanExercise.sets).desc()
+    ).all()
+    return True, [
+        {
+            "muscle_group": row.muscle_group or "other",
+            "exercises": row.exercises,
+            "sets": int(row.sets or 0),
+            "reps": int(row.reps or 0)
+        }
+        for row in rows
+    ]
@@ -0,0 +1,254 @@
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from typing import Any, Callable, Dict, List, Optional, Union, get_args, get_origin, get_type_hints
+import asyncio
+import inspect
+import re
+import threading
+import time
+
+from metrics import record_tool_call
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object", list: "array"}
+
+def _json_schema(annotation) -> Dict[str, Any]:
+    """Map a Python annotation, including lists and pydantic models, to a JSON schema"""
+    if get_origin(annotation) is Union:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    origin = get_origin(annotation)
+    if origin is list and get_args(annotation):
+        return {"type": "array", "items": _json_schema(get_args(annotation)[0])}
+    if inspect.isclass(annotation) and issubclass(annotation, BaseModel):
+        properties = {}
+        for field_name, field in annotation.model_fields.items():
+            properties[field_name] = _json_schema(field.annotation)
+            if field.description:
+                properties[field_name]["description"] = field.description
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": [name for name, field in annotation.model_fields.items() if field.is_required()],
+            "additionalProperties": False
+        }
+    return {"type": JSON_TYPES.get(origin or annotation, "string")}
+
+def canonical_schema(value):
+    """Sort the keys of a JSON schema recursively so equal schemas serialize to identical bytes"""
+    if isinstance(value, dict):
+        return {key: canonical_schema(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [canonical_schema(item) for item in value]
+    return value
+
+def _docstring_args(func: Callable) -> Dict[str, str]:
+    """Parse the `Args:` section of a Google-style docstring"""
+    doc = inspect.getdoc(func) or ""
+    match = re.search(r"Args:\n(.*?)(?:\n\s*\n|\Z)", doc, re.S)
+    if not match:
+        return {}
+    descriptions = {}
+    for line in match.group(1).splitlines():
+        name, sep, description = line.strip().partition(":")
+        if sep:
+            descriptions[name.strip()] = description.strip()
+    return descriptions
+
+class ToolStats:
+    """Thread-safe latency and error counters for one tool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+    
+    def record(self, seconds: float, error: bool):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+    
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "total_seconds": self.total_seconds,
+                "max_seconds": self.max_seconds
+            }
+
+class Tool:
+    """A registered tool: its function, JSON schema and argument validator"""
+    
+    def __init__(self, func: Callable, name: str, description: str, inject: tuple, strict: bool):
+        self.func = func
+        self.name = name
+        self.description = description
+        self.inject = inject
+        self.is_async = inspect.iscoroutinefunction(func)
+        self.stats = ToolStats()
+        
+        hints = get_type_hints(func)
+        arg_descriptions = _docstring_args(func)
+        properties = {}
+        required = []
+        fields = {}
+        for param in inspect.signature(func).parameters.values():
+            if param.name in inject:
+                continue
+            annotation = hints.get(param.name, Any)
+            properties[param.name] = _json_schema(annotation)
+            if param.name in arg_descriptions:
+                properties[param.name]["description"] = arg_descriptions[param.name]
+            if param.default is inspect.Parameter.empty:
+                required.append(param.name)
+                fields[param.name] = (annotation, ...)
+            else:
+                fields[param.name] = (Optional[annotation], param.default)
+        
+        self.parameters = {
+            "type": "object",
+            "properties": properties,
+            "required": required,
+            "additionalProperties": False
+        }
+        self.strict = strict
+        
+        # Compiled once here so each call only pays for validation
+        self.validator = create_model(
+            f"{name}_arguments",
+            __config__=ConfigDict(extra="forbid"),
+            **fields
+        )
+
+class ToolRegistry:
+    """
+    Tools registered once from their typed signatures
+    
+    Schemas are generated at registration and cached in canonical form,
+    sorted by tool name with sorted keys, so the tool list sent to the
+    model does not depend on import order. Arguments are checked with a
+    precompiled pydantic validator, and dispatch is a dictionary lookup.
+    Every call is timed and counted per tool.
+    """
+    
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+        self._chat_schemas: List[Dict[str, Any]] = []
+        self._responses_schemas: List[Dict[str, Any]] = []
+    
+    def tool(self, description: str = None, name: str = None, inject: tuple = (), strict: bool = False):
+        """
+        Register a function as a tool
+        
+        Args:
+            description: Description shown to the model; defaults to the docstring summary
+            name: Tool name; defaults to the function name
+            inject: Parameters supplied by the caller rather than the model
+            strict: Mark the schema as strict for the Responses API
+        """
+        def decorator(func: Callable) -> Callable:
+            tool_name = name or func.__name__
+            summary = (inspect.getdoc(func) or "").split("\n\n")[0].strip()
+            registered = Tool(func, tool_name, description or summary, tuple(inject), strict)
+            self._tools[tool_name] = registered
+            self._chat_schemas.append(canonical_schema({
+                "type": "function",
+                "function": {
+                    "name": tool_name,
+                    "description": registered.description,
+                    "parameters": registered.parameters
+                }
+            }))
+            self._responses_schemas.append(canonical_schema({
+                "type": "function",
+                "name": tool_name,
+                "description": registered.description,
+                "parameters": registered.parameters,
+                "strict": strict
+            }))
+            self._chat_schemas.sort(key=lambda schema: schema["function"]["name"])
+            self._responses_schemas.sort(key=lambda schema: schema["name"])
+            return func
+        return decorator
+    
+    def accepts(self, name: str, param: str) -> bool:
+        """Whether a registered tool takes `param` from the model"""
+        tool = self._tools.get(name)
+        return tool is not None and param in tool.parameters["properties"]
+    
+    def chat_schemas(self) -> List[Dict[str, Any]]:
+        """Tool definitions for the Chat Completions API"""
+        return self._chat_schemas
+    
+    def responses_schemas(self) -> List[Dict[str, Any]]:
+        """Tool definitions for the Responses API"""
+        return self._responses_schemas
+    
+    def call(self, name: str, args: dict, **injected):
+        """Validate arguments and execute a synchronous tool"""
+        tool = self._get(name)
+        if tool.is_async:
+            raise TypeError(f"{name} is async, call it with acall")
+        
+        started = time.perf_counter()
+        error = True
+        try:
+            arguments, result = self._arguments(tool, args, injected)
+            if arguments is not None:
+                result = tool.func(**arguments)
+            error = isinstance(result, dict) and result.get("success") is False
+            return result
+        finally:
+            self._record(tool, started, error)
+    
+    async def acall(self, name: str, args: dict, **injected):
+        """Validate arguments and execute a tool; synchronous tools run in a worker thread"""
+        tool = self._get(name)
+        
+        started = time.perf_counter()
+        error = True
+        try:
+            arguments, result = self._arguments(tool, args, injected)
+            if arguments is not None:
+                if tool.is_async:
+                    result = await tool.func(**arguments)
+                else:
+                    result = await asyncio.to_thread(tool.func, **arguments)
+            error = isinstance(result, dict) and result.get("success") is False
+            return result
+        finally:
+            self._record(tool, started, error)
+    
+    def _get(self, name: str) -> Tool:
+        tool = self._tools.get(name)
+        if tool is None:
+            raise ValueError(f"Unknown function: {name}")
+        return tool
+    
+    def _arguments(self, tool: Tool, args: dict, injected: dict):
+        """Validated arguments with the injected ones added, or None and an error result"""
+        try:
+            arguments = tool.validator.model_validate(args).model_dump()
+        except ValidationError as e:
+            return None, {
+                "success": False,
+                "message": f"Invalid arguments for {tool.name}: {e.errors(include_url=False)}"
+            }
+        
+        for param in tool.inject:
+            if param in injected:
+                arguments[param] = injected[param]
+        return arguments, None
+    
+    def _record(self, tool: Tool, started: float, error: bool):
+        seconds = time.perf_counter() - started
+        tool.stats.record(seconds, error)
+        record_tool_call(tool.name, seconds, error)
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-tool call, error and latency counters"""
+        return {name: tool.stats.as_dict() for name, tool in self._tools.items()}
+
+tool_registry = ToolRegistry()
@@ -0,0 +1,196 @@
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import os
+import random
+import time
+
+import openai
+
+# Upstream LLM resilience configuration
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+class UpstreamError(Exception):
+    """The LLM provider could not produce a completion; maps to an HTTP status"""
+    status_code = 502
+    retry_after: Optional[float] = None
+
+class UpstreamTimeout(UpstreamError):
+    """A completion exceeded its deadline"""
+    status_code = 504
+
+class UpstreamUnavailable(UpstreamError):
+    """The circuit breaker is open or too many completions are already waiting"""
+    status_code = 503
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed completion is worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUSES
+    return False
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures
+    
+    Opens after `failure_threshold` consecutive failures. Once
+    `reset_seconds` have passed, one probe call is let through; its
+    success closes the circuit and its failure re-opens it.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def is_open(self) -> bool:
+        """Whether calls are rejected right now, without claiming the half-open probe"""
+        return self.state == self.OPEN and time.monotonic() < self.opened_at + self.reset_seconds
+    
+    def unavailable(self) -> "UpstreamUnavailable":
+        remaining = self.opened_at + self.reset_seconds - time.monotonic()
+        return UpstreamUnavailable("LLM provider is unavailable, circuit breaker is open", retry_after=max(remaining, 1.0))
+    
+    def before_call(self) -> bool:
+        """
+        Raise UpstreamUnavailable if calls are currently rejected
+        
+        Returns:
+            bool: Whether this call took the half-open probe slot, and must release it
+        """
+        if self.state == self.CLOSED:
+            return False
+        if self.state == self.OPEN and not self.is_open():
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        raise self.unavailable()
+    
+    def release_probe(self):
+        """Give back the probe slot taken by `before_call`, once the probe has ended"""
+        self._probe_in_flight = False
+    
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+class UpstreamGuard:
+    """
+    Bounds, times out, retries and circuit-breaks calls to the LLM provider
+    
+    At most `max_concurrency` calls are in flight; others wait up to
+    `queue_timeout` seconds for a slot. Each attempt has its own deadline.
+    Retryable failures are retried with full-jitter exponential backoff.
+    Streamed completions keep their slot until the stream is consumed or
+    closed; their deadline covers the time to the first response.
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def call(self, create: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        """Run `create(**kwargs)` under the concurrency limit, deadline, retries and circuit breaker"""
+        for attempt in range(self.max_retries + 1):
+            probe = self.breaker.before_call()
+            
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if probe:
+                    self.breaker.release_probe()
+                raise UpstreamUnavailable("Too many requests are waiting for the LLM provider", retry_after=1.0)
+            
+            release = True
+            try:
+                result = await asyncio.wait_for(create(**kwargs), self.timeout)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    if isinstance(e, (asyncio.TimeoutError, openai.APITimeoutError)):
+                        raise UpstreamTimeout(f"LLM provider did not respond within {self.timeout:.0f}s") from e
+                    raise UpstreamError(f"LLM provider error: {e}") from e
+            else:
+                self.breaker.record_success()
+                if kwargs.get("stream"):
+                    release = False
+                    return GuardedStream(result, self._semaphore.release)
+                return result
+            finally:
+                if probe:
+                    self.breaker.release_probe()
+                if release:
+                    self._semaphore.release()
+            
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+class GuardedStream:
+    """A completion stream that gives back its concurrency slot once it ends or is closed"""
+    
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        try:
+            return await self._stream.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+    
+    async def aclose(self):
+        if self._release is None:
+            return
+        release, self._release = self._release, None
+        release()
+        close = getattr(self._stream, "close", None) or getattr(self._stream, "aclose", None)
+        if close is not None:
+            await close()
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import os
+import threading
+import zlib
+
+from database import SessionLocal, ChatMessage, ArchivedMessageBatch, delete_orphaned_plan_blobs, recount_sessions
+from session_cache import session_cache
+
+logger = logging.getLogger(__name__)
+
+# Retention configuration
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", "0"))  # 0 keeps messages forever
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_MAX_BATCHES = int(os.getenv("RETENTION_MAX_BATCHES", "100"))
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+
+def encode_messages(messages: List[Dict[str, Any]]) -> bytes:
+    """Serialize messages as zlib-compressed JSON"""
+    return zlib.compress(json.dumps(messages, separators=(",", ":")).encode(), 6)
+
+def decode_messages(payload: bytes) -> List[Dict[str, Any]]:
+    return json.loads(zlib.decompress(payload))
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """
+    Move up to `batch_size` of the oldest messages sent before `cutoff` into the archive
+    
+    The messages of each session become one compressed archive row, written
+    in the same transaction that deletes them and recounts the sessions, so
+    their message count and preview cover only the messages still live.
+    
+    Returns:
+        int: Number of messages archived
+    """
+    rows = db.query(
+        ChatMessage.id, ChatMessage.session_id, ChatMessage.role, ChatMessage.content, ChatMessage.timestamp
+    ).filter(
+        ChatMessage.timestamp < cutoff
+    ).order_by(ChatMessage.timestamp, ChatMessage.id).limit(batch_size).all()
+    if not rows:
+        return 0
+    
+    by_session: Dict[str, list] = {}
+    for row in rows:
+        by_session.setdefault(row.session_id, []).append(row)
+    
+    try:
+        for session_id, messages in by_session.items():
+            messages.sort(key=lambda row: row.id)
+            db.add(ArchivedMessageBatch(
+                session_id=session_id,
+                first_message_id=messages[0].id,
+                last_message_id=messages[-1].id,
+                first_timestamp=messages[0].timestamp,
+                last_timestamp=messages[-1].timestamp,
+                message_count=len(messages),
+                payload=encode_messages([
+                    {"id": row.id, "role": row.role, "content": row.content, "timestamp": row.timestamp.isoformat()}
+                    for row in messages
+                ])
+            ))
+        db.query(ChatMessage).filter(ChatMessage.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+        recount_sessions(db, list(by_session))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for session_id in by_session:
+        session_cache.invalidate(session_id)
+    return len(rows)
+
+def archive_old_messages(
+    retention_days: int = MESSAGE_RETENTION_DAYS,
+    batch_size: int = RETENTION_BATCH_SIZE,
+    max_batches: int = RETENTION_MAX_BATCHES,
+    session_factory=SessionLocal
+) -> int:
+    """
+    Archive messages older than `retention_days`, one transaction per batch
+    
+    Stops after `max_batches` so a large backlog is worked off over several
+    runs instead of holding the database in one long job.
+    
+    Returns:
+        int: Number of messages archived
+    """
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    archived = 0
+    db = session_factory()
+    try:
+        for _ in range(max_batches):
+            count = archive_batch(db, cutoff, batch_size)
+            archived += count
+            if count < batch_size:
+                break
+    finally:
+        db.close()
+    return archived
+
+def sweep_plan_blobs(session_factory=SessionLocal) -> int:
+    """
+    Delete plan blobs left without a plan
+    
+    Plans deleted or rewritten through the ORM release their blob in the
+    same transaction; this catches the ones removed by bulk statements.
+    
+    Returns:
+        int: Number of blobs deleted
+    """
+    db = session_factory()
+    try:
+        deleted = delete_orphaned_plan_blobs(db)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+def get_archived_messages(db: Session, session_id: str) -> List[Dict[str, Any]]:
+    """Archived messages of a session, oldest first"""
+    batches = db.query(ArchivedMessageBatch.payload).filter(
+        ArchivedMessageBatch.session_id == session_id
+    ).order_by(ArchivedMessageBatch.first_message_id).all()
+    messages = []
+    for batch in batches:
+        messages.extend(decode_messages(batch.payload))
+    return messages
+
+class RetentionJob:
+    """Runs `archive_old_messages` and `sweep_plan_blobs` in a background thread every `interval` seconds"""
+    
+    def __init__(self, interval: float = RETENTION_INTERVAL_SECONDS, retention_days: int = MESSAGE_RETENTION_DAYS):
+        self.interval = interval
+        self.retention_days = retention_days
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self.retention_days > 0
+    
+    def start(self):
+        """Start the job thread if retention is enabled and it is not running"""
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the job thread, letting a running batch finish"""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                archived = archive_old_messages(self.retention_days)
+                if archived:
+                    logger.info("Archived %d messages older than %d days", archived, self.retention_days)
+                swept = sweep_plan_blobs()
+                if swept:
+                    logger.info("Deleted %d plan blobs no plan refers to", swept)
+            except Exception:
+                logger.exception("Message retention run failed")
+            self._stop.wait(self.interval)
+
+retention_job = RetentionJob()
+
+if __name__ == "__main__":
+    print(f"Archived {archive_old_messages()} messages older than {MESSAGE_RETENTION_DAYS} days")
@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 class ChatMessage(BaseModel):
+    id: Optional[int] = None
     role: str
     content: str
     timestamp: Optional[datetime] = None
@@ -12,16 +13,29 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = None
     user_id: Optional[str] = "anonymous"
 
+class BatchChatItem(BaseModel):
+    user_id: str
+    message: str
+    title: str = "New Chat"
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem] = Field(min_length=1, max_length=1000)
+    concurrency: Optional[int] = Field(None, ge=1, le=64)  # defaults to BATCH_CHAT_CONCURRENCY
+
 class ChatResponse(BaseModel):
     response: str
     session_id: str
     timestamp: datetime
 
 class ChatSession(BaseModel):
+    id: Optional[int] = None
     session_id: str
     user_id: str
     title: str
     created_at: datetime
+    last_activity_at: Optional[datetime] = None
+    message_count: int = 0
+    preview: Optional[str] = None  # start of the newest message
     
     class Config:
         from_attributes = True
@@ -29,19 +43,45 @@ class ChatSession(BaseModel):
 class ChatHistory(BaseModel):
     session_id: str
     messages: List[ChatMessage]
+    has_more: bool = False
+    next_before: Optional[int] = None  # pass as `before` to fetch the next (older) page
 
 class SessionList(BaseModel):
     sessions: List[ChatSession]
+    has_more: bool = False
+    next_before: Optional[int] = None  # pass as `before` to fetch the next page
+
+class BulkDeleteRequest(BaseModel):
+    user_id: str
+    session_ids: List[str] = Field(min_length=1, max_length=500)
+
+class PlanExercise(BaseModel):
+    name: str = Field(description="Exercise name, e.g. \"Back squat\"")
+    sets: int = Field(description="Number of working sets")
+    reps: Optional[int] = Field(None, description="Reps per set; the low end of a range like 8-12")
+    muscle_group: Optional[str] = Field(None, description="Main muscle group, e.g. \"legs\", \"back\", \"chest\"")
+    rest_seconds: Optional[int] = Field(None, description="Rest between sets in seconds")
+    notes: Optional[str] = None
+
+class PlanDay(BaseModel):
+    day: int = Field(description="Day number within the week, starting at 1")
+    name: Optional[str] = Field(None, description="Name of the session, e.g. \"Lower body\"")
+    exercises: List[PlanExercise]
+
+class WorkoutPlanData(BaseModel):
+    """Typed content of a workout plan: one week of training days"""
+    days: List[PlanDay] = []
 
 class FitnessPlan(BaseModel):
     id: Optional[int] = None
     user_id: str
-    session_id: str
+    session_id: Optional[str] = None
     plan_name: str
-    plan_type: str  # "workout", "nutrition", "combined"
-    plan_data: Dict[str, Any]
-    goals: str
-    duration_weeks: int
+    plan_type: str = "workout"  # "workout", "nutrition", "combined"
+    plan_content: Optional[str] = None
+    plan_data: Optional[Dict[str, Any]] = None
+    goals: Optional[str] = None
+    duration_weeks: Optional[int] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
@@ -50,10 +90,12 @@ class FitnessPlan(BaseModel):
 
 class FitnessPlanCreate(BaseModel):
     plan_name: str
-    plan_type: str
-    plan_data: Dict[str, Any]
-    goals: str
+    plan_type: str = "workout"
+    plan_content: Optional[str] = None
+    plan_data: Dict[str, Any] = {}
+    goals: Optional[str] = None
     duration_weeks: int = 12
+    session_id: Optional[str] = None
 
 class FitnessPlanList(BaseModel):
-    plans: List[FitnessPlan]
\ No newline at end of file
+    plans: List[FitnessPlan]
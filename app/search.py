@@ -0,0 +1,145 @@
+from sqlalchemy import DateTime, Float, text
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+import re
+
+# Longest query, in terms, that is sent to the index
+MAX_QUERY_TERMS = 16
+
+SNIPPET_CHARS = 200
+
+# Ranked plan search per dialect; SQLite's bm25 is negated so a higher score is better
+PLAN_SEARCH_SQL = {
+    "sqlite": """
+        SELECT p.id, p.plan_name, p.created_at, p.session_id,
+               snippet(workout_plans_fts, 1, '[', ']', '...', 24) AS snippet,
+               -bm25(workout_plans_fts, 5.0, 1.0) AS score
+        FROM workout_plans_fts JOIN workout_plans p ON p.id = workout_plans_fts.rowid
+        WHERE workout_plans_fts MATCH :query AND p.user_id = :user_id
+        ORDER BY score DESC, p.id DESC
+        LIMIT :limit OFFSET :offset
+    """,
+    "postgresql": """
+        SELECT id, plan_name, created_at, session_id,
+               ts_headline('english', coalesce(plan_content, ''), q, 'StartSel=[, StopSel=], MaxWords=24, MinWords=8') AS snippet,
+               ts_rank(to_tsvector('english', coalesce(plan_name, '') || ' ' || coalesce(plan_content, '')), q) AS score
+        FROM workout_plans, to_tsquery('english', :query) q
+        WHERE user_id = :user_id
+          AND to_tsvector('english', coalesce(plan_name, '') || ' ' || coalesce(plan_content, '')) @@ q
+        ORDER BY score DESC, id DESC
+        LIMIT :limit OFFSET :offset
+    """,
+}
+
+MESSAGE_SEARCH_SQL = {
+    "sqlite": """
+        SELECT m.id, m.session_id, m.role, m.timestamp,
+               snippet(chat_messages_fts, 0, '[', ']', '...', 24) AS snippet,
+               -bm25(chat_messages_fts) AS score
+        FROM chat_messages_fts
+        JOIN chat_messages m ON m.id = chat_messages_fts.rowid
+        JOIN chat_sessions s ON s.session_id = m.session_id
+        WHERE chat_messages_fts MATCH :query AND s.user_id = :user_id
+          AND (:session_id IS NULL OR m.session_id = :session_id)
+        ORDER BY score DESC, m.id DESC
+        LIMIT :limit OFFSET :offset
+    """,
+    "postgresql": """
+        SELECT m.id, m.session_id, m.role, m.timestamp,
+               ts_headline('english', coalesce(m.content, ''), q, 'StartSel=[, StopSel=], MaxWords=24, MinWords=8') AS snippet,
+               ts_rank(to_tsvector('english', coalesce(m.content, '')), q) AS score
+        FROM chat_messages m
+        JOIN chat_sessions s ON s.session_id = m.session_id,
+             to_tsquery('english', :query) q
+        WHERE s.user_id = :user_id
+          AND (CAST(:session_id AS VARCHAR) IS NULL OR m.session_id = :session_id)
+          AND to_tsvector('english', coalesce(m.content, '')) @@ q
+        ORDER BY score DESC, m.id DESC
+        LIMIT :limit OFFSET :offset
+    """,
+}
+
+def query_terms(query: str) -> List[str]:
+    """Split free text into search terms, dropping index query syntax"""
+    return re.findall(r"\w+", (query or "").lower())[:MAX_QUERY_TERMS]
+
+def _index_query(dialect: str, terms: List[str]) -> str:
+    """Match any term as a prefix; ranking puts documents matching more terms first"""
+    if dialect == "sqlite":
+        return " OR ".join(f'"{term}"*' for term in terms)
+    return " | ".join(f"{term}:*" for term in terms)
+
+def _like_filter(columns: List[str], terms: List[str]) -> Tuple[str, Dict[str, str]]:
+    """A LIKE condition matching any term in any column, for databases without a full-text index"""
+    params = {f"term_{i}": f"%{term}%" for i, term in enumerate(terms)}
+    conditions = [f"{column} LIKE :{name}" for name in params for column in columns]
+    return "(" + " OR ".join(conditions) + ")", params
+
+def _run_search(db: Session, sql: str, params: Dict[str, Any], limit: int, time_column: str) -> Tuple[List[Dict[str, Any]], bool]:
+    statement = text(sql).columns(**{time_column: DateTime, "score": Float})
+    rows = db.execute(statement, {**params, "limit": limit + 1}).mappings().all()
+    results = []
+    for row in rows[:limit]:
+        result = dict(row)
+        result[time_column] = result[time_column].isoformat() if result[time_column] else None
+        results.append(result)
+    return results, len(rows) > limit
+
+def search_plans(db: Session, user_id: str, query: str, limit: int = 10, offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Search a user's workout plans by name and content, best match first
+    
+    Returns:
+        (plans, has_more): Plan summaries with a highlighted snippet and score
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+    
+    dialect = db.get_bind().dialect.name
+    params = {"user_id": user_id, "offset": offset}
+    sql = PLAN_SEARCH_SQL.get(dialect)
+    if sql is not None:
+        params["query"] = _index_query(dialect, terms)
+    else:
+        condition, like_params = _like_filter(["plan_name", "plan_content"], terms)
+        params.update(like_params)
+        sql = f"""
+            SELECT id, plan_name, created_at, session_id,
+                   substr(plan_content, 1, {SNIPPET_CHARS}) AS snippet, NULL AS score
+            FROM workout_plans
+            WHERE user_id = :user_id AND {condition}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit OFFSET :offset
+        """
+    return _run_search(db, sql, params, limit, "created_at")
+
+def search_messages(db: Session, user_id: str, query: str, session_id: Optional[str] = None, limit: int = 20, offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Search the text of a user's chat messages, optionally within one session, best match first
+    
+    Returns:
+        (messages, has_more): Message references with a highlighted snippet and score
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+    
+    dialect = db.get_bind().dialect.name
+    params = {"user_id": user_id, "session_id": session_id, "offset": offset}
+    sql = MESSAGE_SEARCH_SQL.get(dialect)
+    if sql is not None:
+        params["query"] = _index_query(dialect, terms)
+    else:
+        condition, like_params = _like_filter(["m.content"], terms)
+        params.update(like_params)
+        sql = f"""
+            SELECT m.id, m.session_id, m.role, m.timestamp,
+                   substr(m.content, 1, {SNIPPET_CHARS}) AS snippet, NULL AS score
+            FROM chat_messages m JOIN chat_sessions s ON s.session_id = m.session_id
+            WHERE s.user_id = :user_id AND (:session_id IS NULL OR m.session_id = :session_id)
+              AND {condition}
+            ORDER BY m.timestamp DESC, m.id DESC
+            LIMIT :limit OFFSET :offset
+        """
+    return _run_search(db, sql, params, limit, "timestamp")
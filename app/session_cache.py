@@ -0,0 +1,265 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, Tuple
+import itertools
+import os
+import threading
+
+from cache import CacheMetrics
+from context import CONTEXT_MAX_MESSAGES
+from database import ChatMessage, ChatSession
+
+# Session cache configuration; off by default because the cache is per process
+# and the built-in invalidation channel does not reach other workers
+SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_CACHE_BROADCAST = os.getenv("SESSION_CACHE_BROADCAST", "false").lower() in ("1", "true", "yes")
+
+# Rough per-object overhead counted on top of the text an entry holds
+ENTRY_OVERHEAD_BYTES = 256
+MESSAGE_OVERHEAD_BYTES = 64
+
+@dataclass
+class CachedSession:
+    """
+    A session's metadata, running summary and recent message window
+    
+    `messages` are the newest (id, role, content) messages after the
+    summary, oldest first. `complete` is False when older messages after
+    the summary were left out of the window.
+    """
+    session_id: str
+    user_id: str
+    title: str
+    summary: Optional[str] = None
+    summary_last_message_id: Optional[int] = None
+    messages: List[Tuple[int, str, str]] = field(default_factory=list)
+    complete: bool = True
+    
+    def history(self) -> List[Dict[str, str]]:
+        """The message window as chat messages, copied so callers cannot change the cache"""
+        return [{"role": role, "content": content} for _, role, content in self.messages]
+    
+    def size(self) -> int:
+        """Approximate memory held by the entry, by the length of its text"""
+        return (
+            ENTRY_OVERHEAD_BYTES
+            + len(self.session_id) + len(self.user_id) + len(self.title or "") + len(self.summary or "")
+            + sum(MESSAGE_OVERHEAD_BYTES + len(content or "") for _, _, content in self.messages)
+        )
+
+class LocalInvalidationChannel:
+    """
+    Fans session invalidations out to every cache subscribed in this process
+    
+    Stands in for a pub/sub channel such as Redis between workers: a
+    replacement only needs the same `publish` and `subscribe` methods.
+    """
+    
+    def __init__(self):
+        self._subscribers: List[Callable[[str, str], None]] = []
+        self._lock = threading.Lock()
+    
+    def subscribe(self, callback: Callable[[str, str], None]):
+        """Call `callback(sender, session_id)` for every published invalidation"""
+        with self._lock:
+            self._subscribers.append(callback)
+    
+    def publish(self, sender: str, session_id: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(sender, session_id)
+
+class SessionCache:
+    """
+    Per-process LRU cache of session metadata and recent history
+    
+    Entries are filled on a miss by the first turn that reads the session
+    and then kept current write-through: committed turns append their
+    messages, and summary and title updates replace the entry. Entries are
+    never changed in place, so a reader always sees a consistent one.
+    Deletes and archival drop it. Entries are evicted least recently used
+    first once their text exceeds `max_bytes`.
+    
+    With a `channel`, every write also tells the other workers' caches to
+    drop the session, so a session served by several workers is reloaded
+    rather than read stale.
+    """
+    
+    _ids = itertools.count(1)
+    
+    def __init__(self, max_bytes: int = SESSION_CACHE_MAX_BYTES, max_messages: int = CONTEXT_MAX_MESSAGES, enabled: bool = SESSION_CACHE_ENABLED, channel: Optional[LocalInvalidationChannel] = None):
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.enabled = enabled
+        self.metrics = CacheMetrics("session")
+        self.channel = channel
+        self.name = f"session-cache-{next(self._ids)}"
+        self._entries: "OrderedDict[str, Tuple[CachedSession, int]]" = OrderedDict()
+        self._bytes = 0
+        # Sessions being loaded from the database, and whether a write made that load stale
+        self._loading: Dict[str, List] = {}
+        self._lock = threading.RLock()
+        if channel is not None:
+            channel.subscribe(self._on_invalidation)
+    
+    def get(self, session_id: str) -> Optional[CachedSession]:
+        """Look up a session, counting the hit or miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._entries.get(session_id)
+            if item is None:
+                self.metrics.incr("misses")
+                return None
+            self._entries.move_to_end(session_id)
+            self.metrics.incr("hits")
+            return item[0]
+    
+    def peek(self, session_id: str) -> Optional[CachedSession]:
+        """Look up a session without counting it or refreshing its recency"""
+        with self._lock:
+            item = self._entries.get(session_id)
+            return item[0] if item else None
+    
+    def begin_load(self, session_id: str):
+        """Mark a session as being read from the database, see `finish_load`"""
+        with self._lock:
+            loading = self._loading.setdefault(session_id, [0, False])
+            loading[0] += 1
+    
+    def finish_load(self, session_id: str, entry: Optional[CachedSession]):
+        """Store a loaded entry, unless the session was written while it was being read"""
+        with self._lock:
+            loading = self._loading.get(session_id)
+            if loading is None:
+                return
+            loading[0] -= 1
+            if loading[0] == 0:
+                del self._loading[session_id]
+            if entry is not None and not loading[1] and self.enabled:
+                self._store(entry)
+    
+    def record_session(self, session_id: str, user_id: str, title: str, messages: List[Tuple[int, str, str]]):
+        """Cache a session created with all of its messages"""
+        with self._lock:
+            self._mark_written(session_id)
+            if self.enabled:
+                self._store(CachedSession(session_id, user_id, title, messages=sorted(messages)))
+    
+    def append_messages(self, session_id: str, messages: List[Tuple[int, str, str]]):
+        """Add committed (id, role, content) messages to a cached session"""
+        with self._lock:
+            self._mark_written(session_id)
+            entry = self.peek(session_id)
+            if entry is not None:
+                window = sorted(entry.messages + messages)
+                complete = entry.complete and len(window) <= self.max_messages
+                self._store(replace(entry, messages=window[-self.max_messages:], complete=complete))
+        self._publish(session_id)
+    
+    def set_summary(self, session_id: str, summary: str, last_message_id: int):
+        """Store a new running summary and drop the messages folded into it"""
+        with self._lock:
+            self._mark_written(session_id)
+            entry = self.peek(session_id)
+            if entry is not None:
+                self._store(replace(
+                    entry,
+                    summary=summary,
+                    summary_last_message_id=last_message_id,
+                    messages=[message for message in entry.messages if message[0] > last_message_id]
+                ))
+        self._publish(session_id)
+    
+    def set_title(self, session_id: str, title: str):
+        with self._lock:
+            self._mark_written(session_id)
+            entry = self.peek(session_id)
+            if entry is not None:
+                self._store(replace(entry, title=title))
+        self._publish(session_id)
+    
+    def invalidate(self, session_id: str, broadcast: bool = True):
+        """Drop a session, for writes whose effect on the entry is not known"""
+        with self._lock:
+            self._mark_written(session_id)
+            self._drop(session_id)
+        if broadcast:
+            self._publish(session_id)
+    
+    def record_turn(self, changes: List[Tuple]):
+        """Apply the session and message changes captured by `capture_turn` once they are committed"""
+        sessions = {change[1]: change for change in changes if change[0] == "session"}
+        messages: Dict[str, List[Tuple[int, str, str]]] = {}
+        for change in changes:
+            if change[0] == "message":
+                messages.setdefault(change[1], []).append(change[2:])
+        
+        for session_id in sessions.keys() | messages.keys():
+            session_messages = messages.get(session_id, [])
+            if any(message_id is None for message_id, _, _ in session_messages):
+                # Written without reading back IDs, e.g. by a bulk insert
+                self.invalidate(session_id)
+            elif session_id in sessions:
+                _, _, user_id, title = sessions[session_id]
+                self.record_session(session_id, user_id, title, session_messages)
+            else:
+                self.append_messages(session_id, session_messages)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, **self.metrics.as_dict()}
+    
+    def _store(self, entry: CachedSession):
+        self._drop(entry.session_id)
+        size = entry.size()
+        if size > self.max_bytes:
+            return
+        self._entries[entry.session_id] = (entry, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.metrics.incr("evictions")
+    
+    def _drop(self, session_id: str):
+        item = self._entries.pop(session_id, None)
+        if item is not None:
+            self._bytes -= item[1]
+    
+    def _mark_written(self, session_id: str):
+        loading = self._loading.get(session_id)
+        if loading is not None:
+            loading[1] = True
+    
+    def _publish(self, session_id: str):
+        if self.channel is not None:
+            self.channel.publish(self.name, session_id)
+    
+    def _on_invalidation(self, sender: str, session_id: str):
+        if sender != self.name:
+            self.invalidate(session_id, broadcast=False)
+
+def capture_turn(objects: List) -> List[Tuple]:
+    """
+    Read the session and message changes of flushed rows, before a commit expires them
+    
+    Returns ("session", session_id, user_id, title) and
+    ("message", session_id, id, role, content) tuples for `record_turn`.
+    """
+    changes = []
+    for obj in objects:
+        if isinstance(obj, ChatSession):
+            changes.append(("session", obj.session_id, obj.user_id, obj.title))
+        elif isinstance(obj, ChatMessage):
+            changes.append(("message", obj.session_id, obj.id, obj.role, obj.content))
+    return changes
+
+session_cache = SessionCache(channel=LocalInvalidationChannel() if SESSION_CACHE_BROADCAST else None)
@@ -0,0 +1,82 @@
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+import os
+
+from database import SessionLocal
+from session_cache import session_cache
+from utils import get_session_summary, count_messages_after, get_messages_after, save_session_summary
+
+# Summarization configuration
+SUMMARY_TRIGGER_MESSAGES = int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "30"))
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", "10"))
+SUMMARY_MAX_FOLD = int(os.getenv("SUMMARY_MAX_FOLD", "100"))
+
+class ConversationSummarizer:
+    """Incrementally folds older turns of long sessions into a stored running summary"""
+    
+    def __init__(self, chat, trigger_messages: int = SUMMARY_TRIGGER_MESSAGES, keep_recent: int = SUMMARY_KEEP_RECENT, max_fold: int = SUMMARY_MAX_FOLD):
+        self.chat = chat
+        self.trigger_messages = trigger_messages
+        self.keep_recent = keep_recent
+        self.max_fold = max_fold
+        self._in_progress = set()
+    
+    async def maybe_compact(self, session_id: str) -> bool:
+        """
+        Fold the oldest unsummarized messages into the session summary once
+        the session has grown past the trigger threshold
+        
+        Only messages newer than the stored summary are sent to the model,
+        so each message is summarized once.
+        
+        Returns:
+            bool: True if the summary was updated
+        """
+        if self.trigger_messages <= 0 or session_id in self._in_progress:
+            return False
+        
+        self._in_progress.add(session_id)
+        try:
+            summary, pending = await run_in_threadpool(self._load_pending, session_id)
+            if not pending:
+                return False
+            
+            new_summary = await self.chat.summarize_conversation(
+                summary.summary if summary else None,
+                pending
+            )
+            await run_in_threadpool(self._store, session_id, new_summary, pending[-1]["id"])
+            return True
+        finally:
+            self._in_progress.discard(session_id)
+    
+    def _load_pending(self, session_id: str):
+        """Load the stored summary and the messages that should be folded into it next"""
+        # A complete cached window counts the unsummarized messages without a query
+        cached = session_cache.peek(session_id)
+        if cached is not None and cached.complete and len(cached.messages) < self.trigger_messages:
+            return None, []
+        
+        db = SessionLocal()
+        try:
+            summary = get_session_summary(db, session_id)
+            after_id: Optional[int] = summary.last_message_id if summary else None
+            
+            unsummarized = count_messages_after(db, session_id, after_id)
+            if unsummarized < self.trigger_messages:
+                return summary, []
+            
+            fold_count = min(unsummarized - self.keep_recent, self.max_fold)
+            if fold_count <= 0:
+                return summary, []
+            return summary, get_messages_after(db, session_id, after_id, fold_count)
+        finally:
+            db.close()
+    
+    def _store(self, session_id: str, summary: str, last_message_id: int):
+        """Persist the updated summary"""
+        db = SessionLocal()
+        try:
+            save_session_summary(db, session_id, summary, last_message_id)
+        finally:
+            db.close()
@@ -1,10 +1,36 @@
-from sqlalchemy.orm import Session
-from database import SessionLocal, WorkoutPlan
-from datetime import datetime
+from sqlalchemy import and_, or_, select
+from typing import List
+from database import AsyncSessionLocal, WorkoutPlan
+from schema import PlanDay
+from search import search_plans
+from plans import build_plan, plan_to_dict, plans_with_exercise
+from registry import tool_registry
 import json
 
+# Largest pages a tool returns, whatever limit the model asks for; the same caps as the HTTP endpoints
+MAX_PLANS_PER_PAGE = 100
+MAX_SEARCH_RESULTS = 50
 
-def save_workout_plan(user_id: str, plan_name: str, plan_content: str, session_id: str = None) -> dict:
+def _clamp_limit(limit: int, default: int, maximum: int) -> int:
+    """A model-supplied page size within [1, maximum], or `default` when it was left out"""
+    return max(1, min(limit if limit is not None else default, maximum))
+
+
+@tool_registry.tool(
+    description="Save a workout plan to the user's profile in the database. Include the structured days and exercises of workout plans",
+    inject=("user_id", "turn")
+)
+async def save_workout_plan(
+    user_id: str,
+    plan_name: str,
+    plan_content: str,
+    session_id: str = None,
+    plan_type: str = "workout",
+    goals: str = None,
+    duration_weeks: int = None,
+    days: List[PlanDay] = None,
+    turn=None
+) -> dict:
     """
     Save a workout plan to the database
     
@@ -13,25 +39,39 @@ def save_workout_plan(user_id: str, plan_name: str, plan_content: str, session_i
         plan_name: Name/title of the workout plan
         plan_content: The detailed workout plan content
         session_id: Optional session ID for tracking
+        plan_type: "workout", "nutrition" or "combined"
+        goals: The goals the plan works towards
+        duration_weeks: How many weeks the plan runs
+        days: One week of training days with their exercises, sets and reps
+        turn: Optional TurnWrites; when given, the plan is committed together with the chat turn
     
     Returns:
         dict: Success message with plan ID
     """
     try:
-        db = SessionLocal()
-        
-        workout_plan = WorkoutPlan(
-            user_id=user_id,
-            plan_name=plan_name,
-            plan_content=plan_content,
+        workout_plan = build_plan(
+            user_id,
+            plan_name,
+            plan_content,
             session_id=session_id,
-            created_at=datetime.utcnow()
+            plan_type=plan_type,
+            plan_data={"days": days} if days else None,
+            goals=goals,
+            duration_weeks=duration_weeks
         )
         
-        db.add(workout_plan)
-        db.commit()
-        db.refresh(workout_plan)
-        db.close()
+        if turn is not None:
+            # Written atomically with the turn's messages, so no ID is assigned yet
+            turn.add(workout_plan)
+            return {
+                "success": True,
+                "message": f"Workout plan '{plan_name}' saved successfully!"
+            }
+        
+        # The session is closed, and rolled back on failure, however the block exits
+        async with AsyncSessionLocal() as db:
+            db.add(workout_plan)
+            await db.commit()
         
         return {
             "success": True,
@@ -46,28 +86,54 @@ def save_workout_plan(user_id: str, plan_name: str, plan_content: str, session_i
         }
 
 
-def get_user_workout_plans(user_id: str) -> dict:
+@tool_registry.tool(
+    description="List a user's saved workout plans (ID, name and creation date, newest first). Use get_workout_plan to read a plan's content",
+    inject=("user_id",)
+)
+async def get_user_workout_plans(user_id: str, before: int = None, limit: int = 20) -> dict:
     """
-    Retrieve all workout plans for a specific user
+    Retrieve one page of a user's workout plans, newest first, without their content
     
     Args:
         user_id: The ID of the user
+        before: ID of the last plan of the previous page; omit for the first page
+        limit: Maximum number of plans to return (default 20, at most 100)
     
     Returns:
-        dict: List of workout plans
+        dict: List of plan summaries (id, name, creation time, session)
     """
+    limit = _clamp_limit(limit, 20, MAX_PLANS_PER_PAGE)
     try:
-        db = SessionLocal()
-        
-        plans = db.query(WorkoutPlan).filter(WorkoutPlan.user_id == user_id).all()
-        db.close()
+        async with AsyncSessionLocal() as db:
+            query = select(
+                WorkoutPlan.id,
+                WorkoutPlan.plan_name,
+                WorkoutPlan.created_at,
+                WorkoutPlan.session_id
+            ).where(WorkoutPlan.user_id == user_id)
+            
+            if before is not None:
+                cursor = (await db.execute(select(WorkoutPlan.created_at).where(
+                    WorkoutPlan.id == before,
+                    WorkoutPlan.user_id == user_id
+                ))).first()
+                if cursor is None:
+                    return {"success": True, "plans": [], "count": 0, "has_more": False, "next_before": None}
+                query = query.where(or_(
+                    WorkoutPlan.created_at < cursor.created_at,
+                    and_(WorkoutPlan.created_at == cursor.created_at, WorkoutPlan.id < before)
+                ))
+            
+            plans = (await db.execute(query.order_by(
+                WorkoutPlan.created_at.desc(), WorkoutPlan.id.desc()
+            ).limit(limit + 1))).all()
         
+        has_more = len(plans) > limit
         plan_list = []
-        for plan in plans:
+        for plan in plans[:limit]:
             plan_list.append({
                 "id": plan.id,
                 "plan_name": plan.plan_name,
-                "plan_content": plan.plan_content,
                 "created_at": plan.created_at.isoformat(),
                 "session_id": plan.session_id
             })
@@ -75,7 +141,9 @@ def get_user_workout_plans(user_id: str) -> dict:
         return {
             "success": True,
             "plans": plan_list,
-            "count": len(plan_list)
+            "count": len(plan_list),
+            "has_more": has_more,
+            "next_before": plan_list[-1]["id"] if has_more else None
         }
         
     except Exception as e:
@@ -85,11 +153,117 @@ def get_user_workout_plans(user_id: str) -> dict:
         }
 
 
-def call_function(name: str, args: dict):
-    """Execute the appropriate function based on name"""
-    if name == "save_workout_plan":
-        return save_workout_plan(**args)
-    elif name == "get_user_workout_plans":
-        return get_user_workout_plans(**args)
-    else:
-        raise ValueError(f"Unknown function: {name}")
\ No newline at end of file
+@tool_registry.tool(
+    description="Search a user's saved workout plans by name and content, best match first. Use get_workout_plan to read a plan's content",
+    inject=("user_id",)
+)
+async def search_workout_plans(user_id: str, query: str, limit: int = 5, offset: int = 0) -> dict:
+    """
+    Find the user's workout plans most relevant to a free-text query
+    
+    Args:
+        user_id: The ID of the user
+        query: Words to look for, e.g. "leg day hypertrophy"
+        limit: Maximum number of plans to return (default 5, at most 50)
+        offset: Number of results to skip, for the next page
+    
+    Returns:
+        dict: Matching plan summaries with a snippet of the matching text
+    """
+    limit = _clamp_limit(limit, 5, MAX_SEARCH_RESULTS)
+    offset = max(0, offset or 0)
+    try:
+        async with AsyncSessionLocal() as db:
+            plans, has_more = await db.run_sync(search_plans, user_id, query, limit, offset)
+        return {
+            "success": True,
+            "plans": plans,
+            "count": len(plans),
+            "has_more": has_more,
+            "next_offset": offset + len(plans) if has_more else None
+        }
+        
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error searching workout plans: {str(e)}"
+        }
+
+
+@tool_registry.tool(
+    description="Retrieve the full content of one saved workout plan",
+    inject=("user_id",)
+)
+async def get_workout_plan(user_id: str, plan_id: int) -> dict:
+    """
+    Retrieve a single workout plan with its full content
+    
+    Args:
+        user_id: The ID of the user who owns the plan
+        plan_id: The ID of the workout plan
+    
+    Returns:
+        dict: The workout plan
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            plan = (await db.execute(select(WorkoutPlan).where(
+                WorkoutPlan.id == plan_id,
+                WorkoutPlan.user_id == user_id
+            ))).scalars().first()
+        
+        if plan is None:
+            return {
+                "success": False,
+                "not_found": True,
+                "message": f"Workout plan {plan_id} not found"
+            }
+        
+        return {
+            "success": True,
+            "plan": plan_to_dict(plan)
+        }
+        
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error retrieving workout plan: {str(e)}"
+        }
+
+
+@tool_registry.tool(
+    description="Find a user's saved plans that contain an exercise, e.g. \"deadlift\", with the weekly sets of that exercise",
+    inject=("user_id",)
+)
+async def find_workout_plans_by_exercise(user_id: str, exercise: str, limit: int = 10) -> dict:
+    """
+    Find the user's structured plans containing an exercise, newest first
+    
+    Args:
+        user_id: The ID of the user
+        exercise: Exercise name or the start of it, e.g. "deadlift"
+        limit: Maximum number of plans to return (default 10, at most 100)
+    
+    Returns:
+        dict: Matching plan summaries with the matched exercises and their weekly sets
+    """
+    limit = _clamp_limit(limit, 10, MAX_PLANS_PER_PAGE)
+    try:
+        async with AsyncSessionLocal() as db:
+            plans = await db.run_sync(plans_with_exercise, user_id, exercise, limit=limit)
+        return {
+            "success": True,
+            "plans": plans,
+            "count": len(plans)
+        }
+        
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error finding workout plans: {str(e)}"
+        }
+
+
+async def acall_function(name: str, args: dict, user_id: str, turn=None):
+    """Validate arguments and execute the registered tool with that name, as `user_id`"""
+    return await tool_registry.acall(name, args, user_id=user_id, turn=turn)
@@ -1,78 +1,294 @@
 import uuid
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import ChatSession, ChatMessage
+from database import ChatSession, ChatMessage, ConversationSummary, ArchivedMessageBatch
+from session_cache import CachedSession, capture_turn, session_cache
 
 def generate_session_id() -> str:
     """Generate a unique session ID"""
     return str(uuid.uuid4())
 
-def create_chat_session(db: Session, user_id: str, title: str = "New Chat") -> str:
-    """Create a new chat session"""
-    session_id = generate_session_id()
-    db_session = ChatSession(
-        session_id=session_id,
+def new_chat_session(user_id: str, title: str = "New Chat") -> ChatSession:
+    """Build a new chat session row without writing it"""
+    now = datetime.utcnow()
+    return ChatSession(
+        session_id=generate_session_id(),
         user_id=user_id,
         title=title,
-        created_at=datetime.utcnow()
+        created_at=now,
+        last_activity_at=now,
+        message_count=0
     )
-    db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    return session_id
 
-def save_message(db: Session, session_id: str, role: str, content: str):
-    """Save a message to the database"""
-    db_message = ChatMessage(
+def new_message(session_id: str, role: str, content: str) -> ChatMessage:
+    """Build a new message row without writing it"""
+    return ChatMessage(
         session_id=session_id,
         role=role,
         content=content,
         timestamp=datetime.utcnow()
     )
-    db.add(db_message)
+
+def create_chat_session(db: Session, user_id: str, title: str = "New Chat") -> str:
+    """Create a new chat session"""
+    db_session = new_chat_session(user_id, title)
+    db.add(db_session)
+    db.commit()
+    db.refresh(db_session)
+    session_cache.record_session(db_session.session_id, user_id, title, [])
+    return db_session.session_id
+
+def save_message(db: Session, session_id: str, role: str, content: str):
+    """Save a message to the database"""
+    message = new_message(session_id, role, content)
+    db.add(message)
+    db.flush()
+    changes = capture_turn([message])
     db.commit()
+    session_cache.record_turn(changes)
+
+async def acreate_chat_session(db: AsyncSession, user_id: str, title: str = "New Chat") -> str:
+    """Create a new chat session without blocking the event loop"""
+    db_session = new_chat_session(user_id, title)
+    db.add(db_session)
+    await db.commit()
+    session_cache.record_session(db_session.session_id, user_id, title, [])
+    return db_session.session_id
+
+async def asave_message(db: AsyncSession, session_id: str, role: str, content: str):
+    """Save a message to the database without blocking the event loop"""
+    message = new_message(session_id, role, content)
+    db.add(message)
+    await db.flush()
+    changes = capture_turn([message])
+    await db.commit()
+    session_cache.record_turn(changes)
 
 def get_chat_history(db: Session, session_id: str) -> List[Dict[str, str]]:
     """Get chat history for a session"""
     messages = db.query(ChatMessage).filter(
         ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.timestamp).all()
+    ).order_by(ChatMessage.timestamp, ChatMessage.id).all()
     
     return [{"role": msg.role, "content": msg.content} for msg in messages]
 
-def get_user_sessions(db: Session, user_id: str) -> List[ChatSession]:
-    """Get all chat sessions for a user"""
-    return db.query(ChatSession).filter(
-        ChatSession.user_id == user_id
-    ).order_by(ChatSession.created_at.desc()).all()
+async def aget_chat_history(db: AsyncSession, session_id: str) -> List[Dict[str, str]]:
+    """Get chat history for a session without blocking the event loop"""
+    rows = await db.execute(
+        select(ChatMessage.role, ChatMessage.content)
+        .where(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.timestamp, ChatMessage.id)
+    )
+    return [{"role": row.role, "content": row.content} for row in rows]
 
-def delete_chat_session(db: Session, session_id: str, user_id: str) -> bool:
-    """Delete a chat session and all its messages"""
-    # First delete all messages
-    db.query(ChatMessage).filter(ChatMessage.session_id == session_id).delete()
+def get_chat_history_page(db: Session, session_id: str, before: Optional[int] = None, limit: int = 50) -> Tuple[List[ChatMessage], bool]:
+    """
+    Get one page of chat history using keyset pagination
     
-    # Then delete the session
-    session = db.query(ChatSession).filter(
-        ChatSession.session_id == session_id,
-        ChatSession.user_id == user_id
+    Args:
+        db: Database session
+        session_id: The chat session ID
+        before: ID of the oldest message of the previous page; None for the newest page
+        limit: Maximum number of messages to return
+    
+    Returns:
+        tuple: Messages of the page in chronological order, and whether older messages exist
+    """
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    
+    if before is not None:
+        cursor = db.query(ChatMessage.timestamp).filter(
+            ChatMessage.id == before,
+            ChatMessage.session_id == session_id
+        ).first()
+        if cursor is None:
+            return [], False
+        query = query.filter(or_(
+            ChatMessage.timestamp < cursor.timestamp,
+            and_(ChatMessage.timestamp == cursor.timestamp, ChatMessage.id < before)
+        ))
+    
+    # Fetch one extra row to learn whether another page exists
+    messages = query.order_by(
+        ChatMessage.timestamp.desc(), ChatMessage.id.desc()
+    ).limit(limit + 1).all()
+    
+    has_more = len(messages) > limit
+    return list(reversed(messages[:limit])), has_more
+
+def get_session_context(db: Session, session_id: str, limit: int) -> Optional[CachedSession]:
+    """
+    Get a session's owner, title, running summary and newest `limit` messages after the summary
+    
+    Served from the session cache when possible; a miss reads the database
+    and fills the cache.
+    
+    Returns:
+        CachedSession: The session context, or None if the session does not exist
+    """
+    cached = session_cache.get(session_id)
+    if cached is not None:
+        return cached
+    
+    session_cache.begin_load(session_id)
+    entry = None
+    try:
+        session = db.query(ChatSession.user_id, ChatSession.title).filter(ChatSession.session_id == session_id).first()
+        if session is not None:
+            summary = get_session_summary(db, session_id)
+            query = db.query(ChatMessage.id, ChatMessage.role, ChatMessage.content).filter(ChatMessage.session_id == session_id)
+            if summary is not None:
+                query = query.filter(ChatMessage.id > summary.last_message_id)
+            # One extra row tells whether the window holds every message after the summary
+            rows = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(limit + 1).all()
+            entry = CachedSession(
+                session_id=session_id,
+                user_id=session.user_id,
+                title=session.title,
+                summary=summary.summary if summary else None,
+                summary_last_message_id=summary.last_message_id if summary else None,
+                messages=[(row.id, row.role, row.content) for row in reversed(rows[:limit])],
+                complete=len(rows) <= limit
+            )
+    finally:
+        session_cache.finish_load(session_id, entry)
+    return entry
+
+async def aget_session_context(db: AsyncSession, session_id: str, limit: int) -> Optional[CachedSession]:
+    """`get_session_context` for async sessions; a cache miss reads through the async driver"""
+    return await db.run_sync(get_session_context, session_id, limit)
+
+def get_session_summary(db: Session, session_id: str) -> Optional[ConversationSummary]:
+    """Get the running summary of a session, if one has been stored"""
+    return db.query(ConversationSummary).filter(
+        ConversationSummary.session_id == session_id
     ).first()
+
+def count_messages_after(db: Session, session_id: str, after_id: Optional[int]) -> int:
+    """Count the messages of a session newer than after_id"""
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    if after_id is not None:
+        query = query.filter(ChatMessage.id > after_id)
+    return query.count()
+
+def get_messages_after(db: Session, session_id: str, after_id: Optional[int], limit: int) -> List[Dict]:
+    """Get the oldest messages of a session newer than after_id, including their IDs"""
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    if after_id is not None:
+        query = query.filter(ChatMessage.id > after_id)
+    messages = query.order_by(ChatMessage.id).limit(limit).all()
+    
+    return [{"id": msg.id, "role": msg.role, "content": msg.content} for msg in messages]
+
+def save_session_summary(db: Session, session_id: str, summary: str, last_message_id: int):
+    """Create or update the running summary of a session"""
+    db_summary = get_session_summary(db, session_id)
+    if db_summary is None:
+        db_summary = ConversationSummary(session_id=session_id)
+        db.add(db_summary)
+    db_summary.summary = summary
+    db_summary.last_message_id = last_message_id
+    db_summary.updated_at = datetime.utcnow()
+    db.commit()
+    session_cache.set_summary(session_id, summary, last_message_id)
+
+def get_user_sessions(db: Session, user_id: str, before: Optional[int] = None, limit: int = 50) -> Tuple[List[ChatSession], bool]:
+    """
+    Get one page of a user's chat sessions, most recently active first
+    
+    Each session carries its message count, last activity time and a
+    preview of its newest message, kept up to date as messages are saved,
+    so the page is a single indexed query.
+    
+    Args:
+        db: Database session
+        user_id: The ID of the user
+        before: Row ID of the last session of the previous page; None for the first page
+        limit: Maximum number of sessions to return
+    
+    Returns:
+        tuple: Sessions of the page, and whether more sessions exist
+    """
+    query = db.query(ChatSession).filter(ChatSession.user_id == user_id)
     
-    if session:
-        db.delete(session)
+    if before is not None:
+        cursor = db.query(ChatSession.last_activity_at).filter(
+            ChatSession.id == before,
+            ChatSession.user_id == user_id
+        ).first()
+        if cursor is None:
+            return [], False
+        query = query.filter(or_(
+            ChatSession.last_activity_at < cursor.last_activity_at,
+            and_(ChatSession.last_activity_at == cursor.last_activity_at, ChatSession.id < before)
+        ))
+    
+    sessions = query.order_by(
+        ChatSession.last_activity_at.desc(), ChatSession.id.desc()
+    ).limit(limit + 1).all()
+    
+    return sessions[:limit], len(sessions) > limit
+
+def delete_chat_sessions(db: Session, user_id: str, session_ids: List[str]) -> List[str]:
+    """
+    Delete many of a user's chat sessions with their messages, summaries and archives
+    
+    Only sessions owned by `user_id` are touched. Ownership of sessions in
+    the session cache is checked there; only the others are looked up.
+    Everything is deleted with one statement per table in a single
+    transaction; the dependent rows are deleted explicitly because databases
+    created before the foreign keys were added do not cascade.
+    
+    Returns:
+        list: IDs of the sessions that were deleted
+    """
+    owned = []
+    unknown = []
+    for session_id in dict.fromkeys(session_ids):
+        cached = session_cache.peek(session_id)
+        if cached is None:
+            unknown.append(session_id)
+        elif cached.user_id == user_id:
+            owned.append(session_id)
+    if unknown:
+        owned += [
+            row.session_id for row in db.query(ChatSession.session_id).filter(
+                ChatSession.user_id == user_id,
+                ChatSession.session_id.in_(unknown)
+            )
+        ]
+    if not owned:
+        return []
+    
+    try:
+        for model in (ChatMessage, ConversationSummary, ArchivedMessageBatch, ChatSession):
+            db.query(model).filter(model.session_id.in_(owned)).delete(synchronize_session=False)
         db.commit()
-        return True
-    return False
+    except Exception:
+        db.rollback()
+        raise
+    for session_id in owned:
+        session_cache.invalidate(session_id)
+    return owned
+
+def delete_chat_session(db: Session, session_id: str, user_id: str) -> bool:
+    """Delete a chat session and all its messages"""
+    return bool(delete_chat_sessions(db, user_id, [session_id]))
 
 def update_session_title(db: Session, session_id: str, user_id: str, title: str) -> bool:
-    """Update the title of a chat session"""
-    session = db.query(ChatSession).filter(
+    """Update the title of a chat session, checking ownership in the same statement"""
+    cached = session_cache.peek(session_id)
+    if cached is not None and cached.user_id != user_id:
+        return False
+    
+    updated = db.query(ChatSession).filter(
         ChatSession.session_id == session_id,
         ChatSession.user_id == user_id
-    ).first()
-    
-    if session:
-        session.title = title
-        db.commit()
-        return True
-    return False
\ No newline at end of file
+    ).update({"title": title}, synchronize_session=False)
+    db.commit()
+    if updated:
+        session_cache.set_title(session_id, title)
+    return bool(updated)
\ No newline at end of file
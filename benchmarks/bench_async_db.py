@@ -0,0 +1,110 @@
+"""
+Benchmark for database access from the event loop.
+
+Runs the same workload, many concurrent coroutines each saving a chat
+message and reading back the session history, three ways: calling the
+synchronous helpers directly in the coroutine, handing them to worker
+threads, and using the async session helpers. Reports operations/sec and
+how late a 5 ms timer on the same event loop fires, which is the delay
+every other request on the worker sees.
+
+Usage:
+    python benchmarks/bench_async_db.py --tasks 50 --ops 40
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import bench_setup
+
+from database import AsyncSessionLocal, SessionLocal, async_engine, init_db
+from utils import aget_chat_history, asave_message, create_chat_session, get_chat_history, save_message
+
+TICK_SECONDS = 0.005
+
+
+def sync_op(session_id: str, i: int):
+    db = SessionLocal()
+    try:
+        save_message(db, session_id, "user", f"message {i} " * 20)
+        get_chat_history(db, session_id)
+    finally:
+        db.close()
+
+
+async def blocking_op(session_id: str, i: int):
+    sync_op(session_id, i)
+
+
+async def threadpool_op(session_id: str, i: int):
+    await asyncio.to_thread(sync_op, session_id, i)
+
+
+async def async_op(session_id: str, i: int):
+    async with AsyncSessionLocal() as db:
+        await asave_message(db, session_id, "user", f"message {i} " * 20)
+        await aget_chat_history(db, session_id)
+
+
+async def measure(op, tasks: int, ops: int):
+    """Run `ops` operations in each of `tasks` coroutines, return ops/sec and timer lateness in ms"""
+    db = SessionLocal()
+    try:
+        session_ids = [create_chat_session(db, f"bench-{op.__name__}-{t}") for t in range(tasks)]
+    finally:
+        db.close()
+
+    lateness = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lateness.append(time.perf_counter() - started - TICK_SECONDS)
+
+    async def worker(session_id: str):
+        for i in range(ops):
+            await op(session_id, i)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(session_id) for session_id in session_ids))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+
+    lateness.sort()
+    return {
+        "ops_per_s": tasks * ops / elapsed,
+        "lag_p50_ms": statistics.median(lateness) * 1000,
+        "lag_p99_ms": lateness[int(len(lateness) * 0.99) - 1] * 1000 if len(lateness) > 1 else lateness[0] * 1000,
+        "lag_max_ms": lateness[-1] * 1000,
+    }
+
+
+async def run(tasks: int, ops: int):
+    init_db()
+    results = {}
+    for name, op in (("blocking", blocking_op), ("threadpool", threadpool_op), ("async", async_op)):
+        results[name] = await measure(op, tasks, ops)
+    await async_engine.dispose()
+
+    print(f"{tasks} concurrent tasks x {ops} save+read operations")
+    print(f"{'mode':<11} {'ops/s':>8} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for name, result in results.items():
+        print(
+            f"{name:<11} {result['ops_per_s']:>8.0f} {result['lag_p50_ms']:>11.1f} "
+            f"{result['lag_p99_ms']:>11.1f} {result['lag_max_ms']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50, help="concurrent coroutines")
+    parser.add_argument("--ops", type=int, default=40, help="operations per coroutine")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.tasks, args.ops))
@@ -0,0 +1,100 @@
+"""
+Benchmark for POST /chat/batch against one-at-a-time POST /chat.
+
+Runs the FastAPI app in-process against the stub LLM and generates a
+starter plan for each user of a cohort twice: once with sequential /chat
+calls, as a client without the batch endpoint would, and once with a
+single /chat/batch request. Reports items/sec and database commits and
+write statements per item for both.
+
+Usage:
+    python benchmarks/bench_batch_chat.py --latency 0.05 --items 200 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from bench_setup import count_db_writes, warm_up
+
+import httpx
+
+import main as app_main
+from stub_llm import create_stub_client
+
+db_counts = count_db_writes()
+
+
+def cohort(prefix: str, size: int):
+    # Distinct messages, so the response cache does not answer repeats
+    return [
+        {"user_id": f"{prefix}_{i}", "message": f"Starter plan for member {i} of the {prefix} cohort, 3 days a week"}
+        for i in range(size)
+    ]
+
+
+async def one_at_a_time(client: httpx.AsyncClient, items):
+    for item in items:
+        response = await client.post("/chat", json=item)
+        response.raise_for_status()
+    return len(items)
+
+
+async def batched(client: httpx.AsyncClient, items, concurrency: int):
+    succeeded = 0
+    async with client.stream("POST", "/chat/batch", json={"items": items, "concurrency": concurrency}) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "done":
+                succeeded = json.loads(line[len("data: "):])["succeeded"]
+    return succeeded
+
+
+async def measure(run):
+    """Time a run, returning items/sec and commits and writes per item"""
+    before = dict(db_counts)
+    start = time.perf_counter()
+    items = await run
+    elapsed = time.perf_counter() - start
+    return {
+        "items": items,
+        "items_per_s": items / elapsed,
+        "commits_per_item": (db_counts["commits"] - before["commits"]) / items,
+        "writes_per_item": (db_counts["writes"] - before["writes"]) / items,
+    }
+
+
+async def run(latency: float, size: int, concurrency: int):
+    app_main.fitness_chat.client = create_stub_client(latency)
+    transport = httpx.ASGITransport(app=app_main.app)
+
+    async with app_main.app.router.lifespan_context(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=None) as client:
+            await warm_up(one_at_a_time(client, cohort("warmup", 1)), batched(client, cohort("warmup_batch", 1), 1))
+
+            results = {
+                "one-at-a-time": await measure(one_at_a_time(client, cohort("single", size))),
+                "batch": await measure(batched(client, cohort("batch", size), concurrency)),
+            }
+
+    print(f"stub latency: {latency * 1000:.0f} ms, {size} items, batch concurrency {concurrency}")
+    print(f"{'path':<14} {'items':>6} {'items/s':>9} {'commits/item':>13} {'writes/item':>12}")
+    for name, result in results.items():
+        print(
+            f"{name:<14} {result['items']:>6} {result['items_per_s']:>9.1f} "
+            f"{result['commits_per_item']:>13.2f} {result['writes_per_item']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub completion latency in seconds")
+    parser.add_argument("--items", type=int, default=200, help="cohort size")
+    parser.add_argument("--concurrency", type=int, default=16, help="batch items in flight")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.latency, args.items, args.concurrency))
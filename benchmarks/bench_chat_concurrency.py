@@ -0,0 +1,73 @@
+"""
+Concurrency benchmark for POST /chat.
+
+Runs the FastAPI app in-process against the stub LLM and reports
+requests/sec for increasing numbers of in-flight chats. With a
+non-blocking pipeline throughput should grow roughly linearly with
+concurrency until the database becomes the bottleneck.
+
+Usage:
+    python benchmarks/bench_chat_concurrency.py --latency 0.2 --levels 1 2 4 8 16
+"""
+
+import argparse
+import asyncio
+import time
+
+from bench_setup import count_db_writes, warm_up
+
+import httpx
+
+import main as app_main
+import persistence
+from stub_llm import create_stub_client
+
+db_counts = count_db_writes()
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, rounds: int):
+    """Drive `concurrency` chats in parallel for `rounds` turns each, return req/s and commits per turn"""
+
+    async def one_chat(worker: int):
+        session_id = None
+        for turn in range(rounds):
+            payload = {"message": f"worker {worker} turn {turn}: beginner plan please", "user_id": f"bench_{worker}"}
+            if session_id:
+                payload["session_id"] = session_id
+            response = await client.post("/chat", json=payload)
+            response.raise_for_status()
+            session_id = response.json()["session_id"]
+
+    commits_before = db_counts["commits"]
+    start = time.perf_counter()
+    await asyncio.gather(*(one_chat(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    turns = concurrency * rounds
+    return turns / elapsed, (db_counts["commits"] - commits_before) / turns
+
+
+async def run(latency: float, levels, rounds: int, write_behind: bool):
+    app_main.fitness_chat.client = create_stub_client(latency)
+    persistence.WRITE_BEHIND_ENABLED = write_behind
+    transport = httpx.ASGITransport(app=app_main.app)
+
+    async with app_main.app.router.lifespan_context(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=None) as client:
+            await warm_up(run_level(client, 1, 1))
+
+            print(f"stub latency: {latency * 1000:.0f} ms, {rounds} turns per chat, write-behind {'on' if write_behind else 'off'}")
+            print(f"{'in-flight':>10} {'req/s':>10} {'commits/turn':>13}")
+            for concurrency in levels:
+                throughput, commits_per_turn = await run_level(client, concurrency, rounds)
+                print(f"{concurrency:>10} {throughput:>10.1f} {commits_per_turn:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub completion latency in seconds")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="in-flight chat counts")
+    parser.add_argument("--rounds", type=int, default=5, help="turns per chat")
+    parser.add_argument("--write-behind", action="store_true", help="batch turn writes through the write-behind queue")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.latency, args.levels, args.rounds, args.write_behind))
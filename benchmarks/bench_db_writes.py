@@ -0,0 +1,76 @@
+"""
+Concurrent write benchmark for the SQLite database profile.
+
+Runs the same workload, many threads each committing chat messages one
+transaction at a time, against a default SQLAlchemy engine and against
+the engine built by `database.create_db_engine` (WAL, synchronous=NORMAL,
+mmap, cache size, busy timeout, pooled), and reports commits/sec.
+
+Usage:
+    python benchmarks/bench_db_writes.py --threads 16 --commits 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bench_setup
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import ChatSession, create_db_engine, init_db
+from utils import new_message
+
+
+def run_workload(engine, threads: int, commits: int):
+    """Commit `commits` messages from each of `threads` threads, return commits/sec and failures"""
+    init_db(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def writer(worker: int) -> int:
+        failures = 0
+        db = session_factory()
+        db.add(ChatSession(session_id=f"bench-{worker}", user_id="bench"))
+        db.commit()
+        db.close()
+        for i in range(commits):
+            db = session_factory()
+            try:
+                db.add(new_message(f"bench-{worker}", "user", f"message {i} " * 20))
+                db.commit()
+            except Exception:
+                db.rollback()
+                failures += 1
+            finally:
+                db.close()
+        return failures
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        failures = sum(pool.map(writer, range(threads)))
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+
+    return (threads * commits - failures) / elapsed, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16, help="concurrent writer threads")
+    parser.add_argument("--commits", type=int, default=200, help="commits per thread")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    profiles = [
+        ("default", create_engine(f"sqlite:///{workdir}/default.db", connect_args={"check_same_thread": False})),
+        ("tuned", create_db_engine(f"sqlite:///{workdir}/tuned.db")),
+    ]
+
+    print(f"{args.threads} threads x {args.commits} commits")
+    print(f"{'profile':>8} {'commits/s':>10} {'failed':>7}")
+    for name, engine in profiles:
+        throughput, failures = run_workload(engine, args.threads, args.commits)
+        print(f"{name:>8} {throughput:>10.1f} {failures:>7}")
@@ -0,0 +1,51 @@
+"""
+Shared setup for the benchmarks.
+
+Importing this module puts app/ on the import path and, unless they are
+already set, points the app at a throwaway SQLite database and a stub
+OpenAI key. Import it before any app module.
+"""
+
+import os
+import sys
+import tempfile
+from typing import Awaitable, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+
+def count_db_writes() -> Dict[str, int]:
+    """
+    Count commits and INSERT, UPDATE and DELETE statements on the app's engines
+
+    Chat turns write through the async engine, other endpoints through the
+    sync one, so both are counted. Returns the dict the counts are kept in,
+    under "commits" and "writes".
+    """
+    from sqlalchemy import event
+
+    from database import async_engine, engine
+
+    counts = {"commits": 0, "writes": 0}
+
+    def count_commit(conn):
+        counts["commits"] += 1
+
+    def count_write(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            counts["writes"] += 1
+
+    for counted_engine in (engine, async_engine.sync_engine):
+        event.listen(counted_engine, "commit", count_commit)
+        event.listen(counted_engine, "after_cursor_execute", count_write)
+    return counts
+
+
+async def warm_up(*workloads: Awaitable):
+    """Run throwaway workloads, so connection pools and lazy imports are warm before measuring"""
+    for workload in workloads:
+        await workload
@@ -0,0 +1,121 @@
+"""
+Storage benchmark for message compression and plan deduplication.
+
+Writes the same chat workload twice, into fresh SQLite databases: once
+with content compression and plan deduplication turned off, and once
+with both on. Every turn has a short user message and an assistant
+reply; every `--plan-every`-th reply carries a multi-kilobyte plan,
+which is also saved as a workout plan, and plans repeat across users as
+starter plans do. Reports the database file size, the time to write the
+workload, the time to read every session's history, and the time for a
+full scan over all message rows.
+
+Usage:
+    python benchmarks/bench_storage.py --sessions 200 --turns 10
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import bench_setup
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import compression
+import database
+from database import create_db_engine, init_db
+from persistence import TurnWrites, commit_turn
+from plans import build_plan
+from utils import get_chat_history, new_chat_session, new_message
+
+EXERCISES = ["back squat", "bench press", "deadlift", "overhead press", "pull-ups", "rows", "lunges", "hip thrusts", "dips", "curls"]
+
+
+def starter_plans(count: int, seed: int = 7):
+    """A few multi-kilobyte plan texts, shared by many users"""
+    rng = random.Random(seed)
+    plans = []
+    for i in range(count):
+        days = []
+        for day in range(1, 6):
+            sets = ", ".join(f"{rng.choice(EXERCISES)} {rng.randint(3, 5)}x{rng.randint(5, 12)}" for _ in range(6))
+            days.append(f"Day {day}: {sets}. Rest 90 seconds between sets and log every working set.")
+        plans.append(f"Starter plan {i}\n" + "\n".join(days * 4))
+    return plans
+
+
+def run_workload(path: str, sessions: int, turns: int, plan_every: int, enabled: bool):
+    compression.CONTENT_COMPRESSION_ENABLED = enabled
+    database.PLAN_DEDUP_ENABLED = enabled
+    engine = create_db_engine(f"sqlite:///{path}")
+    init_db(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    plans = starter_plans(8)
+
+    started = time.perf_counter()
+    session_ids = []
+    for s in range(sessions):
+        db = session_factory()
+        try:
+            turn = TurnWrites()
+            session_id = turn.add(new_chat_session(f"user{s}")).session_id
+            session_ids.append(session_id)
+            for t in range(turns):
+                turn.add(new_message(session_id, "user", f"Question {t} about my training this week"))
+                if t % plan_every == 0:
+                    plan = plans[(s + t) % len(plans)]
+                    turn.add(new_message(session_id, "assistant", f"Here is your plan:\n{plan}"))
+                    turn.add(build_plan(f"user{s}", f"Plan {t}", plan, session_id=session_id))
+                else:
+                    turn.add(new_message(session_id, "assistant", f"Short answer number {t}, keep going."))
+            commit_turn(db, turn)
+        finally:
+            db.close()
+    write_seconds = time.perf_counter() - started
+
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        for session_id in session_ids:
+            get_chat_history(db, session_id)
+        read_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        db.execute(text("SELECT count(*) FROM chat_messages WHERE length(content) > 0")).scalar()
+        scan_seconds = time.perf_counter() - started
+        db.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    finally:
+        db.close()
+    engine.dispose()
+
+    return {
+        "size_mb": os.path.getsize(path) / (1024 * 1024),
+        "write_s": write_seconds,
+        "history_s": read_seconds,
+        "scan_ms": scan_seconds * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200, help="chat sessions to write")
+    parser.add_argument("--turns", type=int, default=10, help="turns per session")
+    parser.add_argument("--plan-every", type=int, default=3, help="every n-th reply carries and saves a plan")
+    args = parser.parse_args()
+
+    results = {}
+    for name, enabled in (("plain", False), ("compact", True)):
+        path = f"{tempfile.mkdtemp()}/{name}.db"
+        results[name] = run_workload(path, args.sessions, args.turns, args.plan_every, enabled)
+
+    print(f"{args.sessions} sessions x {args.turns} turns, a plan every {args.plan_every} replies")
+    print(f"{'storage':<8} {'file MB':>8} {'write s':>8} {'history s':>10} {'scan ms':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<8} {result['size_mb']:>8.2f} {result['write_s']:>8.2f} "
+            f"{result['history_s']:>10.2f} {result['scan_ms']:>8.1f}"
+        )
@@ -0,0 +1,212 @@
+"""
+Offline load test for the main API endpoints.
+
+Runs the FastAPI app in-process against the deterministic stub LLM and
+drives concurrent users through four phases: chat turns (some of which
+save a workout plan through a tool call), history reads, session listing
+and workout-plan reads. For each phase it reports p50/p95/p99 latency,
+throughput and database commit and write-statement rates, plus the share
+of prompt tokens the stub's simulated provider prompt cache served.
+
+Results can be written as JSON and compared with a baseline from an
+earlier run; the script exits with status 1 when any phase's p95 latency
+or throughput regresses by more than the tolerance.
+
+Usage:
+    python benchmarks/bench_suite.py --users 8 --sessions 2 --turns 5 --json results.json
+    python benchmarks/bench_suite.py --baseline results.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from typing import Dict, List
+
+from bench_setup import count_db_writes, warm_up
+
+import httpx
+
+import main as app_main
+from stub_llm import create_stub_app, create_stub_client
+
+SAVE_TRIGGER = "save this plan"
+SAVE_PLAN_CALL = {
+    "name": "save_workout_plan",
+    "arguments": {
+        "plan_name": "Benchmark plan",
+        "plan_content": "Day 1: squats 3x8, bench press 3x8, rows 3x10. Day 2: deadlifts 3x5, overhead press 3x8, pull-ups 3x6.",
+    },
+}
+
+db_counts = count_db_writes()
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Phase:
+    """Latencies and database activity of one benchmark phase"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    async def measure(self, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors += 1
+        return response
+
+    async def run(self, workers):
+        commits, writes = db_counts["commits"], db_counts["writes"]
+        started = time.perf_counter()
+        await asyncio.gather(*workers)
+        self.elapsed = time.perf_counter() - started
+        self.commits = db_counts["commits"] - commits
+        self.writes = db_counts["writes"] - writes
+
+    def summary(self) -> Dict[str, float]:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "throughput": len(latencies) / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "commits_per_s": self.commits / self.elapsed if self.elapsed else 0.0,
+            "writes_per_s": self.writes / self.elapsed if self.elapsed else 0.0,
+        }
+
+
+async def run_suite(users: int, sessions: int, turns: int, reads: int, save_every: int, prefix: str = "bench_user") -> Dict[str, Dict[str, float]]:
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=None) as client:
+        session_ids: Dict[str, List[str]] = {f"{prefix}_{u}": [] for u in range(users)}
+
+        chat = Phase("chat")
+
+        async def chat_session(user_id: str, index: int):
+            session_id = None
+            for turn in range(turns):
+                message = f"{user_id} session {index} turn {turn}: build me a beginner strength plan"
+                if save_every and (turn + 1) % save_every == 0:
+                    message += f", and {SAVE_TRIGGER}"
+                payload = {"message": message, "user_id": user_id}
+                if session_id:
+                    payload["session_id"] = session_id
+                response = await chat.measure(client, "POST", "/chat", json=payload)
+                if response.status_code == 200 and not session_id:
+                    session_id = response.json()["session_id"]
+                    session_ids[user_id].append(session_id)
+
+        await chat.run(chat_session(user_id, index) for user_id in session_ids for index in range(sessions))
+
+        history = Phase("history")
+
+        async def read_history(session_id: str):
+            for _ in range(reads):
+                await history.measure(client, "GET", f"/chat/{session_id}/history", params={"limit": 20})
+
+        await history.run(read_history(session_id) for ids in session_ids.values() for session_id in ids)
+
+        listing = Phase("sessions")
+
+        async def list_sessions(user_id: str):
+            for _ in range(reads):
+                await listing.measure(client, "GET", f"/sessions/{user_id}", params={"limit": 20})
+
+        await listing.run(list_sessions(user_id) for user_id in session_ids)
+
+        plans = Phase("plans")
+
+        async def read_plans(user_id: str):
+            for _ in range(reads):
+                response = await plans.measure(client, "GET", f"/workout-plans/{user_id}")
+                for plan in response.json().get("plans", [])[:1] if response.status_code == 200 else []:
+                    await plans.measure(client, "GET", f"/workout-plans/{user_id}/{plan['id']}")
+
+        await plans.run(read_plans(user_id) for user_id in session_ids)
+
+    return {phase.name: phase.summary() for phase in (chat, history, listing, plans)}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Describe every phase whose p95 latency or throughput regressed beyond the tolerance"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} ms -> {current['p95_ms']:.1f} ms")
+        if previous["throughput"] and current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput']:.1f} -> {current['throughput']:.1f} req/s")
+    return regressions
+
+
+async def main(args) -> int:
+    stub = create_stub_app(args.latency, [SAVE_PLAN_CALL], tool_trigger=SAVE_TRIGGER, jitter=args.jitter, seed=args.seed)
+    app_main.fitness_chat.client = create_stub_client(app=stub)
+
+    async with app_main.app.router.lifespan_context(app_main.app):
+        await warm_up(run_suite(1, 1, 1, 1, 0, prefix="warmup"))
+        stub.state.prompt_tokens = stub.state.cached_tokens = 0
+        results = await run_suite(args.users, args.sessions, args.turns, args.reads, args.save_every)
+
+    print(
+        f"stub latency: {args.latency * 1000:.0f} ms (+{args.jitter * 1000:.0f} ms jitter), "
+        f"{args.users} users x {args.sessions} sessions x {args.turns} turns, {args.reads} reads per phase"
+    )
+    print(f"{'phase':<10} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'commits/s':>10} {'writes/s':>9}")
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['requests']:>8} {result['errors']:>6} {result['throughput']:>8.1f} "
+            f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+            f"{result['commits_per_s']:>10.1f} {result['writes_per_s']:>9.1f}"
+        )
+    if stub.state.prompt_tokens:
+        print(
+            f"prompt cache: {stub.state.cached_tokens} of {stub.state.prompt_tokens} prompt tokens cached "
+            f"({stub.state.cached_tokens / stub.state.prompt_tokens:.0%})"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub completion latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency per completion, up to this many seconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the latency jitter")
+    parser.add_argument("--users", type=int, default=8, help="concurrent users")
+    parser.add_argument("--sessions", type=int, default=2, help="chat sessions per user, run concurrently")
+    parser.add_argument("--turns", type=int, default=5, help="turns per chat session")
+    parser.add_argument("--reads", type=int, default=10, help="requests per session or user in the read phases")
+    parser.add_argument("--save-every", type=int, default=3, help="every n-th turn asks the model to save a plan (0 disables)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare with results from an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression against the baseline")
+    sys.exit(asyncio.run(main(parser.parse_args())))
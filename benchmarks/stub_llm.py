@@ -0,0 +1,244 @@
+"""
+Stub LLM: a local stand-in for the OpenAI chat-completions API.
+
+Serves canned completions after a configurable delay so the app can be
+benchmarked in-process without network access or an API key. When
+`tool_calls` is given, requests that offer tools are answered with those
+tool calls for the first `tool_steps` rounds of each turn, or only for turns
+whose message contains `tool_trigger`. Latency jitter is drawn from a seeded
+generator and response IDs are sequential, so runs are reproducible. `fail_first`
+injects upstream failures, and `stub.state` counts requests and the peak
+number in flight.
+
+Usage reports estimated prompt tokens and simulates provider prompt
+caching: the longest prefix of the request (tools, then messages) that an
+earlier request already sent is reported as cached, in 128-token blocks
+from 1024 tokens up, and `stub.state` totals prompt and cached tokens.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import AsyncOpenAI
+
+CHARS_PER_TOKEN = 4
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK_TOKENS = 128
+
+
+def _tool_rounds_so_far(messages: List[Dict]) -> int:
+    """Count assistant tool-call messages since the last user message"""
+    rounds = 0
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            break
+        if message.get("role") == "assistant" and message.get("tool_calls"):
+            rounds += 1
+    return rounds
+
+
+def _last_user_message(messages: List[Dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content", ""))
+    return ""
+
+
+def _prompt_usage(body: Dict, seen_prefixes: set) -> Dict:
+    """Estimate prompt tokens and how many of them a provider prompt cache would serve"""
+    prompt = json.dumps(body.get("tools") or []) + json.dumps(body["messages"])
+    block = PROMPT_CACHE_BLOCK_TOKENS * CHARS_PER_TOKEN
+    digest = hashlib.sha256()
+    cached_chars = 0
+    for end in range(block, len(prompt) + 1, block):
+        # Chained digests, so a seen digest means the whole prefix up to `end` was sent before
+        digest.update(prompt[end - block:end].encode())
+        key = digest.hexdigest()
+        if key in seen_prefixes and end >= PROMPT_CACHE_MIN_TOKENS * CHARS_PER_TOKEN:
+            cached_chars = end
+        seen_prefixes.add(key)
+    return {
+        "prompt_tokens": (len(prompt) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN,
+        "cached_tokens": cached_chars // CHARS_PER_TOKEN,
+    }
+
+
+def create_stub_app(
+    latency: float = 0.2,
+    tool_calls: Optional[List[Dict]] = None,
+    tool_steps: int = 1,
+    fail_first: int = 0,
+    fail_status: int = 503,
+    tool_trigger: Optional[str] = None,
+    jitter: float = 0.0,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    Build an ASGI app that answers /v1/chat/completions after `latency` seconds
+
+    Args:
+        latency: Seconds per completion
+        tool_calls: Tool calls to request, as {"name": ..., "arguments": {...}} dicts
+        tool_steps: Number of tool-call rounds per turn before answering
+        fail_first: Number of initial requests answered with `fail_status`
+        fail_status: HTTP status of injected failures
+        tool_trigger: Only request tool calls when the user message contains this text
+        jitter: Up to this many seconds are added to each completion's latency
+        seed: Seed for the latency jitter
+    """
+    stub = FastAPI()
+    ids = itertools.count(1)
+    rng = random.Random(seed)
+    stub.state.requests = 0
+    stub.state.in_flight = 0
+    stub.state.max_in_flight = 0
+    stub.state.prompt_tokens = 0
+    stub.state.cached_tokens = 0
+    seen_prefixes = set()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stub.state.requests += 1
+        if stub.state.requests <= fail_first:
+            return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=fail_status)
+
+        stub.state.in_flight += 1
+        stub.state.max_in_flight = max(stub.state.max_in_flight, stub.state.in_flight)
+        try:
+            return await complete(request)
+        finally:
+            stub.state.in_flight -= 1
+
+    async def complete(request: Request):
+        body = await request.json()
+        number = next(ids)
+        completion_id = f"chatcmpl-{number:08d}"
+        model = body.get("model", "stub")
+        delay = latency + (rng.uniform(0, jitter) if jitter else 0.0)
+
+        calls = []
+        if (
+            tool_calls
+            and body.get("tools")
+            and _tool_rounds_so_far(body["messages"]) < tool_steps
+            and (tool_trigger is None or tool_trigger in _last_user_message(body["messages"]))
+        ):
+            calls = [
+                {
+                    "id": f"call_{number:08d}_{index}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+                }
+                for index, call in enumerate(tool_calls)
+            ]
+
+        last_message = body["messages"][-1]
+        content = None if calls else f"Stub reply to: {str(last_message.get('content', ''))[:80]}"
+
+        prompt = _prompt_usage(body, seen_prefixes)
+        stub.state.prompt_tokens += prompt["prompt_tokens"]
+        stub.state.cached_tokens += prompt["cached_tokens"]
+        completion_tokens = len(content.split()) if content else 0
+        usage = {
+            "prompt_tokens": prompt["prompt_tokens"],
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt["prompt_tokens"] + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": prompt["cached_tokens"]},
+        }
+
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(
+                stream_chunks(completion_id, model, content, calls, delay, usage if include_usage else None),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(delay)
+        message = {"role": "assistant", "content": content}
+        if calls:
+            message["tool_calls"] = calls
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if calls else "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    def chunk(completion_id: str, model: str, delta: Dict, finish_reason: Optional[str] = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def stream_chunks(completion_id: str, model: str, content: Optional[str], calls: List[Dict], delay: float, usage: Optional[Dict]):
+        if calls:
+            await asyncio.sleep(delay)
+            for index, call in enumerate(calls):
+                # Split the arguments so clients have to reassemble the fragments
+                arguments = call["function"]["arguments"]
+                middle = len(arguments) // 2
+                yield chunk(completion_id, model, {"tool_calls": [{
+                    "index": index, "id": call["id"], "type": "function",
+                    "function": {"name": call["function"]["name"], "arguments": arguments[:middle]},
+                }]})
+                yield chunk(completion_id, model, {"tool_calls": [{
+                    "index": index, "function": {"arguments": arguments[middle:]},
+                }]})
+            yield chunk(completion_id, model, {}, "tool_calls")
+        else:
+            # Spread the latency over the words so time-to-first-token is visible
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                await asyncio.sleep(delay / len(words))
+                delta = {"role": "assistant", "content": word if i == 0 else f" {word}"}
+                yield chunk(completion_id, model, delta)
+            yield chunk(completion_id, model, {}, "stop")
+        if usage:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return stub
+
+
+def create_stub_client(
+    latency: float = 0.2,
+    tool_calls: Optional[List[Dict]] = None,
+    tool_steps: int = 1,
+    app: Optional[FastAPI] = None,
+) -> AsyncOpenAI:
+    """Return an AsyncOpenAI client whose requests are served by the stub app, or by `app` if given"""
+    transport = httpx.ASGITransport(app=app or create_stub_app(latency, tool_calls, tool_steps))
+    return AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub-llm/v1",
+        http_client=httpx.AsyncClient(transport=transport),
+        max_retries=0,
+    )
@@ -0,0 +1,68 @@
+"""
+Shared test setup: the app modules are importable and point at a throwaway
+SQLite database before any of them is imported
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# database.py builds its engines at import time, so these must be set first
+APP_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="fitness-tests-"), "app.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{APP_DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{APP_DB_PATH}"
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "test.db"
+
+
+@pytest.fixture
+def engine(db_path):
+    from database import create_db_engine, init_db
+
+    engine = create_db_engine(f"sqlite:///{db_path}")
+    init_db(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    from sqlalchemy.orm import sessionmaker
+
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def app_engines():
+    from database import async_engine, init_db
+
+    init_db()
+    yield
+    # Pooled aiosqlite connections run in threads that keep the process alive
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def app_db(app_engines):
+    """The app's own engines, on the throwaway database set up above"""
+    from database import SessionLocal
+
+    return SessionLocal
@@ -0,0 +1,66 @@
+"""
+Tests for the async session helpers and async tool calls
+"""
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database import ChatSession, create_async_db_engine
+from persistence import TurnWrites, acommit_turn
+from registry import ToolRegistry
+from utils import acreate_chat_session, aget_chat_history, aget_session_context, asave_message, new_message
+
+
+def test_async_helpers_write_and_read_history(engine, db_path):
+    async def run():
+        async_engine = create_async_db_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+        try:
+            async with session_factory() as db:
+                session_id = await acreate_chat_session(db, "alice", "Legs")
+                await asave_message(db, session_id, "user", "Plan my leg day")
+                turn = TurnWrites()
+                turn.add(new_message(session_id, "assistant", "Squats and lunges"))
+                await acommit_turn(db, turn)
+
+                history = await aget_chat_history(db, session_id)
+                context = await aget_session_context(db, session_id, 10)
+                session = (await db.execute(select(ChatSession).where(ChatSession.session_id == session_id))).scalar_one()
+                return history, context, session
+        finally:
+            await async_engine.dispose()
+
+    history, context, session = asyncio.run(run())
+
+    assert history == [
+        {"role": "user", "content": "Plan my leg day"},
+        {"role": "assistant", "content": "Squats and lunges"},
+    ]
+    assert context.history() == history
+    # Kept up to date by the after-flush hook, as for sync sessions
+    assert session.message_count == 2
+    assert session.preview == "Squats and lunges"
+
+
+def test_registry_awaits_async_tools_and_threads_sync_ones():
+    registry = ToolRegistry()
+
+    @registry.tool()
+    async def add(a: int, b: int) -> dict:
+        """Add two numbers"""
+        return {"success": True, "sum": a + b}
+
+    @registry.tool()
+    def fail() -> dict:
+        """Always fail"""
+        return {"success": False, "message": "no"}
+
+    assert asyncio.run(registry.acall("add", {"a": 2, "b": 3})) == {"success": True, "sum": 5}
+    assert asyncio.run(registry.acall("fail", {}))["success"] is False
+    assert asyncio.run(registry.acall("add", {"a": "x", "b": 1}))["success"] is False
+
+    stats = registry.stats()
+    assert stats["add"]["calls"] == 2 and stats["add"]["errors"] == 1
+    assert stats["fail"]["errors"] == 1
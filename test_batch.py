@@ -0,0 +1,47 @@
+"""
+Tests for the bulk insert used by batch chat requests
+"""
+
+from datetime import datetime, timedelta
+
+from database import ChatSession, WorkoutPlan
+from persistence import TurnWrites, bulk_insert_turns
+from search import search_messages
+from utils import new_chat_session, new_message
+
+
+def make_turn(user_id: str, message: str, reply: str) -> TurnWrites:
+    turn = TurnWrites()
+    session_id = turn.add(new_chat_session(user_id)).session_id
+    turn.add(new_message(session_id, "user", message))
+    assistant = turn.add(new_message(session_id, "assistant", reply))
+    assistant.timestamp += timedelta(seconds=1)
+    return turn
+
+
+def test_sessions_get_activity_and_messages_are_searchable(db):
+    turns = [make_turn(f"user{i}", f"kettlebell plan {i}", f"reply {i}") for i in range(3)]
+    turns[0].add(WorkoutPlan(user_id="user0", plan_name="Plan", plan_content="Swings", created_at=datetime.utcnow()))
+
+    bulk_insert_turns(db, turns)
+    db.commit()
+
+    sessions = db.query(ChatSession).order_by(ChatSession.user_id).all()
+    assert [(s.user_id, s.message_count, s.preview) for s in sessions] == [
+        ("user0", 2, "reply 0"),
+        ("user1", 2, "reply 1"),
+        ("user2", 2, "reply 2"),
+    ]
+    assert db.query(WorkoutPlan).count() == 1
+    assert len(search_messages(db, "user1", "kettlebell")[0]) == 1
+
+
+def test_retrying_a_turn_does_not_double_count(db):
+    turn = make_turn("alice", "hello", "hi")
+
+    bulk_insert_turns(db, [turn])
+    db.rollback()
+    bulk_insert_turns(db, [turn])
+    db.commit()
+
+    assert db.query(ChatSession).one().message_count == 2
@@ -0,0 +1,91 @@
+"""
+Tests for the response cache: LRU and TTL eviction, the shared SQLite
+backend, and turns that call tools
+"""
+
+import asyncio
+
+from cache import CacheMetrics, InMemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+from chat import FitnessChat
+from metrics import metrics as prometheus
+from stub_llm import create_stub_app, create_stub_client
+
+
+def test_least_recently_used_entries_are_evicted():
+    metrics = CacheMetrics()
+    backend = InMemoryCacheBackend(metrics, max_entries=2, ttl_seconds=60)
+    backend.set("a", "A")
+    backend.set("b", "B")
+
+    assert backend.get("a") == "A"
+    backend.set("c", "C")
+
+    assert backend.get("b") is None
+    assert (backend.get("a"), backend.get("c")) == ("A", "C")
+    assert metrics.evictions == 1
+
+
+def test_expired_entries_are_not_served():
+    metrics = CacheMetrics()
+    backend = InMemoryCacheBackend(metrics, max_entries=10, ttl_seconds=0)
+    backend.set("a", "A")
+
+    assert backend.get("a") is None
+    assert metrics.expirations == 1
+
+
+def test_sqlite_backend_evicts_the_oldest_entries(session_factory):
+    metrics = CacheMetrics()
+    backend = SQLiteCacheBackend(metrics, max_entries=2, ttl_seconds=60, session_factory=session_factory)
+    for key in ("a", "b", "c"):
+        backend.set(key, key.upper())
+
+    assert backend.get("a") is None
+    assert (backend.get("b"), backend.get("c")) == ("B", "C")
+    assert metrics.evictions == 1
+
+
+def test_near_identical_prompts_share_a_key():
+    history = [{"role": "user", "content": "Hi"}]
+
+    assert ResponseCache.make_key("m", "System", history, "Plan my  week!") == ResponseCache.make_key("m", "system", history, "plan my week")
+    assert ResponseCache.make_key("m", "System", history, "Plan my week") != ResponseCache.make_key("m", "System", [], "Plan my week")
+
+
+def test_turns_that_call_tools_are_not_cached(app_db):
+    metrics = CacheMetrics()
+    cache = ResponseCache(backend=InMemoryCacheBackend(metrics), enabled=True, metrics=metrics)
+    stub = create_stub_app(latency=0, tool_calls=[{"name": "get_user_workout_plans", "arguments": {"limit": 1}}], tool_trigger="my plans")
+    chat = FitnessChat(client=create_stub_client(app=stub), cache=cache)
+
+    async def run():
+        for _ in range(2):
+            await chat.generate_response("Show my plans", user_id="cache_user")
+            await chat.generate_response("Hello coach", user_id="cache_user")
+
+    asyncio.run(run())
+
+    # Two requests per tool turn; the plain turn is answered from the cache the second time
+    assert stub.state.requests == 5
+    assert metrics.as_dict()["bypasses"] == 2
+    assert metrics.as_dict()["hits"] == 1
+
+
+def test_named_cache_counters_are_exported_on_metrics():
+    metrics = CacheMetrics("exported_test")
+    cache = ResponseCache(backend=InMemoryCacheBackend(metrics, max_entries=1), enabled=True, metrics=metrics)
+
+    async def run():
+        await cache.get("a")
+        await cache.set("a", "A")
+        await cache.set("b", "B")
+        await cache.get("b")
+        cache.bypass()
+
+    asyncio.run(run())
+
+    text = prometheus.render()
+    counts = metrics.as_dict()
+    assert counts == {"hits": 1, "misses": 1, "evictions": 1, "expirations": 0, "bypasses": 1}
+    for event in ("hits", "misses", "evictions", "bypasses"):
+        assert f'cache_events_total{{cache="exported_test",event="{event}"}} 1' in text
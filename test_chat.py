@@ -0,0 +1,76 @@
+"""
+Tests for the tool-calling loop, run against the stub LLM
+"""
+
+import asyncio
+import json
+
+import chat as chat_module
+from cache import CacheMetrics, InMemoryCacheBackend, ResponseCache
+from chat import FitnessChat
+from stub_llm import create_stub_app, create_stub_client
+
+PLAN_LISTING = {"name": "get_user_workout_plans", "arguments": {"limit": 1}}
+
+
+def make_chat(stub, max_tool_steps: int = 5) -> FitnessChat:
+    metrics = CacheMetrics()
+    cache = ResponseCache(backend=InMemoryCacheBackend(metrics), enabled=False, metrics=metrics)
+    chat = FitnessChat(client=create_stub_client(app=stub), cache=cache)
+    chat.max_tool_steps = max_tool_steps
+    return chat
+
+
+def test_tools_run_for_several_steps_before_the_answer(app_db):
+    stub = create_stub_app(latency=0, tool_calls=[PLAN_LISTING, PLAN_LISTING], tool_steps=2)
+    steps = []
+
+    reply = asyncio.run(make_chat(stub).generate_response("Show my plans", user_id="alice", steps=steps))
+
+    assert reply.startswith("Stub reply to:")
+    assert stub.state.requests == 3
+    assert [step.tools for step in steps] == [["get_user_workout_plans"] * 2, ["get_user_workout_plans"] * 2, []]
+
+
+def test_tool_steps_stop_at_the_limit(app_db):
+    stub = create_stub_app(latency=0, tool_calls=[PLAN_LISTING], tool_steps=100)
+    steps = []
+
+    reply = asyncio.run(make_chat(stub, max_tool_steps=2).generate_response("Show my plans", user_id="alice", steps=steps))
+
+    # Two tool rounds, then one final request without tools
+    assert reply.startswith("Stub reply to:")
+    assert stub.state.requests == 3
+    assert [step.step for step in steps] == [1, 2, 3]
+
+
+def test_bad_tool_calls_become_failed_results():
+    chat = make_chat(create_stub_app(latency=0))
+
+    async def run():
+        return await asyncio.gather(
+            chat._run_tool_call("call_1", "get_user_workout_plans", "{not json", "alice", None),
+            chat._run_tool_call("call_2", "no_such_tool", "{}", "alice", None),
+            chat._run_tool_call("call_3", "get_user_workout_plans", "[1]", "alice", None),
+        )
+
+    for message in asyncio.run(run()):
+        assert message["role"] == "tool"
+        assert json.loads(message["content"])["success"] is False
+
+
+def test_a_tool_that_raises_does_not_fail_its_siblings(monkeypatch):
+    async def acall_function(name, args, user_id, turn=None):
+        if name == "broken_tool":
+            raise KeyError("plan_data")
+        return {"success": True}
+
+    monkeypatch.setattr(chat_module, "acall_function", acall_function)
+    step = chat_module.AgentStep(step=1)
+    calls = [("call_1", "broken_tool", "{}"), ("call_2", "working_tool", "{}")]
+
+    messages = asyncio.run(make_chat(create_stub_app(latency=0))._run_tool_calls(calls, "alice", None, None, step))
+
+    assert [message["tool_call_id"] for message in messages] == ["call_1", "call_2"]
+    assert json.loads(messages[0]["content"]) == {"success": False, "message": "Could not call broken_tool: 'plan_data'"}
+    assert json.loads(messages[1]["content"]) == {"success": True}
@@ -0,0 +1,96 @@
+"""
+Tests for compressed message text and deduplicated plan text
+"""
+
+from sqlalchemy import text
+
+from compression import compress_text, decompress_text
+from database import ChatMessage, ChatSession, PlanBlob, WorkoutPlan, init_db
+from plans import build_plan
+from search import search_messages, search_plans
+
+PLAN = "Day 1: back squat 5x5, romanian deadlift 3x8, walking lunges 3x12.\n" * 40
+
+
+def test_only_large_text_is_compressed():
+    assert compress_text("short") == "short"
+    compressed = compress_text(PLAN)
+    assert isinstance(compressed, bytes) and len(compressed) < len(PLAN)
+    assert decompress_text(compressed) == PLAN
+
+
+def test_large_messages_are_stored_compressed_and_stay_searchable(db):
+    db.add(ChatSession(session_id="s1", user_id="alice"))
+    db.add(ChatMessage(session_id="s1", role="assistant", content=PLAN))
+    db.commit()
+    db.expire_all()
+
+    stored = db.execute(text("SELECT typeof(content) FROM chat_messages")).scalar()
+    assert stored == "blob"
+    assert db.query(ChatMessage).one().content == PLAN
+
+    messages, _ = search_messages(db, "alice", "romanian")
+    assert "[romanian]" in messages[0]["snippet"]
+
+
+def test_identical_plans_share_one_blob(db):
+    db.add_all([build_plan("alice", "Legs A", PLAN), build_plan("bob", "Legs B", PLAN)])
+    db.commit()
+    db.expire_all()
+
+    assert db.query(PlanBlob).count() == 1
+    assert [plan.plan_content for plan in db.query(WorkoutPlan).order_by(WorkoutPlan.id)] == [PLAN, PLAN]
+
+    plans, _ = search_plans(db, "bob", "lunges")
+    assert [plan["plan_name"] for plan in plans] == ["Legs B"]
+    assert "[lunges]" in plans[0]["snippet"]
+
+
+def test_index_over_the_table_is_rebuilt_over_the_view(engine, db):
+    db.add(build_plan("alice", "Legs", PLAN))
+    db.commit()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE workout_plans_fts")
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE workout_plans_fts USING fts5(plan_name, plan_content, "
+            "content='workout_plans', content_rowid='id', tokenize='porter unicode61')"
+        )
+
+    init_db(engine)
+
+    plans, _ = search_plans(db, "alice", "lunges")
+    assert len(plans) == 1 and "[lunges]" in plans[0]["snippet"]
+
+
+def test_blobs_are_deleted_with_their_last_plan(db):
+    other = PLAN.replace("lunges", "step-ups")
+    first, second, third = build_plan("alice", "Legs A", PLAN), build_plan("bob", "Legs B", PLAN), build_plan("alice", "Legs C", other)
+    db.add_all([first, second, third])
+    db.commit()
+    assert db.query(PlanBlob).count() == 2
+
+    db.delete(first)
+    db.commit()
+    assert db.query(PlanBlob).count() == 2
+
+    # Giving the last plan of a text new content releases that text too
+    second.plan_content = "Rest day"
+    db.delete(third)
+    db.commit()
+    assert db.query(PlanBlob).count() == 0
+    assert db.query(WorkoutPlan).one().plan_content == "Rest day"
+
+
+def test_retention_sweep_deletes_blobs_left_by_bulk_deletes(session_factory):
+    from retention import sweep_plan_blobs
+
+    db = session_factory()
+    db.add_all([build_plan("alice", "Legs A", PLAN), build_plan("bob", "Legs B", PLAN.upper())])
+    db.commit()
+    db.query(WorkoutPlan).filter(WorkoutPlan.user_id == "alice").delete(synchronize_session=False)
+    db.commit()
+
+    assert sweep_plan_blobs(session_factory) == 1
+    assert db.query(PlanBlob).count() == 1
+    assert db.query(WorkoutPlan).one().plan_content == PLAN.upper()
+    db.close()
@@ -0,0 +1,97 @@
+"""
+Tests for trimming conversation history to the token budget and for the
+stable prompt prefix
+"""
+
+import pytest
+
+import context
+from context import PromptPrefix, build_context, message_tokens
+from registry import ToolRegistry
+
+SYSTEM = "You are a fitness coach."
+MESSAGE = "What should I train today?"
+
+
+@pytest.fixture(autouse=True)
+def trim_step(monkeypatch):
+    monkeypatch.setattr(context, "CONTEXT_TRIM_STEP", 10)
+
+
+def make_history(count: int):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "squat " * 40}
+        for i in range(count)
+    ]
+
+
+def fixed_tokens() -> int:
+    return message_tokens({"content": SYSTEM}) + message_tokens({"content": MESSAGE})
+
+
+def test_history_that_fits_is_kept_whole():
+    history = make_history(6)
+
+    window = build_context(SYSTEM, history, MESSAGE, token_budget=100_000)
+
+    assert window.messages == history
+    assert window.dropped_messages == 0 and window.dropped_tokens == 0
+    assert window.total_tokens == fixed_tokens() + sum(message_tokens(m) for m in history)
+
+
+def test_oldest_messages_are_dropped_in_whole_trim_steps():
+    history = make_history(25)
+    cost = message_tokens(history[0])
+    # Room for the newest 12 messages: 13 must go, rounded up to 20
+    budget = fixed_tokens() + cost * 12 + cost // 2
+
+    window = build_context(SYSTEM, history, MESSAGE, token_budget=budget)
+
+    assert window.messages == history[20:]
+    assert window.dropped_messages == 20
+    assert window.dropped_tokens == sum(message_tokens(m) for m in history[:20])
+    assert window.total_tokens <= budget
+
+
+def test_summary_is_kept_when_all_history_is_dropped():
+    history = make_history(3)
+
+    window = build_context(SYSTEM, history, MESSAGE, token_budget=fixed_tokens(), summary="Wants a stronger squat")
+
+    assert window.dropped_messages == 3
+    assert len(window.messages) == 1
+    assert window.messages[0]["role"] == "system"
+    assert "Wants a stronger squat" in window.messages[0]["content"]
+
+
+def log_squats(sets: int) -> dict:
+    """Log squats"""
+
+
+def log_bench(sets: int, reps: int = 8) -> dict:
+    """Log bench presses"""
+
+
+def tool_schemas(*funcs):
+    registry = ToolRegistry()
+    for func in funcs:
+        registry.tool()(func)
+    return registry.chat_schemas()
+
+
+def test_prefix_fingerprint_does_not_depend_on_tool_registration_order():
+    forward = PromptPrefix.build(SYSTEM, tool_schemas(log_squats, log_bench))
+    backward = PromptPrefix.build(SYSTEM, tool_schemas(log_bench, log_squats))
+    changed = PromptPrefix.build(SYSTEM + " Be brief.", tool_schemas(log_squats, log_bench))
+
+    assert forward.fingerprint == backward.fingerprint
+    assert forward.fingerprint != changed.fingerprint
+
+
+def test_consecutive_turns_extend_the_previous_request():
+    prefix = PromptPrefix.build(SYSTEM, [])
+    first = prefix.messages([], "Plan my week")
+    second = prefix.messages(first[1:] + [{"role": "assistant", "content": "Here it is"}], "Thanks")
+
+    assert second[:len(first)] == first
+    assert second[0] == {"role": "system", "content": SYSTEM}
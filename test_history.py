@@ -0,0 +1,43 @@
+"""
+Tests for keyset pagination of session history
+"""
+
+from datetime import datetime, timedelta
+
+from database import ChatMessage, ChatSession
+from utils import get_chat_history_page
+
+
+def test_pages_walk_back_through_history_without_gaps(db):
+    start = datetime(2024, 1, 1)
+    db.add_all([ChatSession(session_id="s1", user_id="alice"), ChatSession(session_id="s2", user_id="bob")])
+    # Messages 3 and 4 share a timestamp, so the page boundary between them is decided by ID
+    timestamps = [start + timedelta(minutes=minute) for minute in (0, 1, 2, 3, 3, 4, 5)]
+    db.add_all([
+        ChatMessage(session_id="s1", role="user", content=f"message {i}", timestamp=timestamp)
+        for i, timestamp in enumerate(timestamps)
+    ])
+    db.add(ChatMessage(session_id="s2", role="user", content="other session", timestamp=start))
+    db.commit()
+
+    pages = []
+    before, has_more = None, True
+    while has_more:
+        messages, has_more = get_chat_history_page(db, "s1", before=before, limit=3)
+        pages.append([message.content for message in messages])
+        before = messages[0].id
+
+    assert pages == [
+        ["message 4", "message 5", "message 6"],
+        ["message 1", "message 2", "message 3"],
+        ["message 0"],
+    ]
+
+
+def test_a_cursor_from_another_session_returns_nothing(db):
+    db.add_all([ChatSession(session_id="s1", user_id="alice"), ChatSession(session_id="s2", user_id="bob")])
+    other = ChatMessage(session_id="s2", role="user", content="hi")
+    db.add_all([other, ChatMessage(session_id="s1", role="user", content="hello")])
+    db.commit()
+
+    assert get_chat_history_page(db, "s1", before=other.id) == ([], False)
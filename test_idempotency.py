@@ -0,0 +1,46 @@
+"""
+Tests for Idempotency-Key on /chat: in-flight coalescing, replays of
+completed turns and key reuse with a different request
+"""
+
+import asyncio
+
+import httpx
+
+from stub_llm import create_stub_app, create_stub_client
+
+
+def test_duplicate_requests_share_one_turn(app_db):
+    import main as app_main
+    from database import ChatMessage
+
+    stub = create_stub_app(latency=0.1)
+    original_client = app_main.fitness_chat.client
+    app_main.fitness_chat.client = create_stub_client(app=stub)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            payload = {"message": "idempotent hello", "user_id": "idempotency_user"}
+            headers = {"Idempotency-Key": "key-1"}
+            concurrent = await asyncio.gather(*(client.post("/chat", json=payload, headers=headers) for _ in range(3)))
+            replay = await client.post("/chat", json=payload, headers=headers)
+            conflict = await client.post("/chat", json={**payload, "message": "something else"}, headers=headers)
+        return concurrent, replay, conflict
+
+    try:
+        concurrent, replay, conflict = asyncio.run(scenario())
+    finally:
+        app_main.fitness_chat.client = original_client
+
+    assert [response.status_code for response in concurrent] == [200, 200, 200]
+    assert len({response.json()["session_id"] for response in concurrent}) == 1
+    assert replay.json() == concurrent[0].json()
+    assert conflict.status_code == 422
+    assert stub.state.requests == 1
+
+    db = app_db()
+    try:
+        assert db.query(ChatMessage).filter(ChatMessage.content == "idempotent hello").count() == 1
+    finally:
+        db.close()
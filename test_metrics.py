@@ -0,0 +1,115 @@
+"""
+Tests for /metrics and the Server-Timing header, after chat turns against
+the stub LLM
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import metrics
+from stub_llm import create_stub_app, create_stub_client
+
+
+@pytest.fixture
+def metrics_app(app_db, monkeypatch):
+    import main as app_main
+
+    stub = create_stub_app(latency=0)
+    monkeypatch.setattr(app_main.fitness_chat, "client", create_stub_client(app=stub))
+    return app_main.app
+
+
+def sample(text: str, series: str) -> float:
+    """The value of one series in the Prometheus text, 0 if it is absent"""
+    for line in text.splitlines():
+        name, _, value = line.rpartition(" ")
+        if name == series:
+            return float(value)
+    return 0.0
+
+
+async def chat_and_scrape(app, messages, paths=(), headers=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        before = (await client.get("/metrics")).text
+        responses = [await client.post("/chat", json={"message": message, "user_id": "metrics_user"}, headers=headers) for message in messages]
+        for response in responses:
+            for path in paths:
+                await client.get(path.format(session_id=response.json()["session_id"]))
+        after = await client.get("/metrics")
+    return before, responses, after
+
+
+def test_metrics_use_route_templates_and_count_chat_phases(metrics_app):
+    history = 'http_requests_total{method="GET",route="/chat/{session_id}/history",status="200"}'
+    chat = 'http_requests_total{method="POST",route="/chat",status="200"}'
+    completions = 'chat_phase_seconds_count{phase="completion"}'
+
+    before, responses, after = asyncio.run(chat_and_scrape(
+        metrics_app,
+        ["How many sets for legs?", "And for arms?"],
+        paths=["/chat/{session_id}/history"],
+    ))
+
+    assert after.status_code == 200
+    assert after.headers["content-type"].startswith(metrics.CONTENT_TYPE)
+    assert "# TYPE http_requests_total counter" in after.text
+    assert sample(after.text, chat) - sample(before, chat) == 2
+    assert sample(after.text, completions) - sample(before, completions) == 2
+    # Both sessions' history requests share the template label
+    assert sample(after.text, history) - sample(before, history) == 2
+    for response in responses:
+        assert response.json()["session_id"] not in after.text
+
+
+def test_cached_prompt_tokens_are_counted(metrics_app):
+    cached = 'llm_tokens_total{model="gpt-4o-mini",kind="cached_prompt"}'
+    prompt = 'llm_tokens_total{model="gpt-4o-mini",kind="prompt"}'
+
+    before, _, after = asyncio.run(chat_and_scrape(metrics_app, ["Plan a push day", "Plan a pull day"]))
+
+    # The second turn repeats the system prompt and tools, which the stub reports as cached
+    assert sample(after.text, prompt) > sample(before, prompt)
+    assert 0 < sample(after.text, cached) - sample(before, cached) < sample(after.text, prompt) - sample(before, prompt)
+
+
+def test_server_timing_header_lists_chat_phases(metrics_app, monkeypatch):
+    monkeypatch.setattr(metrics, "TIMING_HEADERS_ENABLED", True)
+
+    _, responses, _ = asyncio.run(chat_and_scrape(metrics_app, ["Time this turn"]))
+
+    entries = [entry.split(";")[0] for entry in responses[0].headers["server-timing"].split(", ")]
+    assert entries[0] == "completion"
+    assert {"completion", "persist"} <= set(entries)
+    assert entries[-1] == "total"
+
+
+def test_server_timing_header_is_off_by_default(metrics_app):
+    _, responses, _ = asyncio.run(chat_and_scrape(metrics_app, ["No timing please"]))
+
+    assert "server-timing" not in responses[0].headers
+
+
+def test_trimmed_history_is_counted(metrics_app, monkeypatch):
+    import context
+
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGET", 1)
+    dropped = "context_dropped_messages_total"
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=metrics_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/chat", json={"message": "Start a session", "user_id": "metrics_user"})
+            before = (await client.get("/metrics")).text
+            payload = {"message": "Continue it", "user_id": "metrics_user", "session_id": first.json()["session_id"]}
+            await client.post("/chat", json=payload)
+            after = (await client.get("/metrics")).text
+        return before, after
+
+    before, after = asyncio.run(scenario())
+
+    # The first turn's two messages do not fit a one-token budget
+    assert sample(after, dropped) - sample(before, dropped) == 2
+    assert sample(after, "context_dropped_tokens_total") > sample(before, "context_dropped_tokens_total")
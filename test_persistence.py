@@ -0,0 +1,48 @@
+"""
+Tests for committing chat turns directly and through the write-behind queue
+"""
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from database import ChatMessage, ChatSession
+from persistence import TurnWrites, WriteBehindQueue, commit_turn
+from utils import new_chat_session, new_message
+
+
+def make_turn(user_id: str, message: str) -> TurnWrites:
+    turn = TurnWrites()
+    session_id = turn.add(new_chat_session(user_id)).session_id
+    turn.add(new_message(session_id, "user", message))
+    turn.add(new_message(session_id, "assistant", f"reply to {message}"))
+    return turn
+
+
+def test_a_turn_is_committed_whole_or_not_at_all(db):
+    commit_turn(db, make_turn("alice", "first"))
+
+    broken = make_turn("alice", "second")
+    broken.add(new_message("missing-session", "assistant", "orphan"))
+    with pytest.raises(IntegrityError):
+        commit_turn(db, broken)
+
+    assert db.query(ChatSession).count() == 1
+    assert [message.content for message in db.query(ChatMessage).order_by(ChatMessage.id)] == ["first", "reply to first"]
+
+
+def test_write_behind_flushes_queued_turns_on_stop(session_factory):
+    # A long delay keeps every turn queued until stop() flushes them
+    writer = WriteBehindQueue(session_factory, max_batch=100, max_delay_ms=60_000)
+    futures = [writer.submit(make_turn("alice", f"turn {i}")) for i in range(3)]
+    broken = make_turn("alice", "broken")
+    broken.add(new_message("missing-session", "assistant", "orphan"))
+    broken_future = writer.submit(broken)
+
+    writer.stop(timeout=10)
+
+    assert all(future.done() and future.exception() is None for future in futures)
+    assert isinstance(broken_future.exception(), IntegrityError)
+    db = session_factory()
+    assert db.query(ChatSession).count() == 3
+    assert db.query(ChatMessage).count() == 6
+    db.close()
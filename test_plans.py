@@ -0,0 +1,67 @@
+"""
+Tests for structured workout plans: exercise lookup and weekly volume
+"""
+
+import pytest
+from pydantic import ValidationError
+
+from plans import build_plan, normalize_exercise, plans_with_exercise, weekly_volume
+
+LOWER_UPPER = {
+    "days": [
+        {"day": 1, "name": "Lower", "exercises": [
+            {"name": "Back Squats", "sets": 4, "reps": 6},
+            {"name": "Romanian deadlift", "sets": 3, "reps": 10},
+            {"name": "Plank", "sets": 3, "muscle_group": "Core"},
+        ]},
+        {"day": 2, "name": "Upper", "exercises": [
+            {"name": "Bench press", "sets": 4, "reps": 8},
+            {"name": "Barbell row", "sets": 4, "reps": 8},
+            {"name": "Deadlift (trap bar)", "sets": 2, "reps": 5},
+        ]},
+    ]
+}
+
+
+def test_exercise_names_are_normalized():
+    assert normalize_exercise("  Back   Squats ") == "back squat"
+    assert normalize_exercise("Press") == "press"
+
+
+def test_plans_are_found_by_exercise_prefix(db):
+    older = build_plan("alice", "Lower/upper", plan_data=LOWER_UPPER)
+    newer = build_plan("alice", "Squat focus", plan_type="strength", plan_data={"days": [
+        {"day": 1, "exercises": [{"name": "Squat", "sets": 5, "reps": 5}]},
+    ]})
+    db.add_all([older, build_plan("bob", "Bob's deadlifts", plan_data=LOWER_UPPER)])
+    db.flush()
+    db.add(newer)
+    db.commit()
+
+    deadlifts = plans_with_exercise(db, "alice", "Deadlifts")
+    assert [plan["plan_name"] for plan in deadlifts] == ["Lower/upper"]
+    assert deadlifts[0]["exercises"] == ["deadlift (trap bar)"]
+    assert deadlifts[0]["weekly_sets"] == 2
+
+    assert [plan["plan_name"] for plan in plans_with_exercise(db, "alice", "back squat")] == ["Lower/upper"]
+    assert [plan["plan_name"] for plan in plans_with_exercise(db, "alice", "squat", plan_type="strength")] == ["Squat focus"]
+    assert plans_with_exercise(db, "alice", "  ") == []
+
+
+def test_weekly_volume_per_muscle_group(db):
+    plan = build_plan("alice", "Lower/upper", plan_data=LOWER_UPPER)
+    db.add(plan)
+    db.commit()
+
+    found, volume = weekly_volume(db, "alice", plan.id)
+
+    assert found
+    assert volume[0] == {"muscle_group": "back", "exercises": 2, "sets": 6, "reps": 42}
+    assert {row["muscle_group"]: row["sets"] for row in volume} == {"back": 6, "legs": 4, "chest": 4, "hamstrings": 3, "core": 3}
+    assert {row["muscle_group"]: row["reps"] for row in volume}["core"] == 0
+    assert weekly_volume(db, "bob", plan.id) == (False, [])
+
+
+def test_malformed_days_are_rejected():
+    with pytest.raises(ValidationError):
+        build_plan("alice", "Broken", plan_data={"days": [{"day": 1, "exercises": [{"name": "Squat"}]}]})
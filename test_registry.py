@@ -0,0 +1,72 @@
+"""
+Tests for tool registration, argument validation and injected arguments
+"""
+
+import asyncio
+
+import pytest
+
+from registry import ToolRegistry
+from tools import tool_registry
+
+
+def make_registry() -> ToolRegistry:
+    registry = ToolRegistry()
+
+    @registry.tool(inject=("user_id",))
+    def list_plans(user_id: str, query: str, limit: int = 5) -> dict:
+        """
+        List plans
+
+        Args:
+            query: Words to look for
+            limit: Maximum number of plans
+        """
+        return {"success": True, "user_id": user_id, "query": query, "limit": limit}
+
+    @registry.tool(description="Say hello")
+    def hello() -> dict:
+        return {"success": True}
+
+    return registry
+
+
+def test_schemas_are_sorted_and_leave_out_injected_parameters():
+    registry = make_registry()
+
+    schemas = registry.chat_schemas()
+
+    assert [schema["function"]["name"] for schema in schemas] == ["hello", "list_plans"]
+    parameters = schemas[1]["function"]["parameters"]
+    assert list(parameters["properties"]) == ["limit", "query"]
+    assert parameters["required"] == ["query"]
+    assert parameters["properties"]["query"]["description"] == "Words to look for"
+
+
+def test_invalid_arguments_are_returned_as_failures():
+    registry = make_registry()
+
+    for args in ({}, {"query": "legs", "limit": "many"}, {"query": "legs", "extra": 1}):
+        result = registry.call("list_plans", args, user_id="alice")
+        assert result["success"] is False
+        assert result["message"].startswith("Invalid arguments for list_plans")
+
+    assert registry.stats()["list_plans"]["errors"] == 3
+    with pytest.raises(ValueError):
+        registry.call("missing", {})
+
+
+def test_the_user_comes_from_the_caller_not_the_model():
+    registry = make_registry()
+
+    assert registry.call("list_plans", {"query": "legs"}, user_id="alice")["user_id"] == "alice"
+    # The model cannot name another user
+    assert registry.call("list_plans", {"query": "legs", "user_id": "bob"}, user_id="alice")["success"] is False
+
+
+def test_plan_tools_take_the_user_from_the_request():
+    for schema in tool_registry.chat_schemas():
+        assert "user_id" not in schema["function"]["parameters"]["properties"]
+
+    result = asyncio.run(tool_registry.acall("get_workout_plan", {"plan_id": 1, "user_id": "bob"}, user_id="alice"))
+    assert result["success"] is False
@@ -0,0 +1,175 @@
+"""
+Tests for the upstream LLM guard: retries, deadlines, the circuit breaker,
+the concurrency limit and the status codes /chat returns, run against the
+fault-injecting stub LLM
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from resilience import CircuitBreaker, UpstreamError, UpstreamGuard, UpstreamTimeout, UpstreamUnavailable
+from stub_llm import create_stub_app, create_stub_client
+
+
+def make_guard(**overrides) -> UpstreamGuard:
+    options = {"max_retries": 0, "backoff_base": 0, "timeout": 5, "breaker": CircuitBreaker(failure_threshold=100)}
+    options.update(overrides)
+    return UpstreamGuard(**options)
+
+
+async def complete(guard: UpstreamGuard, client) -> str:
+    response = await guard.call(
+        client.chat.completions.create,
+        model="stub",
+        messages=[{"role": "user", "content": "hello"}],
+    )
+    return response.choices[0].message.content
+
+
+def test_transient_failures_are_retried():
+    stub = create_stub_app(latency=0, fail_first=2)
+    guard = make_guard(max_retries=2)
+
+    assert asyncio.run(complete(guard, create_stub_client(app=stub))) == "Stub reply to: hello"
+    assert stub.state.requests == 3
+
+
+def test_retries_are_exhausted():
+    stub = create_stub_app(latency=0, fail_first=10, fail_status=502)
+    guard = make_guard(max_retries=1)
+
+    with pytest.raises(UpstreamError) as error:
+        asyncio.run(complete(guard, create_stub_client(app=stub)))
+    assert error.value.status_code == 502
+    assert stub.state.requests == 2
+
+
+def test_client_errors_are_not_retried():
+    stub = create_stub_app(latency=0, fail_first=1, fail_status=400)
+    guard = make_guard(max_retries=3)
+
+    with pytest.raises(Exception) as error:
+        asyncio.run(complete(guard, create_stub_client(app=stub)))
+    assert not isinstance(error.value, UpstreamError)
+    assert stub.state.requests == 1
+
+
+def test_slow_completion_times_out():
+    stub = create_stub_app(latency=0.3)
+    guard = make_guard(timeout=0.05)
+
+    with pytest.raises(UpstreamTimeout) as error:
+        asyncio.run(complete(guard, create_stub_client(app=stub)))
+    assert error.value.status_code == 504
+
+
+def test_circuit_opens_and_recovers():
+    stub = create_stub_app(latency=0, fail_first=2)
+    guard = make_guard(breaker=CircuitBreaker(failure_threshold=2, reset_seconds=0.1))
+    client = create_stub_client(app=stub)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(UpstreamError):
+                await complete(guard, client)
+
+        # Open: rejected without reaching the provider
+        with pytest.raises(UpstreamUnavailable):
+            await complete(guard, client)
+        assert stub.state.requests == 2
+
+        # Half-open: the probe succeeds and closes the circuit
+        await asyncio.sleep(0.15)
+        assert await complete(guard, client) == "Stub reply to: hello"
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_only_the_probe_frees_the_probe_slot():
+    guard = make_guard(breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60))
+
+    async def scenario():
+        started, finish = asyncio.Event(), asyncio.Event()
+
+        async def rejected_request():
+            started.set()
+            await finish.wait()
+            raise ValueError("bad request")
+
+        async def hang():
+            await asyncio.Event().wait()
+
+        # A call admitted while the circuit was closed is still running...
+        earlier = asyncio.create_task(guard.call(rejected_request))
+        await started.wait()
+        # ...when the circuit opens, its reset time passes and a probe goes out
+        guard.breaker.record_failure()
+        guard.breaker.opened_at -= 60
+        probe = asyncio.create_task(guard.call(hang))
+        await asyncio.sleep(0.01)
+
+        finish.set()
+        with pytest.raises(ValueError):
+            await earlier
+        # The earlier call ending does not let a second probe through
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(hang)
+
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert not guard.breaker._probe_in_flight
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_is_bounded():
+    stub = create_stub_app(latency=0.05)
+    guard = make_guard(max_concurrency=2)
+    client = create_stub_client(app=stub)
+
+    async def scenario():
+        await asyncio.gather(*(complete(guard, client) for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert stub.state.requests == 6
+    assert stub.state.max_in_flight == 2
+
+
+def test_chat_returns_upstream_status_and_saves_nothing(app_db):
+    import main as app_main
+    from database import ChatMessage
+
+    stub = create_stub_app(latency=0, fail_first=100)
+    original_client, original_upstream = app_main.fitness_chat.client, app_main.fitness_chat.upstream
+    app_main.fitness_chat.client = create_stub_client(app=stub)
+    app_main.fitness_chat.upstream = make_guard(breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            payload = {"message": "resilience test", "user_id": "resilience_user"}
+            first = await client.post("/chat", json=payload)
+            second = await client.post("/chat", json=payload)
+            streamed = await client.post("/chat/stream", json=payload)
+        return first, second, streamed
+
+    try:
+        first, second, streamed = asyncio.run(scenario())
+    finally:
+        app_main.fitness_chat.client, app_main.fitness_chat.upstream = original_client, original_upstream
+
+    assert first.status_code == 502
+    assert second.status_code == 503
+    assert "Retry-After" in second.headers
+    assert streamed.status_code == 503
+    assert stub.state.requests == 1
+
+    db = app_db()
+    try:
+        assert db.query(ChatMessage).filter(ChatMessage.content == "resilience test").count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,69 @@
+"""
+Tests for bulk session deletion and message archival
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy.exc import IntegrityError
+
+from database import ArchivedMessageBatch, ChatMessage, ChatSession
+from retention import archive_old_messages, get_archived_messages
+from utils import delete_chat_sessions
+
+
+@pytest.fixture
+def session_factory(session_factory):
+    session = session_factory()
+    old = datetime.utcnow() - timedelta(days=100)
+    session.add_all([
+        ChatSession(session_id="s1", user_id="alice"),
+        ChatSession(session_id="s2", user_id="alice"),
+        ChatSession(session_id="s3", user_id="bob"),
+    ])
+    session.add_all([
+        ChatMessage(session_id="s1", role="user", content=f"old {i}", timestamp=old + timedelta(minutes=i))
+        for i in range(5)
+    ])
+    session.add_all([
+        ChatMessage(session_id="s1", role="user", content="recent"),
+        ChatMessage(session_id="s3", role="user", content="old", timestamp=old),
+    ])
+    session.commit()
+    session.close()
+    return session_factory
+
+
+def test_old_messages_are_archived_in_batches(session_factory):
+    assert archive_old_messages(30, batch_size=2, session_factory=session_factory) == 6
+
+    db = session_factory()
+    assert [message.content for message in db.query(ChatMessage)] == ["recent"]
+    assert [message["content"] for message in get_archived_messages(db, "s1")] == [f"old {i}" for i in range(5)]
+    assert archive_old_messages(0, session_factory=session_factory) == 0
+
+    # Session counters cover only the messages that are still live
+    sessions = {session.session_id: session for session in db.query(ChatSession)}
+    assert (sessions["s1"].message_count, sessions["s1"].preview) == (1, "recent")
+    assert (sessions["s3"].message_count, sessions["s3"].preview) == (0, None)
+    db.close()
+
+
+def test_bulk_delete_only_touches_owned_sessions(session_factory):
+    archive_old_messages(30, session_factory=session_factory)
+    db = session_factory()
+
+    assert sorted(delete_chat_sessions(db, "alice", ["s1", "s2", "s3", "missing"])) == ["s1", "s2"]
+    assert [session.session_id for session in db.query(ChatSession)] == ["s3"]
+    assert db.query(ChatMessage).count() == 0
+    assert {batch.session_id for batch in db.query(ArchivedMessageBatch)} == {"s3"}
+    db.close()
+
+
+def test_messages_need_an_existing_session(session_factory):
+    db = session_factory()
+    db.add(ChatMessage(session_id="missing", role="user", content="hi"))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.close()
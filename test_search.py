@@ -0,0 +1,64 @@
+"""
+Tests for full-text search over workout plans and chat messages
+"""
+
+import pytest
+
+from database import ChatMessage, ChatSession, WorkoutPlan
+from search import search_messages, search_plans
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        WorkoutPlan(user_id="alice", plan_name="Leg day", plan_content="Squats 5x5, lunges and calf raises"),
+        WorkoutPlan(user_id="alice", plan_name="Upper body", plan_content="Bench press, rows and pull-ups"),
+        WorkoutPlan(user_id="alice", plan_name="Mobility", plan_content="Hip openers before squatting"),
+        WorkoutPlan(user_id="bob", plan_name="Leg day", plan_content="Squats and deadlifts"),
+        ChatSession(session_id="s1", user_id="alice"),
+        ChatSession(session_id="s2", user_id="bob"),
+        ChatMessage(session_id="s1", role="user", content="My knee hurts when I squat"),
+        ChatMessage(session_id="s2", role="user", content="Knee pain during squats"),
+    ])
+    db.commit()
+    return db
+
+
+def test_plans_are_ranked_and_scoped_to_the_user(db):
+    plans, has_more = search_plans(db, "alice", "leg squats")
+
+    assert [plan["plan_name"] for plan in plans] == ["Leg day", "Mobility"]
+    assert not has_more
+    assert "[" in plans[0]["snippet"]
+
+
+def test_plan_results_are_paginated(db):
+    first, has_more = search_plans(db, "alice", "squat", limit=1)
+    second, _ = search_plans(db, "alice", "squat", limit=1, offset=1)
+
+    assert has_more
+    assert first[0]["id"] != second[0]["id"]
+
+
+def test_index_follows_updates_and_deletes(db):
+    plan = db.query(WorkoutPlan).filter(WorkoutPlan.plan_name == "Upper body").one()
+    plan.plan_content = "Overhead press and dips"
+    db.commit()
+    assert search_plans(db, "alice", "overhead")[0][0]["id"] == plan.id
+    assert search_plans(db, "alice", "bench")[0] == []
+
+    db.delete(plan)
+    db.commit()
+    assert search_plans(db, "alice", "overhead")[0] == []
+
+
+def test_query_syntax_is_treated_as_text(db):
+    assert search_plans(db, "alice", 'squats" OR NOT *')[0]
+    assert search_plans(db, "alice", "  ?! ") == ([], False)
+
+
+def test_messages_are_scoped_to_the_user_and_session(db):
+    messages, _ = search_messages(db, "alice", "knee")
+    assert [message["session_id"] for message in messages] == ["s1"]
+
+    assert search_messages(db, "alice", "knee", session_id="s2")[0] == []
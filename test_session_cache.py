@@ -0,0 +1,97 @@
+"""
+Tests for the in-process session cache
+"""
+
+from session_cache import CachedSession, LocalInvalidationChannel, SessionCache
+
+
+def messages(*ids):
+    return [(message_id, "user", f"message {message_id}") for message_id in ids]
+
+
+def test_window_keeps_the_newest_messages():
+    cache = SessionCache(max_messages=3, enabled=True)
+    cache.record_session("s1", "alice", "Chat", messages(1, 2))
+
+    cache.append_messages("s1", messages(3, 4))
+
+    entry = cache.get("s1")
+    assert [message[0] for message in entry.messages] == [2, 3, 4]
+    assert not entry.complete
+
+
+def test_summary_drops_folded_messages():
+    cache = SessionCache(enabled=True)
+    cache.record_session("s1", "alice", "Chat", messages(1, 2, 3))
+
+    cache.set_summary("s1", "Wants to squat more", 2)
+
+    entry = cache.get("s1")
+    assert entry.summary == "Wants to squat more"
+    assert [message[0] for message in entry.messages] == [3]
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    size = CachedSession("s0", "alice", "Chat", messages=messages(1)).size()
+    cache = SessionCache(max_bytes=size * 2, enabled=True)
+    cache.record_session("s0", "alice", "Chat", messages(1))
+    cache.record_session("s1", "alice", "Chat", messages(1))
+    cache.get("s0")
+
+    cache.record_session("s2", "alice", "Chat", messages(1))
+
+    assert cache.peek("s0") is not None
+    assert cache.peek("s1") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_writes_invalidate_other_workers():
+    channel = LocalInvalidationChannel()
+    worker_a = SessionCache(enabled=True, channel=channel)
+    worker_b = SessionCache(enabled=True, channel=channel)
+    worker_a.record_session("s1", "alice", "Chat", messages(1))
+    worker_b.record_session("s1", "alice", "Chat", messages(1))
+
+    worker_a.append_messages("s1", messages(2))
+
+    assert [message[0] for message in worker_a.peek("s1").messages] == [1, 2]
+    assert worker_b.peek("s1") is None
+
+
+def test_load_overtaken_by_a_write_is_not_stored():
+    cache = SessionCache(enabled=True)
+    cache.begin_load("s1")
+    cache.append_messages("s1", messages(5))
+
+    cache.finish_load("s1", CachedSession("s1", "alice", "Chat", messages=messages(1)))
+
+    assert cache.peek("s1") is None
+
+
+def test_bulk_delete_checks_cached_ownership_without_a_query(engine, db, monkeypatch):
+    from sqlalchemy import event
+
+    import utils
+    from database import ChatSession
+
+    cache = SessionCache(enabled=True)
+    monkeypatch.setattr(utils, "session_cache", cache)
+    db.add_all([ChatSession(session_id=session_id, user_id=user_id) for session_id, user_id in (("s1", "alice"), ("s2", "alice"), ("s3", "bob"))])
+    db.commit()
+    cache.record_session("s1", "alice", "Chat", [])
+    cache.record_session("s3", "bob", "Chat", [])
+
+    selects = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_selects(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    assert utils.delete_chat_sessions(db, "alice", ["s1", "s3"]) == ["s1"]
+    assert selects == []
+    assert cache.peek("s1") is None
+
+    assert utils.delete_chat_sessions(db, "alice", ["s2"]) == ["s2"]
+    assert len(selects) == 1
+    assert [row.session_id for row in db.query(ChatSession.session_id)] == ["s3"]
@@ -0,0 +1,55 @@
+"""
+Tests for the session activity counters and the session listing
+"""
+
+from datetime import datetime, timedelta
+
+from database import ChatMessage, ChatSession, SESSION_PREVIEW_CHARS, init_db
+from utils import create_chat_session, get_user_sessions, save_message
+
+
+def test_counters_follow_inserted_messages(db):
+    session_id = create_chat_session(db, "alice")
+    save_message(db, session_id, "user", "Plan my week")
+    save_message(db, session_id, "assistant", "Squats " * 100)
+    # A late message older than the last activity only adds to the count
+    db.add(ChatMessage(session_id=session_id, role="user", content="late", timestamp=datetime(2000, 1, 1)))
+    db.commit()
+
+    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).one()
+    assert session.message_count == 3
+    assert session.preview == ("Squats " * 100)[:SESSION_PREVIEW_CHARS]
+    assert session.last_activity_at > datetime(2000, 1, 1)
+
+
+def test_sessions_are_listed_by_last_activity(db):
+    quiet = create_chat_session(db, "alice", "Quiet")
+    middle = create_chat_session(db, "alice", "Middle")
+    newest = create_chat_session(db, "alice", "Newest")
+    create_chat_session(db, "bob", "Not alice's")
+    # The oldest session becomes the most recently active
+    db.add(ChatMessage(session_id=quiet, role="user", content="back again", timestamp=datetime.utcnow() + timedelta(minutes=1)))
+    db.commit()
+
+    first, has_more = get_user_sessions(db, "alice", limit=2)
+    second, _ = get_user_sessions(db, "alice", before=first[-1].id, limit=2)
+
+    assert [session.session_id for session in first] == [quiet, newest]
+    assert has_more
+    assert [session.session_id for session in second] == [middle]
+
+
+def test_sessions_created_before_the_counters_are_backfilled(engine, db):
+    db.add(ChatSession(session_id="legacy", user_id="alice"))
+    db.flush()
+    db.add(ChatMessage(session_id="legacy", role="user", content="old message", timestamp=datetime(2024, 1, 1)))
+    db.commit()
+    # As if the columns had just been added to an existing table
+    db.query(ChatSession).update({"last_activity_at": None, "message_count": None, "preview": None})
+    db.commit()
+
+    init_db(engine)
+
+    db.expire_all()
+    session = db.query(ChatSession).one()
+    assert (session.message_count, session.preview, session.last_activity_at) == (1, "old message", datetime(2024, 1, 1))
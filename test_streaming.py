@@ -0,0 +1,137 @@
+"""
+Tests for /chat/stream against the stub LLM: the server-sent event sequence,
+streamed tool calls and streams the client abandons
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import BackgroundTasks
+
+from resilience import CircuitBreaker, UpstreamGuard
+from stub_llm import create_stub_app, create_stub_client
+
+PLAN_LISTING = {"name": "get_user_workout_plans", "arguments": {"limit": 1}}
+PLAN_SEARCH = {"name": "search_workout_plans", "arguments": {"query": "legs", "limit": 2}}
+
+
+@pytest.fixture
+def stream_app(app_db, monkeypatch):
+    """Point the app's chat service at a stub LLM, one upstream slot wide"""
+    import main as app_main
+
+    def use_stub(stub):
+        monkeypatch.setattr(app_main.fitness_chat, "client", create_stub_client(app=stub))
+        guard = UpstreamGuard(max_concurrency=1, queue_timeout=1, max_retries=0, breaker=CircuitBreaker(failure_threshold=100))
+        monkeypatch.setattr(app_main.fitness_chat, "upstream", guard)
+        return guard
+
+    return app_main, use_stub
+
+
+def parse_events(text: str):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def saved_messages(app_db, session_id: str):
+    from database import ChatMessage
+
+    db = app_db()
+    try:
+        rows = db.query(ChatMessage).filter(ChatMessage.session_id == session_id).order_by(ChatMessage.id)
+        return [(message.role, message.content) for message in rows]
+    finally:
+        db.close()
+
+
+async def post_stream(app, payload: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/chat/stream", json=payload)
+
+
+def test_stream_sends_session_deltas_and_done(stream_app, app_db):
+    app_main, use_stub = stream_app
+    stub = create_stub_app(latency=0)
+    use_stub(stub)
+
+    response = asyncio.run(post_stream(app_main.app, {"message": "stream me a plan", "user_id": "stream_user"}))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "session" and names[-1] == "done"
+    assert set(names[1:-1]) == {"delta"} and len(names) > 3
+
+    session_id = events[0][1]["session_id"]
+    assert events[-1][1]["session_id"] == session_id
+    reply = "".join(data["content"] for name, data in events if name == "delta")
+    assert reply == "Stub reply to: stream me a plan"
+    assert saved_messages(app_db, session_id) == [("user", "stream me a plan"), ("assistant", reply)]
+
+
+def test_streamed_tool_call_fragments_are_reassembled_by_index(stream_app, app_db):
+    app_main, use_stub = stream_app
+    stub = create_stub_app(latency=0, tool_calls=[PLAN_LISTING, PLAN_SEARCH])
+    use_stub(stub)
+
+    async def first_completion():
+        tool_calls = {}
+        messages = app_main.fitness_chat.prefix.messages([], "list my plans")
+        deltas = [delta async for delta in app_main.fitness_chat._stream_completion(messages, True, tool_calls)]
+        return deltas, tool_calls
+
+    deltas, tool_calls = asyncio.run(first_completion())
+
+    # The stub sends each call's arguments in two fragments that carry only the index
+    assert deltas == []
+    assert sorted(tool_calls) == [0, 1]
+    assert [(call["name"], json.loads(call["arguments"])) for call in tool_calls.values()] == [
+        ("get_user_workout_plans", {"limit": 1}),
+        ("search_workout_plans", {"query": "legs", "limit": 2}),
+    ]
+    assert all(call["id"] for call in tool_calls.values())
+
+    stub = create_stub_app(latency=0, tool_calls=[PLAN_LISTING, PLAN_SEARCH])
+    use_stub(stub)
+
+    response = asyncio.run(post_stream(app_main.app, {"message": "list my plans", "user_id": "stream_user"}))
+
+    events = parse_events(response.text)
+    assert [name for name, _ in events][-1] == "done"
+    assert "".join(data["content"] for name, data in events if name == "delta").startswith("Stub reply to:")
+    # One streamed round of tool calls, then the answer
+    assert stub.state.requests == 2
+
+
+def test_abandoned_stream_saves_partial_text_and_frees_its_slot(stream_app, app_db):
+    from database import AsyncSessionLocal
+    from schema import ChatRequest
+
+    app_main, use_stub = stream_app
+    guard = use_stub(create_stub_app(latency=0))
+
+    async def scenario():
+        request = ChatRequest(message="walk away from this one", user_id="stream_user")
+        response = await app_main.chat_stream(request, BackgroundTasks(), AsyncSessionLocal())
+        events = []
+        async for event in response.body_iterator:
+            events.append(event)
+            if event.startswith("event: delta"):
+                break
+        # What Starlette does when the client disconnects
+        await response.body_iterator.aclose()
+        return parse_events("".join(events)), guard._semaphore.locked()
+
+    events, slot_held = asyncio.run(scenario())
+
+    assert not slot_held
+    session_id = events[0][1]["session_id"]
+    assert saved_messages(app_db, session_id) == [("user", "walk away from this one"), ("assistant", "Stub")]
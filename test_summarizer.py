@@ -0,0 +1,56 @@
+"""
+Tests for folding older messages into the running session summary
+"""
+
+import asyncio
+
+from summarizer import ConversationSummarizer
+from utils import create_chat_session, get_session_summary, save_message
+
+
+class RecordingChat:
+    """Stands in for FitnessChat, recording what it is asked to summarize"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def summarize_conversation(self, summary, messages):
+        self.calls.append((summary, [message["content"] for message in messages]))
+        return f"summary {len(self.calls)}"
+
+
+def add_messages(db, session_id: str, start: int, count: int):
+    for i in range(start, start + count):
+        save_message(db, session_id, "user", f"message {i}")
+
+
+def test_only_messages_past_the_summary_are_folded(app_db):
+    db = app_db()
+    session_id = create_chat_session(db, "summary_user")
+    chat = RecordingChat()
+    summarizer = ConversationSummarizer(chat, trigger_messages=6, keep_recent=2, max_fold=3)
+
+    def compact():
+        return asyncio.run(summarizer.maybe_compact(session_id))
+
+    # Below the trigger nothing is summarized
+    add_messages(db, session_id, 0, 5)
+    assert not compact()
+
+    # Past it, at most max_fold of the oldest messages are folded and keep_recent stay out
+    add_messages(db, session_id, 5, 2)
+    assert compact()
+    assert chat.calls == [(None, ["message 0", "message 1", "message 2"])]
+
+    # The four messages after the summary are below the trigger again
+    assert not compact()
+
+    # The next fold starts after the last folded message and extends the summary
+    add_messages(db, session_id, 7, 3)
+    assert compact()
+    assert chat.calls[1] == ("summary 1", ["message 3", "message 4", "message 5"])
+
+    db.expire_all()
+    summary = get_session_summary(db, session_id)
+    assert summary.summary == "summary 2"
+    db.close()
@@ -0,0 +1,29 @@
+"""
+Tests for the workout plan tools on the app's test database
+"""
+
+import asyncio
+
+import tools
+from database import WorkoutPlan
+
+
+def test_model_supplied_limits_are_clamped(app_db, monkeypatch):
+    db = app_db()
+    db.add_all([WorkoutPlan(user_id="clamp_user", plan_name=f"Squat plan {i}", plan_content="Squats") for i in range(4)])
+    db.commit()
+    db.close()
+    monkeypatch.setattr(tools, "MAX_PLANS_PER_PAGE", 2)
+    monkeypatch.setattr(tools, "MAX_SEARCH_RESULTS", 3)
+
+    async def run():
+        return (
+            await tools.get_user_workout_plans("clamp_user", limit=1000),
+            await tools.get_user_workout_plans("clamp_user", limit=0),
+            await tools.search_workout_plans("clamp_user", "squat", limit=1000),
+        )
+
+    listed, smallest, found = asyncio.run(run())
+    assert listed["count"] == 2 and listed["has_more"]
+    assert smallest["count"] == 1
+    assert found["count"] == 3 and found["has_more"]
@@ -0,0 +1,118 @@
+"""
+Tests for the weather tool's pooled HTTP client and cache, run against a
+local stub of the Open-Meteo API
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import agent
+import http_client
+
+APP_DIR = os.path.dirname(agent.__file__)
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(parse_qs(urlparse(self.path).query))
+        server.client_ports.add(self.client_address[1])
+
+        if server.failures_left > 0:
+            server.failures_left -= 1
+            status, body = 503, b"{}"
+        else:
+            status, body = 200, json.dumps({"current": {"temperature_2m": 21.5, "wind_speed_10m": 3.0}}).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def weather_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWeatherHandler)
+    server.requests = []
+    server.client_ports = set()
+    server.failures_left = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(agent, "WEATHER_API_URL", f"http://127.0.0.1:{server.server_address[1]}/v1/forecast")
+    monkeypatch.setattr(http_client, "HTTP_RETRY_BACKOFF_SECONDS", 0)
+    agent.weather_cache.clear()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_weather_returns_current_temperature(weather_server):
+    assert agent.get_weather(48.8566, 2.3522) == 21.5
+    assert weather_server.requests[0]["latitude"] == ["48.86"]
+    assert weather_server.requests[0]["longitude"] == ["2.35"]
+
+
+def test_nearby_coordinates_are_served_from_cache(weather_server):
+    agent.get_weather(48.8566, 2.3522)
+    agent.get_weather(48.8571, 2.3519)
+
+    assert len(weather_server.requests) == 1
+
+
+def test_connections_are_reused_across_calls(weather_server):
+    for latitude in (10.0, 20.0, 30.0, 40.0):
+        agent.get_weather(latitude, 0.0)
+
+    assert len(weather_server.requests) == 4
+    assert len(weather_server.client_ports) == 1
+
+
+def test_retryable_status_is_retried(weather_server):
+    weather_server.failures_left = 1
+
+    assert agent.get_weather(1.0, 1.0) == 21.5
+    assert len(weather_server.requests) == 2
+
+
+def test_failed_function_calls_do_not_lose_the_other_results(weather_server):
+    weather_server.failures_left = 100
+    calls = [
+        SimpleNamespace(call_id="call_1", name="get_weather", arguments='{"latitude": 1.0, "longitude": 1.0}'),
+        SimpleNamespace(call_id="call_2", name="get_weather", arguments="{not json"),
+        SimpleNamespace(call_id="call_3", name="no_such_tool", arguments="{}"),
+    ]
+
+    outputs = [agent.run_function_call(call) for call in calls]
+
+    assert [output["call_id"] for output in outputs] == ["call_1", "call_2", "call_3"]
+    assert all("'success': False" in output["output"] for output in outputs)
+
+    weather_server.failures_left = 0
+    assert agent.run_function_call(calls[0])["output"] == "21.5"
+
+
+def test_agent_script_does_not_create_the_app_database(tmp_path):
+    # A fresh interpreter, since the test session has already imported database
+    check = "import sys, agent; sys.exit('database' in sys.modules)"
+    env = {name: value for name, value in os.environ.items() if not name.endswith("DATABASE_URL")}
+    env["PYTHONPATH"] = APP_DIR
+
+    subprocess.run([sys.executable, "-c", check], cwd=tmp_path, env=env, check=True)
+    assert list(tmp_path.iterdir()) == []